@@ -0,0 +1,30 @@
+"""Settings and expiry shared by the DB-backed caches (<PREFIX>_ENABLED, <PREFIX>_TTL_SECONDS)."""
+
+import os
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import delete
+from sqlmodel import Session
+
+
+def ttl_seconds(prefix: str, default: int) -> int:
+    raw = (os.getenv(f"{prefix}_TTL_SECONDS") or "").strip()
+    try:
+        return int(raw) if raw else default
+    except ValueError:
+        return default
+
+
+def cache_enabled(prefix: str, default_ttl: int) -> bool:
+    """<PREFIX>_ENABLED is "true" (the default) and the TTL is positive."""
+    return (os.getenv(f"{prefix}_ENABLED") or "true").strip().lower() == "true" and ttl_seconds(prefix, default_ttl) > 0
+
+
+def expires_at(prefix: str, default_ttl: int, now: datetime) -> datetime:
+    return now + timedelta(seconds=ttl_seconds(prefix, default_ttl))
+
+
+def purge_expired(session: Session, table: Any, now: datetime) -> None:
+    """Delete expired rows of a cache table with an expires_at column (run on write)."""
+    session.exec(delete(table).where(table.expires_at <= now))
@@ -0,0 +1,81 @@
+"""DB memo of company_validation verdicts keyed by the normalized TZ and site text."""
+
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from prometheus_client import Counter
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import Session, select
+
+from app import cache_settings
+from app.database import engine
+from app.models import CompanyVerdictCacheEntry
+
+COMPANY_VERDICT_CACHE_REQUESTS_TOTAL = Counter(
+    "company_verdict_cache_requests_total",
+    "company_validation lookups by cache result.",
+    ["result"],
+)
+
+
+SETTINGS_PREFIX = "COMPANY_VERDICT_CACHE"
+DEFAULT_TTL_SECONDS = 14 * 24 * 3600
+
+
+def cache_enabled() -> bool:
+    return cache_settings.cache_enabled(SETTINGS_PREFIX, DEFAULT_TTL_SECONDS)
+
+
+def _normalize(text: str) -> str:
+    return " ".join((text or "").lower().replace("ё", "е").split())
+
+
+def cache_key(tz: str, site_text: str, model: Optional[str]) -> str:
+    """Whitespace and case do not change the key; another model gives another verdict."""
+    raw = "\x00".join([_normalize(tz), _normalize(site_text), model or ""])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get_cached_verdict(key: str) -> Optional[Dict[str, Any]]:
+    if not cache_enabled():
+        return None
+    try:
+        with Session(engine) as session:
+            entry = session.exec(
+                select(CompanyVerdictCacheEntry).where(
+                    CompanyVerdictCacheEntry.cache_key == key,
+                    CompanyVerdictCacheEntry.expires_at > datetime.utcnow(),
+                )
+            ).first()
+    except SQLAlchemyError as exc:
+        print(f"[company_verdict_cache] lookup failed: {exc}")
+        return None
+    if entry is None:
+        COMPANY_VERDICT_CACHE_REQUESTS_TOTAL.labels("miss").inc()
+        return None
+    COMPANY_VERDICT_CACHE_REQUESTS_TOTAL.labels("hit").inc()
+    return json.loads(entry.result_json)
+
+
+def store_verdict(key: str, website: Optional[str], result: Dict[str, Any]) -> None:
+    """Save an LLM verdict; callers do not store error fallbacks."""
+    if not cache_enabled():
+        return
+    now = datetime.utcnow()
+    try:
+        with Session(engine) as session:
+            cache_settings.purge_expired(session, CompanyVerdictCacheEntry, now)
+            entry = session.exec(select(CompanyVerdictCacheEntry).where(CompanyVerdictCacheEntry.cache_key == key)).first()
+            if entry is None:
+                entry = CompanyVerdictCacheEntry(cache_key=key, result_json="", expires_at=now)
+            entry.website = website
+            entry.result_json = json.dumps(result, ensure_ascii=False)
+            entry.created_at = now
+            entry.expires_at = cache_settings.expires_at(SETTINGS_PREFIX, DEFAULT_TTL_SECONDS, now)
+            session.add(entry)
+            session.commit()
+    except SQLAlchemyError as exc:
+        # Parallel validation of the same text or an unavailable DB: the memo is best effort.
+        print(f"[company_verdict_cache] store failed: {exc}")
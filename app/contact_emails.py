@@ -0,0 +1,196 @@
+"""Email extraction from a page's HTML: plain, obfuscated, Cloudflare-protected and structured-data forms."""
+
+import html as html_lib
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import unquote, urlparse
+
+from lxml import etree
+from lxml import html as lxml_html
+
+EMAIL_RE = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+
+# "sales [at] firm [dot] ru", "sales(собака)firm(точка)ru", "sales {at} firm.ru"
+_AT_RE = re.compile(r"\s*[\[\(\{<]\s*(?:at|собака|эт|@)\s*[\]\)\}>]\s*", re.IGNORECASE)
+_DOT_RE = re.compile(r"\s*[\[\(\{<]\s*(?:dot|точка|\.)\s*[\]\)\}>]\s*", re.IGNORECASE)
+_VCARD_RE = re.compile(r"(?im)^EMAIL[^:\n]*:\s*(\S+@\S+)\s*$")
+
+IMAGE_LIKE_TLDS = {"jpg", "jpeg", "png", "webp", "gif", "svg", "bmp", "tiff", "avif", "jfif", "ico", "css", "js"}
+
+# Role accounts that reach sales/procurement directly.
+ROLE_LOCAL_PARTS = {
+    "sales": 0.3,
+    "sale": 0.3,
+    "zakaz": 0.3,
+    "order": 0.3,
+    "orders": 0.3,
+    "opt": 0.3,
+    "optom": 0.3,
+    "prodazhi": 0.3,
+    "tender": 0.25,
+    "tenders": 0.25,
+    "snab": 0.2,
+    "kp": 0.2,
+    "commerce": 0.2,
+    "info": 0.15,
+    "office": 0.1,
+    "mail": 0.05,
+}
+LOW_VALUE_LOCAL_PARTS = {"noreply", "no-reply", "donotreply", "webmaster", "abuse", "postmaster", "privacy", "hr", "job", "rabota", "resume"}
+JUNK_DOMAINS = {"example.com", "example.ru", "domain.com", "domain.ru", "email.com", "mail.com", "site.ru", "sentry.io", "wixpress.com"}
+FREE_MAIL_DOMAINS = {"mail.ru", "bk.ru", "list.ru", "inbox.ru", "yandex.ru", "ya.ru", "gmail.com", "rambler.ru"}
+
+_MICRODATA_EMAIL_XPATH = (
+    "//*[@itemprop='email']"
+    " | //*[contains(concat(' ', normalize-space(@class), ' '), ' email ')]"
+    " | //*[contains(concat(' ', normalize-space(@class), ' '), ' u-email ')]"
+)
+
+SOURCE_WEIGHTS = {"jsonld": 0.15, "microdata": 0.15, "mailto": 0.1, "vcard": 0.1, "cfemail": 0.05, "text": 0.0, "deobfuscated": 0.0}
+
+
+@dataclass
+class EmailCandidate:
+    email: str
+    score: float = 0.0
+    sources: List[str] = field(default_factory=list)
+
+
+def decode_cfemail(encoded: str) -> Optional[str]:
+    """Decode a Cloudflare email-protection hex string (data-cfemail / #hex in /cdn-cgi/l/email-protection)."""
+    try:
+        data = bytes.fromhex(encoded.strip())
+    except ValueError:
+        return None
+    if len(data) < 2:
+        return None
+    key = data[0]
+    try:
+        return bytes(byte ^ key for byte in data[1:]).decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+def deobfuscate_text(text: str) -> str:
+    return _DOT_RE.sub(".", _AT_RE.sub("@", text or ""))
+
+
+def _is_plausible(email: str) -> bool:
+    local, _, domain = email.partition("@")
+    if not local or "." not in domain:
+        return False
+    return domain.rsplit(".", 1)[-1].lower() not in IMAGE_LIKE_TLDS
+
+
+def _jsonld_emails(payload: Any) -> Iterable[str]:
+    if isinstance(payload, dict):
+        for key, value in payload.items():
+            if key.lower() == "email" and isinstance(value, str):
+                yield value
+            else:
+                yield from _jsonld_emails(value)
+    elif isinstance(payload, list):
+        for item in payload:
+            yield from _jsonld_emails(item)
+
+
+def _site_domain(site_url: Optional[str]) -> str:
+    host = (urlparse(site_url or "").netloc or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def score_email(email: str, site_domain: str = "", sources: Iterable[str] = ()) -> float:
+    """Heuristic usefulness of an address for an RFQ: role accounts on the site's own domain rank highest."""
+    local, _, domain = email.lower().partition("@")
+    if domain in JUNK_DOMAINS or local in LOW_VALUE_LOCAL_PARTS:
+        return 0.0
+    score = 0.4 + ROLE_LOCAL_PARTS.get(local, 0.0)
+    if site_domain and (domain == site_domain or domain.endswith("." + site_domain) or site_domain.endswith("." + domain)):
+        score += 0.25
+    elif domain in FREE_MAIL_DOMAINS:
+        score -= 0.1
+    score += max((SOURCE_WEIGHTS.get(source, 0.0) for source in sources), default=0.0)
+    return round(max(0.0, min(1.0, score)), 3)
+
+
+class _EmailCollector:
+    def __init__(self) -> None:
+        self.found: Dict[str, EmailCandidate] = {}
+
+    def add(self, raw: str, source: str) -> None:
+        value = unquote(html_lib.unescape(raw or "")).lower()
+        for email in EMAIL_RE.findall(value):
+            if not _is_plausible(email):
+                continue
+            candidate = self.found.setdefault(email, EmailCandidate(email=email))
+            if source not in candidate.sources:
+                candidate.sources.append(source)
+
+    def add_text(self, text: str) -> None:
+        self.add(text, "text")
+        self.add(deobfuscate_text(text), "deobfuscated")
+        for email in _VCARD_RE.findall(text or ""):
+            self.add(email, "vcard")
+
+    def ranked(self, site_url: Optional[str]) -> List[EmailCandidate]:
+        site_domain = _site_domain(site_url)
+        candidates = []
+        for candidate in self.found.values():
+            candidate.score = score_email(candidate.email, site_domain, candidate.sources)
+            if candidate.score > 0:
+                candidates.append(candidate)
+        return sorted(candidates, key=lambda item: -item.score)
+
+
+def extract_text_emails(text: str, site_url: Optional[str] = None) -> List[EmailCandidate]:
+    """Plain, [at]/(собака)-obfuscated and vCard addresses in already extracted page text, best first."""
+    collector = _EmailCollector()
+    collector.add_text(text)
+    return collector.ranked(site_url)
+
+
+def extract_contact_emails(page_html: str, site_url: Optional[str] = None) -> List[EmailCandidate]:
+    """
+    Find all email addresses in one page's HTML, best candidates first.
+
+    Covers plain addresses, mailto: links with URL/entity encoding, Cloudflare data-cfemail,
+    [at]/(собака)/[dot] obfuscation, JSON-LD "email", microdata/hCard email fields and vCard text.
+    """
+    if not page_html:
+        return []
+
+    collector = _EmailCollector()
+    collector.add(page_html, "text")
+
+    try:
+        document = lxml_html.document_fromstring(page_html)
+    except (etree.ParserError, ValueError):
+        collector.add_text(page_html)
+        return collector.ranked(site_url)
+
+    for element in document.xpath("//*[@data-cfemail]"):
+        collector.add(decode_cfemail(element.get("data-cfemail") or "") or "", "cfemail")
+    for href in document.xpath("//a/@href"):
+        lowered = href.lower()
+        if lowered.startswith("mailto:"):
+            collector.add(href, "mailto")
+        elif "/cdn-cgi/l/email-protection#" in lowered:
+            collector.add(decode_cfemail(href.rsplit("#", 1)[-1]) or "", "cfemail")
+        elif lowered.startswith(("data:text/vcard", "data:text/x-vcard")):
+            for email in _VCARD_RE.findall(unquote(href.split(",", 1)[-1])):
+                collector.add(email, "vcard")
+    for script in document.xpath("//script[@type='application/ld+json']"):
+        try:
+            payload = json.loads(script.text or "")
+        except (TypeError, ValueError):
+            continue
+        for email in _jsonld_emails(payload):
+            collector.add(email, "jsonld")
+    for element in document.xpath(_MICRODATA_EMAIL_XPATH):
+        collector.add(element.get("content") or element.get("href") or element.text_content(), "microdata")
+
+    visible_text = "\n".join(document.xpath("//body//text()[not(ancestor::script) and not(ancestor::style)]"))
+    collector.add_text(visible_text)
+    return collector.ranked(site_url)
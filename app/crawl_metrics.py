@@ -0,0 +1,127 @@
+"""Crawler telemetry: per-stage timings, pages and bytes per site, site outcomes and a per-task summary."""
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from prometheus_client import Counter, Histogram
+
+from app.domain_health import domain_health
+
+CRAWLER_STAGE_SECONDS = Histogram(
+    "crawler_stage_seconds",
+    "Time spent per supplier website crawl stage.",
+    ["stage"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60),
+)
+CRAWLER_SITE_SECONDS = Histogram(
+    "crawler_site_seconds",
+    "Browser crawl time of one supplier website (validation runs in parallel, see stage=validation).",
+    buckets=(5, 10, 20, 30, 45, 60, 90, 120, 180, 300),
+)
+CRAWLER_PAGES_PER_SITE = Histogram(
+    "crawler_pages_per_site",
+    "Pages loaded in the browser per crawled website.",
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10),
+)
+CRAWLER_BYTES_TOTAL = Counter(
+    "crawler_bytes_downloaded_total",
+    "Bytes transferred by the browser for crawled pages (Resource Timing transferSize).",
+)
+CRAWLER_SITE_OUTCOMES_TOTAL = Counter(
+    "crawler_site_outcomes_total",
+    "Crawled websites by outcome.",
+    ["outcome"],
+)
+
+# Stages of one site: discovery, contacts_page, page_load, screenshot, text_extraction, link_discovery,
+# about_page, catalog_page, validation. page_load is observed for every navigation, so it also
+# overlaps the contacts_page/about_page/catalog_page stages that navigate.
+
+# Outcomes reported by collect_contacts_from_websites.
+OUTCOMES = ("relevant", "irrelevant", "timeout", "visit_error", "skipped", "budget_exceeded", "error")
+
+
+class CrawlStats:
+    """
+    Aggregates one task's crawl: stage totals, pages/bytes per site and outcomes.
+
+    Every stage timing and finished site is exported to Prometheus immediately; summary()
+    is stored in the task's output_text.
+    """
+
+    def __init__(self) -> None:
+        self.stage_seconds: Dict[str, float] = defaultdict(float)
+        self.stage_calls: Dict[str, int] = defaultdict(int)
+        self.outcomes: Dict[str, int] = defaultdict(int)
+        self.pages = 0
+        self.bytes = 0
+        self.sites: List[Dict[str, Any]] = []
+        self._site_pages = 0
+        self._site_bytes = 0
+        self._site_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_stage_time(name, time.monotonic() - started)
+
+    def add_stage_time(self, name: str, seconds: float) -> None:
+        CRAWLER_STAGE_SECONDS.labels(name).observe(seconds)
+        with self._lock:
+            self.stage_seconds[name] += seconds
+            self.stage_calls[name] += 1
+
+    def add_page(self, size_bytes: int = 0) -> None:
+        if size_bytes > 0:
+            CRAWLER_BYTES_TOTAL.inc(size_bytes)
+        with self._lock:
+            self.pages += 1
+            self.bytes += max(0, size_bytes)
+            self._site_pages += 1
+            self._site_bytes += max(0, size_bytes)
+
+    def start_site(self) -> None:
+        with self._lock:
+            self._site_pages = 0
+            self._site_bytes = 0
+            self._site_started = time.monotonic()
+
+    def end_site(self) -> Dict[str, Any]:
+        """Close the browser part of the current site; returns its seconds/pages/bytes for finish_site."""
+        with self._lock:
+            seconds = time.monotonic() - self._site_started if self._site_started is not None else 0.0
+            self._site_started = None
+            return {"seconds": round(seconds, 2), "pages": self._site_pages, "bytes": self._site_bytes}
+
+    def finish_site(self, website: str, outcome: str, site: Optional[Dict[str, Any]] = None) -> None:
+        site = site or self.end_site()
+        CRAWLER_SITE_SECONDS.observe(site["seconds"])
+        CRAWLER_PAGES_PER_SITE.observe(site["pages"])
+        CRAWLER_SITE_OUTCOMES_TOTAL.labels(outcome).inc()
+        with self._lock:
+            self.outcomes[outcome] += 1
+            self.sites.append({"website": website, "outcome": outcome} | site)
+
+    def summary(self, slowest_limit: int = 5) -> Dict[str, Any]:
+        with self._lock:
+            slowest_sites = sorted(self.sites, key=lambda item: -item["seconds"])[:slowest_limit]
+            return {
+                "sites": len(self.sites),
+                "outcomes": dict(self.outcomes),
+                "pages": self.pages,
+                "bytes": self.bytes,
+                "seconds_total": round(sum(item["seconds"] for item in self.sites), 2),
+                "stages": {
+                    name: {"seconds": round(seconds, 2), "calls": self.stage_calls[name]}
+                    for name, seconds in sorted(self.stage_seconds.items(), key=lambda item: -item[1])
+                },
+                "slowest_sites": slowest_sites,
+                "slowest_domains": domain_health.slowest(slowest_limit),
+            }
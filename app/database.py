@@ -15,6 +15,7 @@ engine = create_engine(
 def create_db_and_tables() -> None:
     SQLModel.metadata.create_all(engine)
     _ensure_supplier_contact_columns()
+    _ensure_validation_verdict_columns()
 
 
 def _ensure_supplier_contact_columns() -> None:
@@ -32,6 +33,20 @@ def _ensure_supplier_contact_columns() -> None:
             conn.execute(text(f"ALTER TABLE suppliercontact ADD COLUMN {column_name} {column_type}"))
 
 
+def _ensure_validation_verdict_columns() -> None:
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        existing_columns = {column["name"] for column in inspector.get_columns("validationverdict")}
+        if "snippet_hash" not in existing_columns:
+            conn.execute(text("ALTER TABLE validationverdict ADD COLUMN snippet_hash VARCHAR"))
+        conn.execute(
+            text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_validationverdict_pair "
+                "ON validationverdict (kind, tz_hash, snippet_hash)"
+            )
+        )
+
+
 def get_session() -> Iterator[Session]:
     with Session(engine) as session:
         yield session
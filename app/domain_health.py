@@ -0,0 +1,201 @@
+"""Per-domain page-load latency tracking, adaptive timeouts and a negative cache for failing sites."""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from prometheus_client import Counter, Gauge, Histogram
+
+CRAWLER_PAGE_LOAD_SECONDS = Histogram(
+    "crawler_page_load_seconds",
+    "Page load time of crawled supplier websites.",
+    buckets=(0.5, 1, 2, 3, 5, 8, 12, 17, 25, 40),
+)
+CRAWLER_DOMAIN_LATENCY_SECONDS = Gauge(
+    "crawler_domain_latency_seconds",
+    "Smoothed (EWMA) page load time per crawled domain.",
+    ["domain"],
+)
+CRAWLER_DOMAIN_FAILURES_TOTAL = Counter(
+    "crawler_domain_failures_total",
+    "Failed page loads by failure kind.",
+    ["kind"],
+)
+CRAWLER_DOMAIN_SKIPPED_TOTAL = Counter(
+    "crawler_domain_skipped_total",
+    "Page loads skipped because the domain is in the negative cache.",
+)
+
+# Chrome network errors that mean the host itself is unreachable.
+UNREACHABLE_MARKERS = (
+    "ERR_CONNECTION_REFUSED",
+    "ERR_NAME_NOT_RESOLVED",
+    "ERR_CONNECTION_TIMED_OUT",
+    "ERR_ADDRESS_UNREACHABLE",
+    "ERR_CONNECTION_RESET",
+    "ERR_CONNECTION_CLOSED",
+    "ERR_SSL_PROTOCOL_ERROR",
+    "ERR_CERT_",
+)
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = (os.getenv(name) or "").strip()
+    try:
+        return float(raw) if raw else default
+    except ValueError:
+        return default
+
+
+def domain_key(url: str) -> str:
+    host = (urlparse(url if "://" in url else f"https://{url}").netloc or "").lower().split(":")[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+def classify_failure(exc: BaseException) -> str:
+    message = str(exc)
+    for marker in UNREACHABLE_MARKERS:
+        if marker in message:
+            return "unreachable"
+    return "error"
+
+
+@dataclass
+class DomainStats:
+    ewma_latency: Optional[float] = None
+    max_latency: float = 0.0
+    visits: int = 0
+    consecutive_failures: int = 0
+    blocked_until: float = 0.0
+    last_error: str = ""
+
+
+class DomainHealth:
+    """
+    In-process registry shared by all crawls of a worker.
+
+    Timeouts follow each domain's smoothed latency (never above the global PAGE_LOAD_TIMEOUT);
+    domains that timed out at the full timeout or were unreachable are skipped for
+    base_backoff * 2^(failures-1) seconds, capped by max_backoff.
+    """
+
+    def __init__(
+        self,
+        default_timeout: float,
+        min_timeout: float = 5.0,
+        base_backoff: float = 600.0,
+        max_backoff: float = 86400.0,
+        max_domains: int = 1000,
+        alpha: float = 0.3,
+    ) -> None:
+        self.default_timeout = default_timeout
+        self.min_timeout = min(min_timeout, default_timeout)
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_domains = max_domains
+        self.alpha = alpha
+        self._stats: "OrderedDict[str, DomainStats]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "DomainHealth":
+        return cls(
+            default_timeout=_env_float("PAGE_LOAD_TIMEOUT", 20.0),
+            min_timeout=_env_float("DOMAIN_MIN_PAGE_LOAD_TIMEOUT", 5.0),
+            base_backoff=_env_float("DOMAIN_NEGATIVE_CACHE_SECONDS", 600.0),
+            max_backoff=_env_float("DOMAIN_NEGATIVE_CACHE_MAX_SECONDS", 86400.0),
+            max_domains=int(_env_float("DOMAIN_HEALTH_MAX_DOMAINS", 1000)),
+        )
+
+    def _get(self, domain: str) -> DomainStats:
+        stats = self._stats.get(domain)
+        if stats is None:
+            stats = DomainStats()
+            self._stats[domain] = stats
+            while len(self._stats) > self.max_domains:
+                evicted, _ = self._stats.popitem(last=False)
+                try:
+                    CRAWLER_DOMAIN_LATENCY_SECONDS.remove(evicted)
+                except KeyError:
+                    pass
+        else:
+            self._stats.move_to_end(domain)
+        return stats
+
+    def blocked_for(self, domain: str) -> float:
+        """Seconds left in the negative cache for the domain (0 if it may be visited)."""
+        with self._lock:
+            stats = self._stats.get(domain)
+            remaining = stats.blocked_until - time.time() if stats else 0.0
+        return max(0.0, remaining)
+
+    def timeout_for(self, domain: str) -> float:
+        with self._lock:
+            stats = self._stats.get(domain)
+            ewma = stats.ewma_latency if stats else None
+        if ewma is None:
+            return self.default_timeout
+        return max(self.min_timeout, min(self.default_timeout, ewma * 3 + 3))
+
+    def _observe(self, stats: DomainStats, domain: str, seconds: float) -> None:
+        stats.visits += 1
+        stats.max_latency = max(stats.max_latency, seconds)
+        if stats.ewma_latency is None:
+            stats.ewma_latency = seconds
+        else:
+            stats.ewma_latency = self.alpha * seconds + (1 - self.alpha) * stats.ewma_latency
+        CRAWLER_DOMAIN_LATENCY_SECONDS.labels(domain).set(stats.ewma_latency)
+
+    def record_success(self, domain: str, seconds: float) -> None:
+        CRAWLER_PAGE_LOAD_SECONDS.observe(seconds)
+        with self._lock:
+            stats = self._get(domain)
+            self._observe(stats, domain, seconds)
+            stats.consecutive_failures = 0
+            stats.blocked_until = 0.0
+
+    def record_failure(self, domain: str, seconds: float, kind: str, timeout_used: Optional[float] = None) -> None:
+        """
+        kind: "timeout", "unreachable" or "error". A timeout under a shortened adaptive timeout only
+        widens the next timeout; full timeouts and unreachable hosts put the domain in the negative cache.
+        """
+        CRAWLER_DOMAIN_FAILURES_TOTAL.labels(kind).inc()
+        with self._lock:
+            stats = self._get(domain)
+            stats.last_error = kind
+            if kind == "timeout":
+                CRAWLER_PAGE_LOAD_SECONDS.observe(seconds)
+                if timeout_used is not None and timeout_used < self.default_timeout:
+                    self._observe(stats, domain, timeout_used * 2)
+                    return
+                self._observe(stats, domain, seconds)
+            elif kind != "unreachable":
+                return
+            stats.consecutive_failures += 1
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** (stats.consecutive_failures - 1))
+            stats.blocked_until = time.time() + backoff
+
+    def record_skip(self) -> None:
+        CRAWLER_DOMAIN_SKIPPED_TOTAL.inc()
+
+    def slowest(self, limit: int = 10) -> List[Dict[str, object]]:
+        with self._lock:
+            items = [(domain, stats) for domain, stats in self._stats.items() if stats.ewma_latency is not None]
+        items.sort(key=lambda item: -(item[1].ewma_latency or 0.0))
+        return [
+            {
+                "domain": domain,
+                "ewma_latency": round(stats.ewma_latency or 0.0, 2),
+                "max_latency": round(stats.max_latency, 2),
+                "visits": stats.visits,
+                "last_error": stats.last_error or None,
+            }
+            for domain, stats in items[:limit]
+        ]
+
+
+domain_health = DomainHealth.from_env()
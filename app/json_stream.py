@@ -0,0 +1,64 @@
+"""Incremental parser of objects of one JSON array inside a streamed structured-output response."""
+
+import json
+from typing import Any, Dict, Iterator, List
+
+
+class JsonArrayStreamParser:
+    """
+    Feed text deltas of a JSON document like {"lots": [{...}, {...}]}; every element of the array
+    under `key` is yielded as soon as its closing brace arrives.
+    """
+
+    def __init__(self, key: str) -> None:
+        self.marker = f'"{key}"'
+        self.buffer = ""
+        self.position = 0
+        self.in_array = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.object_start = -1
+
+    def feed(self, delta: str) -> Iterator[Dict[str, Any]]:
+        self.buffer += delta
+        if not self.in_array:
+            marker_at = self.buffer.find(self.marker)
+            bracket_at = self.buffer.find("[", marker_at + len(self.marker)) if marker_at >= 0 else -1
+            if bracket_at < 0:
+                return
+            self.in_array = True
+            self.position = bracket_at + 1
+
+        completed: List[Dict[str, Any]] = []
+        text = self.buffer
+        for index in range(self.position, len(text)):
+            char = text[index]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+            if char == '"':
+                self.in_string = True
+            elif char == "{":
+                if self.depth == 0:
+                    self.object_start = index
+                self.depth += 1
+            elif char == "}":
+                self.depth -= 1
+                if self.depth == 0 and self.object_start >= 0:
+                    completed.append(json.loads(text[self.object_start : index + 1]))
+                    self.object_start = -1
+        self.position = len(text)
+        # Keep only the unfinished element in memory.
+        if self.depth == 0:
+            self.buffer, self.position = "", 0
+        elif self.object_start > 0:
+            self.buffer = self.buffer[self.object_start :]
+            self.position -= self.object_start
+            self.object_start = 0
+        yield from completed
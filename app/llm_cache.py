@@ -0,0 +1,177 @@
+"""
+Persistent cache of chat completion responses shared by all LLM call sites.
+
+The key covers every parameter that changes the answer (model, messages, response_format,
+sampling and token limits, extra_body). Entries live LLM_CACHE_TTL_SECONDS; when the stored
+responses exceed LLM_CACHE_MAX_BYTES the least recently used ones are evicted.
+Caching is enabled per metric operation: LLM_CACHE_OPERATIONS is a comma-separated list
+("*" for all); online search calls are not cached by default, company_validation never
+(its verdicts are memoized by app.company_verdict_cache).
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from openai.types.chat import ChatCompletion
+from prometheus_client import Counter
+from sqlalchemy import delete, func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import Session, select
+
+from app import cache_settings
+from app.database import engine
+from app.models import LLMResponseCacheEntry
+
+LLM_CACHE_REQUESTS_TOTAL = Counter(
+    "llm_cache_requests_total",
+    "Chat completion cache lookups by operation and result.",
+    ["operation", "result"],
+)
+LLM_CACHE_TOKENS_SAVED_TOTAL = Counter(
+    "llm_cache_tokens_saved_total",
+    "Tokens not spent thanks to chat completion cache hits.",
+    ["operation", "kind"],
+)
+
+DEFAULT_CACHED_OPERATIONS = (
+    "tz_digest",
+    "lots_extraction",
+    "bid_lots_extraction",
+    "application_lots_extraction",
+    "perplexity_contacts_postprocess",
+    "tz_summary",
+    "transform_answer_to_json",
+    "doc_validation",
+    "doc_validation_batch",
+    "lot_comparison_match",
+)
+# Memoized by their own layer on normalized inputs (app.company_verdict_cache): never stored twice.
+UNCACHED_OPERATIONS = frozenset({"company_validation"})
+
+SETTINGS_PREFIX = "LLM_CACHE"
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+# Request parameters that do not change the response and stay out of the key.
+_NON_DETERMINISTIC_KEYS = {"timeout", "extra_headers", "user", "stream_options", "metadata", "store"}
+
+
+def _int_env(name: str, default: int) -> int:
+    raw = (os.getenv(name) or "").strip()
+    try:
+        return int(raw) if raw else default
+    except ValueError:
+        return default
+
+
+def cache_enabled(operation: str) -> bool:
+    if operation in UNCACHED_OPERATIONS or not cache_settings.cache_enabled(SETTINGS_PREFIX, DEFAULT_TTL_SECONDS):
+        return False
+    raw = (os.getenv("LLM_CACHE_OPERATIONS") or "").strip()
+    operations = {item.strip() for item in raw.split(",") if item.strip()} if raw else set(DEFAULT_CACHED_OPERATIONS)
+    return "*" in operations or operation in operations
+
+
+def cache_key(request: Dict[str, Any]) -> str:
+    payload = {key: value for key, value in request.items() if key not in _NON_DETERMINISTIC_KEYS}
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _usage_tokens(response: ChatCompletion) -> Dict[str, int]:
+    usage = response.usage
+    return {
+        "prompt": int(getattr(usage, "prompt_tokens", 0) or 0),
+        "completion": int(getattr(usage, "completion_tokens", 0) or 0),
+    }
+
+
+def get_cached_response(operation: str, key: str) -> Optional[ChatCompletion]:
+    now = datetime.utcnow()
+    try:
+        with Session(engine) as session:
+            entry = session.exec(
+                select(LLMResponseCacheEntry).where(
+                    LLMResponseCacheEntry.cache_key == key,
+                    LLMResponseCacheEntry.expires_at > now,
+                )
+            ).first()
+            if entry is None:
+                LLM_CACHE_REQUESTS_TOTAL.labels(operation, "miss").inc()
+                return None
+            entry.hits += 1
+            entry.last_used_at = now
+            session.add(entry)
+            session.commit()
+            response = ChatCompletion.model_validate_json(entry.response_json)
+    except (SQLAlchemyError, ValueError) as exc:
+        print(f"[llm_cache] lookup failed: {exc}")
+        return None
+    LLM_CACHE_REQUESTS_TOTAL.labels(operation, "hit").inc()
+    for kind, tokens in _usage_tokens(response).items():
+        LLM_CACHE_TOKENS_SAVED_TOTAL.labels(operation, kind).inc(tokens)
+    return response
+
+
+def _evict(session: Session, now: datetime) -> None:
+    cache_settings.purge_expired(session, LLMResponseCacheEntry, now)
+    max_bytes = _int_env("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+    total = session.exec(select(func.coalesce(func.sum(LLMResponseCacheEntry.size_bytes), 0))).one()
+    if total <= max_bytes:
+        return
+    # Drop the least recently used entries down to 90% of the limit (ids and sizes only, not responses).
+    excess = total - int(max_bytes * 0.9)
+    evicted: List[int] = []
+    rows = session.exec(
+        select(LLMResponseCacheEntry.id, LLMResponseCacheEntry.size_bytes).order_by(LLMResponseCacheEntry.last_used_at)
+    )
+    for entry_id, size_bytes in rows:
+        if excess <= 0:
+            break
+        excess -= size_bytes
+        evicted.append(entry_id)
+    if evicted:
+        session.exec(delete(LLMResponseCacheEntry).where(LLMResponseCacheEntry.id.in_(evicted)))
+
+
+def store_response(operation: str, key: str, model: str, response: ChatCompletion) -> None:
+    """Only complete answers are stored: truncated or filtered ones would be replayed forever."""
+    if not response.choices or any(choice.finish_reason != "stop" for choice in response.choices):
+        return
+    now = datetime.utcnow()
+    response_json = response.model_dump_json()
+    tokens = _usage_tokens(response)
+    try:
+        with Session(engine) as session:
+            entry = session.exec(select(LLMResponseCacheEntry).where(LLMResponseCacheEntry.cache_key == key)).first()
+            if entry is None:
+                entry = LLMResponseCacheEntry(cache_key=key, operation=operation, model=model, response_json="", expires_at=now)
+            entry.response_json = response_json
+            entry.size_bytes = len(response_json.encode("utf-8"))
+            entry.prompt_tokens = tokens["prompt"]
+            entry.completion_tokens = tokens["completion"]
+            entry.created_at = now
+            entry.last_used_at = now
+            entry.expires_at = cache_settings.expires_at(SETTINGS_PREFIX, DEFAULT_TTL_SECONDS, now)
+            session.add(entry)
+            _evict(session, now)
+            session.commit()
+    except SQLAlchemyError as exc:
+        # Concurrent store of the same prompt or an unavailable DB: the cache is best effort.
+        print(f"[llm_cache] store failed: {exc}")
+
+
+def cached_chat_completion(operation: str, provider: str, request: Dict[str, Any], create: Callable[[], Any]) -> Any:
+    """Return a cached response for the request or call create() and cache its ChatCompletion."""
+    if request.get("stream") or not cache_enabled(operation):
+        return create()
+    key = cache_key({**request, "provider": provider})
+    cached = get_cached_response(operation, key)
+    if cached is not None:
+        return cached
+    response = create()
+    if isinstance(response, ChatCompletion):
+        store_response(operation, key, str(request.get("model") or ""), response)
+    return response
@@ -0,0 +1,73 @@
+"""
+Process-wide registry of OpenAI-compatible clients.
+
+One client per (provider, base URL, API key) is built lazily and reused, so the TLS session
+and the keep-alive connection pool survive between calls. Pools and timeouts are tuned with
+LLM_HTTP_MAX_CONNECTIONS, LLM_HTTP_MAX_KEEPALIVE, LLM_HTTP_KEEPALIVE_SECONDS,
+LLM_HTTP_TIMEOUT_SECONDS and LLM_HTTP_CONNECT_TIMEOUT_SECONDS.
+The SDK's own retries are off: app.llm_gateway retries with provider-wide circuit breakers.
+"""
+
+import hashlib
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import httpx
+from openai import OpenAI
+
+_clients: Dict[Tuple[str, Optional[str], str], OpenAI] = {}
+_lock = threading.Lock()
+
+
+def _float_env(name: str, default: float) -> float:
+    raw = (os.getenv(name) or "").strip()
+    try:
+        return float(raw) if raw else default
+    except ValueError:
+        return default
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(_float_env("LLM_HTTP_MAX_CONNECTIONS", 32)),
+        max_keepalive_connections=int(_float_env("LLM_HTTP_MAX_KEEPALIVE", 16)),
+        keepalive_expiry=_float_env("LLM_HTTP_KEEPALIVE_SECONDS", 90),
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    # Long structured generations and online search answers take minutes; connecting must not.
+    return httpx.Timeout(
+        _float_env("LLM_HTTP_TIMEOUT_SECONDS", 600), connect=_float_env("LLM_HTTP_CONNECT_TIMEOUT_SECONDS", 10)
+    )
+
+
+def _key(provider: str, base_url: Optional[str], api_key: str) -> Tuple[str, Optional[str], str]:
+    # Keys are not kept in plain text in the registry.
+    return provider, (base_url or None), hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def get_client(provider: str, api_key: str, base_url: Optional[str] = None) -> OpenAI:
+    """Shared sync client; provider only separates the pools (and metrics) of different backends."""
+    key = _key(provider, base_url, api_key)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAI(
+                api_key=api_key,
+                base_url=base_url or None,
+                max_retries=0,
+                timeout=_timeout(),
+                http_client=httpx.Client(limits=_limits(), timeout=_timeout()),
+            )
+            _clients[key] = client
+        return client
+
+
+def close_clients() -> None:
+    """Close the connection pools (worker shutdown)."""
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
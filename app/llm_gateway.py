@@ -0,0 +1,284 @@
+"""
+Single entry point of all LLM requests: retries, circuit breakers, deadlines, fallbacks, metrics.
+
+    response = llm_gateway.call("lots_extraction", "openai", request, send, client=client)
+
+send(client, request) performs the request (chat completion, raw response, embeddings) and
+returns the parsed response. The gateway
+- retries 408/409/429/5xx, connection errors and timeouts with exponential backoff and jitter
+  (Retry-After is honoured), at most LLM_MAX_RETRIES times;
+- keeps a circuit breaker per provider: after LLM_BREAKER_FAILURES consecutive availability
+  failures calls fail fast with LLMUnavailableError for LLM_BREAKER_COOLDOWN_SECONDS, then one
+  probe request decides whether the provider is back;
+- caps every attempt by the caller's deadline (the deadline argument or llm_deadline() scope,
+  absolute time.monotonic() values): no retry or wait outlives it;
+- when the provider stays unavailable, repeats the request on LLM_FALLBACK_<OPERATION> or
+  LLM_FALLBACK_<PROVIDER> ("provider:model", e.g. LLM_FALLBACK_OPENAI=openrouter:openai/gpt-4o-mini);
+- records requests, latency and token usage labelled by provider, model and operation, next to
+  the local prompt estimate and the caller's expected completion size (app.token_preflight);
+  streamed responses carry their usage in the last chunk and are recorded by the consumer.
+Client errors (400, 401, 404, 422...) are raised at once: another attempt would fail the same way.
+"""
+
+import contextvars
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import openai
+from openai import OpenAI
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.llm_clients import get_client
+from app.llm_metrics import record_llm_usage
+from app.token_preflight import count_request_tokens
+
+LLM_REQUESTS_TOTAL = Counter(
+    "llm_requests_total",
+    "LLM request attempts by provider, model, operation and outcome.",
+    ["provider", "model", "operation", "outcome"],
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_seconds",
+    "Latency of successful LLM request attempts.",
+    ["provider", "operation"],
+    buckets=(0.5, 1, 2, 5, 10, 20, 40, 60, 120, 300, 600),
+)
+LLM_CIRCUIT_OPEN = Gauge(
+    "llm_circuit_open",
+    "1 while the provider's circuit breaker is open.",
+    ["provider"],
+)
+
+# Provider -> (API key env, base URL env, default base URL).
+PROVIDERS: Dict[str, Tuple[str, str, Optional[str]]] = {
+    "openai": ("OPENAI_API_KEY", "OPENAI_BASE_URL", None),
+    "openrouter": ("OPENROUTER_API_KEY", "OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
+}
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+MAX_BACKOFF_SECONDS = 30.0
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("llm_deadline", default=None)
+
+
+class LLMUnavailableError(RuntimeError):
+    """The provider is down (circuit open, retries exhausted) or the caller's deadline has passed."""
+
+
+def _float_env(name: str, default: float) -> float:
+    raw = (os.getenv(name) or "").strip()
+    try:
+        return float(raw) if raw else default
+    except ValueError:
+        return default
+
+
+@contextmanager
+def llm_deadline(deadline: Optional[float]) -> Iterator[None]:
+    """Deadline (time.monotonic()) of every gateway call made in this context, e.g. a worker task."""
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+class CircuitBreaker:
+    def __init__(self, provider: str) -> None:
+        self.provider = provider
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < _float_env("LLM_BREAKER_COOLDOWN_SECONDS", 30):
+                return False
+            # Half-open: a single probe request goes through.
+            if self.probing:
+                return False
+            self.probing = True
+            return True
+
+    def success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+        LLM_CIRCUIT_OPEN.labels(self.provider).set(0)
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= _float_env("LLM_BREAKER_FAILURES", 5):
+                self.opened_at = time.monotonic()
+                self.probing = False
+                opened = True
+            else:
+                opened = False
+        if opened:
+            LLM_CIRCUIT_OPEN.labels(self.provider).set(1)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(provider: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(provider)
+        return _breakers[provider]
+
+
+def provider_client(provider: str) -> OpenAI:
+    api_key_env, base_url_env, default_base_url = PROVIDERS[provider]
+    api_key = os.getenv(api_key_env)
+    if not api_key:
+        raise RuntimeError(f"{api_key_env} is not configured")
+    return get_client(provider, api_key=api_key, base_url=os.getenv(base_url_env) or default_base_url)
+
+
+def _retry_delay(exc: Exception) -> Optional[float]:
+    """Seconds to wait before the next attempt, None for errors that must not be retried."""
+    if isinstance(exc, openai.APIConnectionError):  # includes APITimeoutError
+        return 0.0
+    if isinstance(exc, openai.APIStatusError) and exc.status_code in RETRYABLE_STATUS_CODES:
+        retry_after = exc.response.headers.get("retry-after") if exc.response is not None else None
+        try:
+            return min(float(retry_after), MAX_BACKOFF_SECONDS) if retry_after else 0.0
+        except ValueError:
+            return 0.0
+    return None
+
+
+def _fallback(operation: str, provider: str) -> Optional[Tuple[str, str]]:
+    for name in (f"LLM_FALLBACK_{operation.upper()}", f"LLM_FALLBACK_{provider.upper()}"):
+        raw = (os.getenv(name) or "").strip()
+        if not raw:
+            continue
+        fallback_provider, _, model = raw.partition(":")
+        if fallback_provider not in PROVIDERS or not model:
+            print(f"[llm_gateway] ignoring {name}={raw!r}: expected provider:model")
+            return None
+        return fallback_provider, model
+    return None
+
+
+def _attempts(
+    operation: str,
+    provider: str,
+    request: Dict[str, Any],
+    send: Callable[[OpenAI, Dict[str, Any]], Any],
+    client: OpenAI,
+    deadline: Optional[float],
+    expected_completion_tokens: Optional[int] = None,
+) -> Any:
+    model = str(request.get("model") or "")
+    estimated_prompt_tokens = count_request_tokens(request)
+    circuit = breaker(provider)
+    max_retries = int(_float_env("LLM_MAX_RETRIES", 3))
+    base_delay = _float_env("LLM_RETRY_BASE_SECONDS", 1.0)
+    for attempt in range(max_retries + 1):
+        # The deadline is checked first: a caller that cannot send must not take the half-open probe slot.
+        remaining = deadline - time.monotonic() if deadline is not None else None
+        if remaining is not None and remaining <= 0:
+            LLM_REQUESTS_TOTAL.labels(provider, model, operation, "deadline").inc()
+            raise LLMUnavailableError(f"{operation}: deadline exceeded before the request")
+        if not circuit.allow():
+            LLM_REQUESTS_TOTAL.labels(provider, model, operation, "circuit_open").inc()
+            raise LLMUnavailableError(f"{provider} circuit breaker is open")
+        payload = dict(request)
+        if remaining is not None:
+            payload["timeout"] = min(float(payload.get("timeout") or remaining), remaining)
+        started = time.monotonic()
+        try:
+            response = send(client, payload)
+        except Exception as exc:  # noqa: BLE001
+            delay = _retry_delay(exc)
+            if delay is None:
+                # The provider answered: it is up, the request is wrong.
+                circuit.success()
+                LLM_REQUESTS_TOTAL.labels(provider, model, operation, "error").inc()
+                raise
+            circuit.failure()
+            delay = max(delay, random.uniform(0, min(MAX_BACKOFF_SECONDS, base_delay * 2**attempt)))
+            out_of_time = deadline is not None and time.monotonic() + delay >= deadline
+            if attempt >= max_retries or out_of_time:
+                LLM_REQUESTS_TOTAL.labels(provider, model, operation, "unavailable").inc()
+                raise LLMUnavailableError(f"{provider} unavailable for {operation}: {exc}") from exc
+            LLM_REQUESTS_TOTAL.labels(provider, model, operation, "retry").inc()
+            print(f"[llm_gateway] {operation} via {provider} failed ({exc}), retry {attempt + 1} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        circuit.success()
+        LLM_REQUESTS_TOTAL.labels(provider, model, operation, "success").inc()
+        LLM_REQUEST_SECONDS.labels(provider, operation).observe(time.monotonic() - started)
+        if request.get("stream"):
+            return response
+        try:
+            record_llm_usage(
+                response,
+                provider=provider,
+                model=model,
+                operation=operation,
+                estimated_prompt_tokens=estimated_prompt_tokens,
+                estimated_completion_tokens=expected_completion_tokens,
+            )
+        except Exception as exc:  # noqa: BLE001
+            print(f"[metrics] failed to record llm usage: {exc}")
+        return response
+    raise LLMUnavailableError(f"{provider} unavailable for {operation}")
+
+
+def call(
+    operation: str,
+    provider: str,
+    request: Dict[str, Any],
+    send: Callable[[OpenAI, Dict[str, Any]], Any],
+    client: Optional[OpenAI] = None,
+    deadline: Optional[float] = None,
+    allow_fallback: bool = True,
+    expected_completion_tokens: Optional[int] = None,
+) -> Any:
+    """
+    Send the request through the provider's breaker and retries, then through the fallback.
+    allow_fallback=False for requests no other model can serve (embeddings of a fixed space).
+    expected_completion_tokens is the caller's output size prediction, recorded with the usage.
+    """
+    scoped = _deadline.get()
+    if deadline is None or (scoped is not None and scoped < deadline):
+        deadline = scoped
+    try:
+        return _attempts(
+            operation,
+            provider,
+            request,
+            send,
+            client or provider_client(provider),
+            deadline,
+            expected_completion_tokens,
+        )
+    except LLMUnavailableError as exc:
+        fallback = _fallback(operation, provider) if allow_fallback else None
+        if fallback is None or (deadline is not None and deadline <= time.monotonic()):
+            raise
+        fallback_provider, fallback_model = fallback
+        print(f"[llm_gateway] {operation}: {exc}; falling back to {fallback_provider}:{fallback_model}")
+        LLM_REQUESTS_TOTAL.labels(provider, str(request.get("model") or ""), operation, "fallback").inc()
+        return _attempts(
+            operation,
+            fallback_provider,
+            {**request, "model": fallback_model},
+            send,
+            provider_client(fallback_provider),
+            deadline,
+            expected_completion_tokens,
+        )
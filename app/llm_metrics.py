@@ -1,18 +1,44 @@
-from typing import Any
+from typing import Any, Optional
 
-from prometheus_client import Counter
+from prometheus_client import Counter, Histogram
 
 LLM_TOKENS_INPUT_TOTAL = Counter(
     "llm_tokens_input_total",
     "Total number of input (prompt) tokens used by LLM calls.",
+    ["provider", "model", "operation"],
 )
 LLM_TOKENS_COMPLETION_TOTAL = Counter(
     "llm_tokens_completion_total",
     "Total number of completion tokens used by LLM calls.",
+    ["provider", "model", "operation"],
 )
 LLM_TOKENS_REASONING_TOTAL = Counter(
     "llm_tokens_reasoning_total",
     "Total number of reasoning tokens used by LLM calls.",
+    ["provider", "model", "operation"],
+)
+
+# Pre-call estimates (app.token_preflight) recorded next to the actual usage for calibration.
+LLM_TOKENS_INPUT_ESTIMATED_TOTAL = Counter(
+    "llm_tokens_input_estimated_total",
+    "Locally estimated input (prompt) tokens of LLM calls.",
+    ["provider", "model", "operation"],
+)
+LLM_TOKENS_COMPLETION_ESTIMATED_TOTAL = Counter(
+    "llm_tokens_completion_estimated_total",
+    "Predicted completion tokens of LLM calls.",
+    ["provider", "model", "operation"],
+)
+LLM_TOKEN_ESTIMATE_RATIO = Histogram(
+    "llm_token_estimate_ratio",
+    "Actual / estimated tokens per call, by kind (prompt, completion).",
+    ["operation", "kind"],
+    buckets=(0.25, 0.5, 0.75, 0.9, 1.0, 1.1, 1.25, 1.5, 2.0, 3.0, 5.0),
+)
+LLM_COMPLETION_TRUNCATED_TOTAL = Counter(
+    "llm_completion_truncated_total",
+    "LLM responses cut by the completion token limit (finish_reason=length).",
+    ["provider", "model", "operation"],
 )
 
 
@@ -31,8 +57,21 @@ def _usage_value(obj: Any, attr: str) -> Any:
     return getattr(obj, attr, None)
 
 
-def record_llm_usage(response: Any, provider: str, model: str, operation: str) -> None:
-    _ = (provider, model, operation)
+def _finish_reason(response: Any) -> Any:
+    choices = _usage_value(response, "choices")
+    if not choices:
+        return None
+    return _usage_value(choices[0], "finish_reason")
+
+
+def record_llm_usage(
+    response: Any,
+    provider: str,
+    model: str,
+    operation: str,
+    estimated_prompt_tokens: Optional[int] = None,
+    estimated_completion_tokens: Optional[int] = None,
+) -> None:
     usage = _usage_value(response, "usage")
     prompt_tokens = _to_int(_usage_value(usage, "prompt_tokens"))
     completion_tokens = _to_int(_usage_value(usage, "completion_tokens"))
@@ -40,6 +79,19 @@ def record_llm_usage(response: Any, provider: str, model: str, operation: str) -
     completion_details = _usage_value(usage, "completion_tokens_details")
     reasoning_tokens = _to_int(_usage_value(completion_details, "reasoning_tokens"))
 
-    LLM_TOKENS_INPUT_TOTAL.inc(prompt_tokens)
-    LLM_TOKENS_COMPLETION_TOTAL.inc(completion_tokens)
-    LLM_TOKENS_REASONING_TOTAL.inc(reasoning_tokens)
+    labels = (provider, model, operation)
+    LLM_TOKENS_INPUT_TOTAL.labels(*labels).inc(prompt_tokens)
+    LLM_TOKENS_COMPLETION_TOTAL.labels(*labels).inc(completion_tokens)
+    LLM_TOKENS_REASONING_TOTAL.labels(*labels).inc(reasoning_tokens)
+    if _finish_reason(response) == "length":
+        LLM_COMPLETION_TRUNCATED_TOTAL.labels(*labels).inc()
+
+    for kind, estimated, actual, counter in (
+        ("prompt", estimated_prompt_tokens, prompt_tokens, LLM_TOKENS_INPUT_ESTIMATED_TOTAL),
+        ("completion", estimated_completion_tokens, completion_tokens, LLM_TOKENS_COMPLETION_ESTIMATED_TOTAL),
+    ):
+        if not estimated:
+            continue
+        counter.labels(*labels).inc(estimated)
+        if actual:
+            LLM_TOKEN_ESTIMATE_RATIO.labels(operation, kind).observe(actual / estimated)
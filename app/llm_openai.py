@@ -1,10 +1,17 @@
 import json
 import os
+import re
 from dataclasses import dataclass
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional
 
 from openai import OpenAI
+from app import llm_gateway
+from app.llm_cache import cached_chat_completion
+from app.llm_clients import get_client
 from app.llm_metrics import record_llm_usage
+from app.json_stream import JsonArrayStreamParser
+from app.prompt_compaction import compact_terms_text
+from app.token_preflight import plan_completion
 try:
     from app.lots_extraction_prompting import (
         build_application_lots_prompt_and_schema,
@@ -25,19 +32,39 @@ class GeneratedSearchPlan:
     note: str
 
 
-SEARCH_QUERIES_SCHEMA: Dict[str, Any] = {
-    "name": "search_queries_generation",
+TZ_DIGEST_SCHEMA: Dict[str, Any] = {
+    "name": "tz_digest",
     "schema": {
         "type": "object",
         "properties": {
+            "item": {"type": "string"},
+            "summary_spec": {"type": "string"},
+            "product_groups": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "group_name": {"type": "string"},
+                        "short_description": {"type": "string"},
+                    },
+                    "required": ["group_name", "short_description"],
+                    "additionalProperties": False,
+                },
+            },
+            "supplier_queries": {
+                "type": "array",
+                "items": {"type": "string"},
+                "minItems": 2,
+                "maxItems": 3,
+            },
             "queries": {
                 "type": "array",
                 "items": {"type": "string"},
                 "minItems": 5,
                 "maxItems": 10,
-            }
+            },
         },
-        "required": ["queries"],
+        "required": ["item", "summary_spec", "product_groups", "supplier_queries", "queries"],
         "additionalProperties": False,
     },
     "strict": True,
@@ -94,9 +121,26 @@ def _raw_create_chat_completion(
     client: OpenAI,
     metric_provider: str = "openai",
     metric_operation: str = "unknown",
+    expected_completion_tokens: Optional[int] = None,
     **kwargs,
 ):
     request_payload = _with_reasoning_disabled(kwargs)
+    return cached_chat_completion(
+        metric_operation,
+        metric_provider,
+        request_payload,
+        lambda: llm_gateway.call(
+            metric_operation,
+            metric_provider,
+            request_payload,
+            _send_logged,
+            client=client,
+            expected_completion_tokens=expected_completion_tokens,
+        ),
+    )
+
+
+def _send_logged(client: OpenAI, request_payload: Dict[str, Any]):
     raw_response = client.chat.completions.with_raw_response.create(**request_payload)
     status_code = getattr(raw_response, "status_code", None)
     raw_text = None
@@ -117,17 +161,7 @@ def _raw_create_chat_completion(
 
     print(f"[openai] status_code={status_code}")
     print(f"[openai] raw_response={raw_text}")
-    parsed_response = raw_response.parse()
-    try:
-        record_llm_usage(
-            parsed_response,
-            provider=metric_provider,
-            model=str(request_payload.get("model") or ""),
-            operation=metric_operation,
-        )
-    except Exception as exc:  # noqa: BLE001
-        print(f"[metrics] failed to record llm usage: {exc}")
-    return parsed_response
+    return raw_response.parse()
 
 
 def _log_prompt(tag: str, messages: List[Dict[str, str]]) -> None:
@@ -149,18 +183,25 @@ def _deduplicate_queries(raw_queries: List[str]) -> List[str]:
     return unique
 
 
-def _build_search_queries_prompt(terms_text: str, hints: List[str]) -> List[Dict[str, str]]:
+def _build_tz_digest_prompt(terms_text: str, hints: List[str]) -> List[Dict[str, str]]:
     hints_text = ", ".join([h.strip() for h in hints if h and h.strip()]) or "нет"
     system_message = (
-        "Вы генерируете поисковые запросы для Яндекса по техническому заданию закупки. "
-        "Верните только JSON по схеме. Нужны 5-10 коротких, практичных, коммерчески ориентированных "
-        "запросов на русском языке для поиска поставщиков. "
-        "Добавляйте вариации: оптовый поставщик, дилер, дистрибьютор, производитель, купить оптом."
+        "Вы готовите сводку технического задания закупки для поиска ОДНОГО поставщика, который закроет весь "
+        "перечень, и поисковые запросы для Яндекса. Верните только JSON по схеме, все формулировки на русском."
     )
     user_message = (
-        f"Техническое задание:\n{terms_text}\n\n"
+        f"Техническое задание:\n{compact_terms_text(terms_text, 'tz_digest')}\n\n"
         f"Подсказки пользователя: {hints_text}\n\n"
-        "Сформируйте запросы только для поиска потенциальных поставщиков."
+        "Заполните поля:\n"
+        "- item: обобщённое наименование закупки в 1–2 строках;\n"
+        "- summary_spec: сжатое описание ассортимента и требований (3–5 предложений), без перечисления позиций "
+        "поштучно и без выдуманных характеристик;\n"
+        "- product_groups: группы продукции (название и 2–3 предложения о специфике и диапазонах "
+        "характеристик); если групп нет — одна группа;\n"
+        "- supplier_queries: 2–3 самых релевантных запроса для поиска поставщиков/производителей "
+        "(слова вида 'поставщик', 'опт', 'официальный дилер', 'производитель'), от самого релевантного;\n"
+        "- queries: 5–10 коротких коммерчески ориентированных запросов с вариациями: оптовый поставщик, "
+        "дилер, дистрибьютор, производитель, купить оптом."
     )
     return [
         {"role": "system", "content": system_message},
@@ -168,49 +209,53 @@ def _build_search_queries_prompt(terms_text: str, hints: List[str]) -> List[Dict
     ]
 
 
-def build_search_queries(terms_text: str, hints: List[str] | None = None) -> GeneratedSearchPlan:
+def build_tz_digest(terms_text: str, hints: List[str] | None = None) -> Dict[str, Any]:
+    """
+    One structured call that digests the technical task for every search stage.
+
+    Returns:
+        {"item", "summary_spec", "product_groups", "search_queries", "queries", "note"}:
+        search_queries are the 2–3 Yandex queries of the supplier pipeline
+        (summarize_tz_for_single_supplier format), queries/note the GeneratedSearchPlan.
+    """
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY is not configured")
 
     base_url = os.getenv("OPENAI_BASE_URL")
-    client = OpenAI(api_key=api_key, base_url=base_url)
+    client = get_client("openai", api_key=api_key, base_url=base_url)
     model = os.getenv("OPENAI_MODEL", "gpt-5-mini")
 
-    messages = _build_search_queries_prompt(terms_text or "", hints or [])
-    _log_prompt("search_queries_generation", messages)
-    try:
-        response = _raw_create_chat_completion(
-            client,
-            metric_provider="openai",
-            metric_operation="search_queries_generation",
-            model=model,
-            messages=messages,
-            response_format={"type": "json_schema", "json_schema": SEARCH_QUERIES_SCHEMA},
-            max_completion_tokens=1200,
-        )
-    except Exception as exc:  # noqa: BLE001
-        print(f"[search_queries_generation] openai_request_failed: {exc}")
-        raise
-
+    messages = _build_tz_digest_prompt(terms_text or "", hints or [])
+    _log_prompt("tz_digest", messages)
+    response_format = {"type": "json_schema", "json_schema": TZ_DIGEST_SCHEMA}
+    plan = plan_completion("tz_digest", messages, source_text=terms_text or "", response_format=response_format)
+    response = _raw_create_chat_completion(
+        client,
+        metric_provider="openai",
+        metric_operation="tz_digest",
+        expected_completion_tokens=plan.expected,
+        model=model,
+        messages=messages,
+        response_format=response_format,
+        max_completion_tokens=plan.limit,
+    )
     output_text = response.choices[0].message.content if response.choices else None
     if not output_text:
-        raise RuntimeError("Empty response from OpenAI while generating search queries")
-
-    try:
-        payload = json.loads(output_text)
-    except Exception as exc:  # noqa: BLE001
-        print(f"[search_queries_generation] json_parse_failed: {exc}; raw_output={output_text}")
-        raise
+        raise RuntimeError("Empty response from OpenAI while building the TZ digest")
+    payload = json.loads(output_text)
 
     queries = _deduplicate_queries(payload.get("queries") or [])
     if len(queries) < 5:
         raise RuntimeError("OpenAI returned too few search queries")
-
-    return GeneratedSearchPlan(
-        queries=queries[:10],
-        note=f"Запросы сгенерированы LLM ({model}).",
-    )
+    return {
+        "item": (payload.get("item") or "").strip(),
+        "summary_spec": (payload.get("summary_spec") or "").strip(),
+        "product_groups": payload.get("product_groups") or [],
+        "search_queries": _deduplicate_queries(payload.get("supplier_queries") or []),
+        "queries": queries[:10],
+        "note": f"Запросы сгенерированы LLM ({model}).",
+    }
 
 
 _LOTS_PROMPT_STUB, LOTS_SCHEMA = build_lots_prompt_and_schema("")
@@ -229,20 +274,23 @@ def extract_lots(terms_text: str) -> Dict[str, Any]:
         raise RuntimeError("OPENAI_API_KEY is not configured")
 
     base_url = os.getenv("OPENAI_BASE_URL")
-    client = OpenAI(api_key=api_key, base_url=base_url)
+    client = get_client("openai", api_key=api_key, base_url=base_url)
     model = os.getenv("OPENAI_MODEL", "gpt-5-mini")
 
     messages = _build_lots_prompt(terms_text)
     _log_prompt("lots_extraction", messages)
+    response_format = {"type": "json_schema", "json_schema": LOTS_SCHEMA}
+    plan = plan_completion("lots_extraction", messages, source_text=terms_text, response_format=response_format)
     try:
         response = _raw_create_chat_completion(
             client,
             metric_provider="openai",
             metric_operation="lots_extraction",
+            expected_completion_tokens=plan.expected,
             model=model,
             messages=messages,
-            response_format={"type": "json_schema", "json_schema": LOTS_SCHEMA},
-            max_completion_tokens=5000,
+            response_format=response_format,
+            max_completion_tokens=plan.limit,
         )
     except Exception as exc:  # noqa: BLE001
         print(f"[lots_extraction] openai_request_failed: {exc}")
@@ -259,6 +307,74 @@ def extract_lots(terms_text: str) -> Dict[str, Any]:
         raise
 
 
+def _send_stream(client: OpenAI, request_payload: Dict[str, Any]):
+    return client.chat.completions.create(**request_payload)
+
+
+def stream_lots(terms_text: str) -> Iterator[Dict[str, Any]]:
+    """
+    extract_lots with a streamed response: every lot is yielded as soon as its JSON object is
+    complete, so the caller can persist it while the model is still writing the next ones.
+    Raises when the stream ends without a complete {"lots": [...]} document.
+    """
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY is not configured")
+
+    base_url = os.getenv("OPENAI_BASE_URL")
+    client = get_client("openai", api_key=api_key, base_url=base_url)
+    model = os.getenv("OPENAI_MODEL", "gpt-5-mini")
+
+    messages = _build_lots_prompt(terms_text)
+    _log_prompt("lots_extraction", messages)
+    response_format = {"type": "json_schema", "json_schema": LOTS_SCHEMA}
+    plan = plan_completion("lots_extraction", messages, source_text=terms_text, response_format=response_format)
+    request_payload = _with_reasoning_disabled(
+        {
+            "model": model,
+            "messages": messages,
+            "response_format": response_format,
+            "max_completion_tokens": plan.limit,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+    )
+    stream = llm_gateway.call("lots_extraction", "openai", request_payload, _send_stream, client=client)
+
+    parser = JsonArrayStreamParser("lots")
+    output_parts: List[str] = []
+    usage = None
+    finish_reason = None
+    for chunk in stream:
+        usage = getattr(chunk, "usage", None) or usage
+        for choice in chunk.choices or []:
+            finish_reason = choice.finish_reason or finish_reason
+            delta = choice.delta.content if choice.delta else None
+            if delta:
+                output_parts.append(delta)
+                yield from parser.feed(delta)
+
+    # The gateway saw only the stream object; the usage arrives with the last chunk.
+    try:
+        record_llm_usage(
+            {"usage": usage, "choices": [{"finish_reason": finish_reason}]},
+            provider="openai",
+            model=model,
+            operation="lots_extraction",
+            estimated_prompt_tokens=plan.prompt_tokens,
+            estimated_completion_tokens=plan.expected,
+        )
+    except Exception as exc:  # noqa: BLE001
+        print(f"[metrics] failed to record llm usage: {exc}")
+
+    output_text = "".join(output_parts)
+    try:
+        json.loads(output_text)
+    except Exception as exc:  # noqa: BLE001
+        print(f"[lots_extraction] stream_incomplete: finish_reason={finish_reason}; {exc}; raw_output={output_text}")
+        raise RuntimeError(f"Incomplete streamed lots response (finish_reason={finish_reason})") from exc
+
+
 def _build_bid_lots_prompt(terms_text: str) -> List[Dict[str, str]]:
     prompt, _ = build_bid_lots_prompt_and_schema(terms_text or "")
     return [{"role": "user", "content": prompt}]
@@ -270,20 +386,23 @@ def extract_bid_lots(terms_text: str) -> Dict[str, Any]:
         raise RuntimeError("OPENAI_API_KEY is not configured")
 
     base_url = os.getenv("OPENAI_BASE_URL")
-    client = OpenAI(api_key=api_key, base_url=base_url)
+    client = get_client("openai", api_key=api_key, base_url=base_url)
     model = os.getenv("OPENAI_MODEL", "gpt-5-mini")
 
     messages = _build_bid_lots_prompt(terms_text)
     _log_prompt("bid_lots_extraction", messages)
+    response_format = {"type": "json_schema", "json_schema": LOTS_WITH_PRICE_SCHEMA}
+    plan = plan_completion("bid_lots_extraction", messages, source_text=terms_text, response_format=response_format)
     try:
         response = _raw_create_chat_completion(
             client,
             metric_provider="openai",
             metric_operation="bid_lots_extraction",
+            expected_completion_tokens=plan.expected,
             model=model,
             messages=messages,
-            response_format={"type": "json_schema", "json_schema": LOTS_WITH_PRICE_SCHEMA},
-            max_completion_tokens=2000,
+            response_format=response_format,
+            max_completion_tokens=plan.limit,
         )
     except Exception as exc:  # noqa: BLE001
         print(f"[bid_lots_extraction] openai_request_failed: {exc}")
@@ -311,20 +430,23 @@ def extract_application_lots(terms_text: str) -> Dict[str, Any]:
         raise RuntimeError("OPENAI_API_KEY is not configured")
 
     base_url = os.getenv("OPENAI_BASE_URL")
-    client = OpenAI(api_key=api_key, base_url=base_url)
+    client = get_client("openai", api_key=api_key, base_url=base_url)
     model = os.getenv("OPENAI_MODEL", "gpt-5-mini")
 
     messages = _build_application_lots_prompt(terms_text)
     _log_prompt("application_lots_extraction", messages)
+    response_format = {"type": "json_schema", "json_schema": APPLICATION_LOTS_WITH_PRICE_SCHEMA}
+    plan = plan_completion("application_lots_extraction", messages, source_text=terms_text, response_format=response_format)
     try:
         response = _raw_create_chat_completion(
             client,
             metric_provider="openai",
             metric_operation="application_lots_extraction",
+            expected_completion_tokens=plan.expected,
             model=model,
             messages=messages,
-            response_format={"type": "json_schema", "json_schema": APPLICATION_LOTS_WITH_PRICE_SCHEMA},
-            max_completion_tokens=2500,
+            response_format=response_format,
+            max_completion_tokens=plan.limit,
         )
     except Exception as exc:  # noqa: BLE001
         print(f"[application_lots_extraction] openai_request_failed: {exc}")
@@ -341,13 +463,16 @@ def extract_application_lots(terms_text: str) -> Dict[str, Any]:
         raise
 
 
+_SITE_RE = re.compile(r"(?:https?://|www\.)([\w.-]+\.[a-zа-я]{2,})", re.IGNORECASE)
+
+
 def extract_structured_contacts_from_perplexity(raw_answer: str, terms_text: str) -> Dict[str, Any]:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY is not configured")
 
     base_url = os.getenv("OPENAI_BASE_URL")
-    client = OpenAI(api_key=api_key, base_url=base_url)
+    client = get_client("openai", api_key=api_key, base_url=base_url)
     model = os.getenv("OPENAI_MODEL", "gpt-5-mini")
 
     messages = [
@@ -363,7 +488,7 @@ def extract_structured_contacts_from_perplexity(raw_answer: str, terms_text: str
             "role": "user",
             "content": (
                 "Техническое задание:\n"
-                f"{terms_text}\n\n"
+                f"{compact_terms_text(terms_text, 'perplexity_contacts_postprocess')}\n\n"
                 "Ответ Perplexity:\n"
                 f"{raw_answer}\n\n"
                 "Выдели только потенциальных поставщиков и их веб-сайты. "
@@ -372,15 +497,22 @@ def extract_structured_contacts_from_perplexity(raw_answer: str, terms_text: str
         },
     ]
     _log_prompt("perplexity_contacts_postprocess", messages)
+    response_format = {"type": "json_schema", "json_schema": PERPLEXITY_SUPPLIERS_SCHEMA}
+    # One supplier entry per site mentioned in the answer.
+    mentioned_sites = {match.lower() for match in _SITE_RE.findall(raw_answer or "")}
+    plan = plan_completion(
+        "perplexity_contacts_postprocess", messages, rows=len(mentioned_sites), response_format=response_format
+    )
 
     response = _raw_create_chat_completion(
         client,
         metric_provider="openai",
         metric_operation="perplexity_contacts_postprocess",
+        expected_completion_tokens=plan.expected,
         model=model,
         messages=messages,
-        response_format={"type": "json_schema", "json_schema": PERPLEXITY_SUPPLIERS_SCHEMA},
-        max_completion_tokens=2200,
+        response_format=response_format,
+        max_completion_tokens=plan.limit,
     )
     output_text = response.choices[0].message.content if response.choices else None
     if not output_text:
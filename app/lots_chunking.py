@@ -0,0 +1,196 @@
+"""
+Chunked lots extraction for technical tasks too long for one extract_lots response.
+
+The text is split along section boundaries (blank lines, headings) and HTML table rows
+(doc-to-md output): a long table is cut into row groups, every group repeats the header rows
+and is preferably cut before a row that starts a new numbered item. Chunks are extracted
+concurrently and merged in document order. The first lot of a chunk is glued onto the previous
+chunk's last lot only when the chunk starts with continuation rows of that item (same name) or
+when both are the same item (name, units, count and parameter values agree); lots that merely
+share a name stay separate.
+"""
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Any, Dict, List, Optional, Tuple
+
+from .llm_openai import extract_lots
+
+_TABLE_RE = re.compile(r"<table\b[\s\S]*?</table>", re.IGNORECASE)
+_ROW_RE = re.compile(r"<tr\b[\s\S]*?</tr>", re.IGNORECASE)
+_CELL_RE = re.compile(r"<t[hd]\b[^>]*>([\s\S]*?)</t[hd]>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_SECTION_BREAK_RE = re.compile(r"\n\s*\n|\n(?=#{1,6} )")
+_ITEM_NUMBER_RE = re.compile(r"^\d{1,4}(?:\.\d{1,3})*[.)]?$")
+
+
+def _int_env(name: str, default: int) -> int:
+    raw = (os.getenv(name) or "").strip()
+    try:
+        return int(raw) if raw else default
+    except ValueError:
+        return default
+
+
+def _first_cell(row: str) -> str:
+    match = _CELL_RE.search(row)
+    return _TAG_RE.sub("", match.group(1)).strip() if match else ""
+
+
+def _split_table(table: str, max_chars: int) -> List[Tuple[str, bool]]:
+    """Row groups of the table as (part, starts_mid_item): True when the part begins with continuation rows."""
+    rows = _ROW_RE.findall(table)
+    if len(table) <= max_chars or len(rows) < 2:
+        return [(table, False)]
+    # Header: leading rows before the first numbered item row (at least one).
+    header_size = next((idx for idx, row in enumerate(rows) if _ITEM_NUMBER_RE.match(_first_cell(row))), 1) or 1
+    header = "".join(rows[:header_size])
+    budget = max(max_chars - len(header) - len("<table></table>"), 1)
+
+    parts: List[Tuple[str, bool]] = []
+    group: List[str] = []
+    size = 0
+
+    def add_part(rows_of_part: List[str]) -> None:
+        starts_mid_item = bool(parts) and not _ITEM_NUMBER_RE.match(_first_cell(rows_of_part[0]))
+        parts.append((f"<table>{header}{''.join(rows_of_part)}</table>", starts_mid_item))
+
+    for row in rows[header_size:]:
+        if group and size + len(row) > budget:
+            # Cut before the last numbered item row so that an item keeps its continuation rows.
+            cut = max((idx for idx, item in enumerate(group) if _ITEM_NUMBER_RE.match(_first_cell(item))), default=0)
+            cut = cut or len(group)
+            add_part(group[:cut])
+            group = group[cut:]
+            size = sum(len(item) for item in group)
+        group.append(row)
+        size += len(row)
+    if group:
+        add_part(group)
+    return parts
+
+
+def _segments(terms_text: str, max_chars: int) -> List[Tuple[str, bool]]:
+    segments: List[Tuple[str, bool]] = []
+    position = 0
+    for match in _TABLE_RE.finditer(terms_text):
+        segments.extend(
+            (part, False) for part in _SECTION_BREAK_RE.split(terms_text[position : match.start()]) if part.strip()
+        )
+        segments.extend(_split_table(match.group(0), max_chars))
+        position = match.end()
+    segments.extend((part, False) for part in _SECTION_BREAK_RE.split(terms_text[position:]) if part.strip())
+    return segments
+
+
+def split_chunks(terms_text: str, max_chars: int) -> List[Tuple[str, bool]]:
+    """
+    Chunks of at most ~max_chars cut on section and table row boundaries, as (chunk, starts_mid_item):
+    True when the chunk begins with continuation rows of the previous chunk's last item.
+    """
+    chunks: List[Tuple[str, bool]] = []
+    current: List[str] = []
+    current_starts_mid_item = False
+    size = 0
+    for segment, starts_mid_item in _segments(terms_text, max_chars):
+        if current and size + len(segment) > max_chars:
+            chunks.append(("\n\n".join(current), current_starts_mid_item))
+            current, size = [], 0
+        if not current:
+            current_starts_mid_item = starts_mid_item
+        current.append(segment.strip())
+        size += len(segment) + 2
+    if current:
+        chunks.append(("\n\n".join(current), current_starts_mid_item))
+    return chunks
+
+
+def split_terms_text(terms_text: str, max_chars: int) -> List[str]:
+    """Chunks of at most ~max_chars cut on section and table row boundaries."""
+    return [chunk for chunk, _ in split_chunks(terms_text, max_chars)]
+
+
+def _lot_key(lot: Dict[str, Any]) -> Tuple[str, ...]:
+    return (
+        " ".join(str(lot.get("name") or "").lower().split()),
+        str(lot.get("units") or "").strip().lower(),
+        str(lot.get("count") or "").strip(),
+    )
+
+
+def _same_item(first: Dict[str, Any], second: Dict[str, Any]) -> bool:
+    """The same item transcribed twice: name, units, count and every shared parameter value agree."""
+    if _lot_key(first) != _lot_key(second):
+        return False
+    values = {str(param.get("name") or "").strip().lower(): param.get("value") for param in first.get("parameters") or []}
+    return all(
+        values.get(str(param.get("name") or "").strip().lower(), param.get("value")) == param.get("value")
+        for param in second.get("parameters") or []
+    )
+
+
+def _glue(first: Dict[str, Any], second: Dict[str, Any]) -> Dict[str, Any]:
+    names = {str(param.get("name") or "").strip().lower() for param in first.get("parameters") or []}
+    extra = [param for param in second.get("parameters") or [] if str(param.get("name") or "").strip().lower() not in names]
+    return {
+        **first,
+        "units": first.get("units") or second.get("units") or "",
+        "count": first.get("count") or second.get("count") or "",
+        "parameters": list(first.get("parameters") or []) + extra,
+    }
+
+
+def merge_chunk_lots(
+    chunk_results: List[List[Dict[str, Any]]], starts_mid_item: Optional[List[bool]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Concatenate per-chunk lots in document order. Only the first lot of a chunk can be merged into
+    the last lot of the previous one: when the chunk starts with continuation rows of that item
+    (same name), or when it is the same item transcribed twice. Lots sharing a name but differing
+    in count, units or parameter values are separate lots, wherever they are.
+    """
+    merged: List[Dict[str, Any]] = []
+    for chunk_index, lots in enumerate(chunk_results):
+        continues = bool(starts_mid_item and chunk_index < len(starts_mid_item) and starts_mid_item[chunk_index])
+        for lot_index, lot in enumerate(lots):
+            if chunk_index and lot_index == 0 and merged:
+                previous = merged[-1]
+                if continues and _lot_key(previous)[0] == _lot_key(lot)[0]:
+                    merged[-1] = _glue(previous, lot)
+                    continue
+                if _same_item(previous, lot):
+                    merged[-1] = _glue(previous, lot)
+                    continue
+            merged.append(lot)
+    return merged
+
+
+def _chunks(terms_text: str) -> Tuple[List[Tuple[str, bool]], int]:
+    max_chars = _int_env("LOTS_CHUNK_MAX_CHARS", 12000)
+    chunks = split_chunks(terms_text, max_chars) if max_chars > 0 and len(terms_text) > max_chars else []
+    return chunks, max_chars
+
+
+def needs_chunking(terms_text: str) -> bool:
+    """True when extract_lots_chunked would split the text into several requests."""
+    return len(_chunks(terms_text)[0]) > 1
+
+
+def extract_lots_chunked(terms_text: str) -> Dict[str, Any]:
+    """extract_lots for short texts; concurrent per-chunk extraction above LOTS_CHUNK_MAX_CHARS."""
+    chunks, max_chars = _chunks(terms_text)
+    if len(chunks) <= 1:
+        return extract_lots(terms_text)
+
+    print(f"[lots_extraction] chunked: {len(chunks)} chunks of <= {max_chars} chars")
+    workers = max(1, min(_int_env("LOTS_CHUNK_CONCURRENCY", 4), len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lots-chunk") as executor:
+        futures = [
+            executor.submit(copy_context().run, extract_lots, f"(Фрагмент {idx} из {len(chunks)} ТЗ)\n\n{chunk}")
+            for idx, (chunk, _) in enumerate(chunks, start=1)
+        ]
+        # Any failed chunk fails the extraction: a silently incomplete lot list is worse.
+        results = [future.result().get("lots") or [] for future in futures]
+    return {"lots": merge_chunk_lots(results, [starts_mid_item for _, starts_mid_item in chunks])}
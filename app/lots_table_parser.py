@@ -0,0 +1,276 @@
+"""
+Deterministic lots extraction from specification tables of converted TZ documents.
+
+doc-to-md keeps tables as plain HTML (only table/tr/th/td with colspan/rowspan). A table is a
+specification when its header maps, through a dictionary of Russian synonyms, onto the lot
+columns: item name, quantity, units and either characteristic columns (name / value / units,
+usually one characteristic per row with the item cells spanning several rows) or a free-text
+characteristics column of "Ключ: значение" pairs. doc-to-md joins the lines of a cell with
+spaces, so pairs are split at ";" and in front of every following "Ключ:" (a capitalized word
+and lowercase words up to a colon). Such tables are converted to a LotsExtractionResult payload
+without an LLM call.
+
+parse_lots_tables() returns None whenever the result could be incomplete: no specification
+table, a table that looks like one but cannot be mapped, an item without units, characteristics
+that are not key-value pairs or a value that still holds a "word:" pair, tables without any
+characteristics next to LOTS_TABLE_PROSE_CHARS or more characters of text outside the tables
+(the characteristics are then likely described in prose). The caller then falls back to the
+LLM extraction.
+"""
+
+import os
+import re
+from html import unescape
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from .lots_extraction_prompting import LotsExtractionResult
+
+_TABLE_RE = re.compile(r"<table\b[\s\S]*?</table>", re.IGNORECASE)
+_ROW_RE = re.compile(r"<tr\b[^>]*>([\s\S]*?)</tr>", re.IGNORECASE)
+_CELL_RE = re.compile(r"<t[hd]\b([^>]*)>([\s\S]*?)</t[hd]>", re.IGNORECASE)
+_SPAN_RE = re.compile(r"\b(colspan|rowspan)\s*=\s*[\"']?(\d+)", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_NUMBER_RE = re.compile(r"^\d[\d\s]*(?:[.,]\d+)?$")
+_COUNT_WITH_UNITS_RE = re.compile(r"^(\d[\d\s]*(?:[.,]\d+)?)\s*([^\d\s].*)$")
+_TOTAL_RE = re.compile(r"^(итого|всего)\b", re.IGNORECASE)
+_PAIR_SPLIT_RE = re.compile(r"\s*[;\n]\s*")
+_PAIR_RE = re.compile(r"^([^:]{2,80}):\s*(.+)$")
+# Start of the next "Ключ:" inside a space-joined cell: "Формат: А4 Плотность: 80 г/м2".
+_KEY_START_RE = re.compile(r"\s+(?=[А-ЯЁA-Z][а-яёa-z]+,?(?:[ -][а-яёa-z(),./%]+){0,5}:\s)")
+_NESTED_PAIR_RE = re.compile(r"[^\s\d]:\s")
+
+# Column role -> header patterns, checked in this order (the first match wins).
+HEADER_SYNONYMS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("number", (r"^№", r"\bп/п\b", r"^номер( позиции)?$")),
+    ("param_name", (r"наименование (показател|характеристик|параметр)", r"^(показатель|характеристика|параметр)$")),
+    ("param_units", (r"единиц\w* измерения (показател|характеристик|параметр)", r"ед\.? ?изм\.? (показател|характеристик)")),
+    ("param_value", (r"значени", r"требовани\w* к (показател|характеристик|значени)")),
+    ("count", (r"кол-?во", r"количеств", r"^объ[её]м")),
+    ("units", (r"единиц\w* измерени", r"ед\.? ?изм", r"^ед\.?$", r"океи")),
+    ("ignore", (r"цена", r"стоимост", r"сумма", r"\bкод\b", r"страна", r"инструкц", r"обоснован")),
+    (
+        "characteristics",
+        (r"характеристик", r"описани", r"требовани", r"параметр", r"комплектац"),
+    ),
+    ("name", (r"наименовани", r"товар", r"предмет", r"продукц", r"позици")),
+]
+
+_MAX_HEADER_ROWS = 3
+DEFAULT_PROSE_CHARS = 300
+
+
+def enabled() -> bool:
+    return (os.getenv("LOTS_TABLE_PARSER_ENABLED") or "true").strip().lower() not in ("0", "false", "no")
+
+
+def _prose_chars() -> int:
+    raw = (os.getenv("LOTS_TABLE_PROSE_CHARS") or "").strip()
+    try:
+        return int(raw) if raw else DEFAULT_PROSE_CHARS
+    except ValueError:
+        return DEFAULT_PROSE_CHARS
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().replace("ё", "е").split())
+
+
+def _grid(table: str) -> List[List[Tuple[str, int]]]:
+    """Rows of (cell text, origin id) with colspan/rowspan expanded; spanned copies share the id."""
+    grid: List[List[Tuple[str, int]]] = []
+    pending: Dict[Tuple[int, int], Tuple[str, int]] = {}
+    origin = 0
+    for row_index, row_html in enumerate(_ROW_RE.findall(table)):
+        row: List[Tuple[str, int]] = []
+        column = 0
+        for attrs, content in _CELL_RE.findall(row_html):
+            while (row_index, column) in pending:
+                row.append(pending.pop((row_index, column)))
+                column += 1
+            spans = {name.lower(): int(value) for name, value in _SPAN_RE.findall(attrs)}
+            text = " ".join(unescape(_TAG_RE.sub(" ", content)).split())
+            origin += 1
+            for col_offset in range(max(spans.get("colspan", 1), 1)):
+                row.append((text, origin))
+                for row_offset in range(1, max(spans.get("rowspan", 1), 1)):
+                    pending[(row_index + row_offset, column + col_offset)] = (text, origin)
+            column += max(spans.get("colspan", 1), 1)
+        while (row_index, column) in pending:
+            row.append(pending.pop((row_index, column)))
+            column += 1
+        grid.append(row)
+    return grid
+
+
+def _is_data_row(row: List[Tuple[str, int]]) -> bool:
+    return any(_NUMBER_RE.match(text) for text, _ in row)
+
+
+def _is_header_row(row: List[Tuple[str, int]]) -> bool:
+    return not _is_data_row(row) and any(_column_role(_normalize(text)) for text, _ in row if text)
+
+
+def _is_numbering_row(row: List[Tuple[str, int]]) -> bool:
+    """The "1 | 2 | 3 | ..." row that numbers the columns under the header."""
+    values = [text for text, _ in row if text]
+    return len(values) >= 3 and values == [str(idx) for idx in range(1, len(values) + 1)]
+
+
+def _column_role(label: str) -> Optional[str]:
+    for role, patterns in HEADER_SYNONYMS:
+        if any(re.search(pattern, label) for pattern in patterns):
+            return role
+    return None
+
+
+def _map_header(grid: List[List[Tuple[str, int]]]) -> Optional[Tuple[Dict[str, int], int]]:
+    """(role -> column, first data row) or None when the table is not a mappable specification."""
+    header_size = 0
+    while header_size < min(_MAX_HEADER_ROWS, len(grid)) and _is_header_row(grid[header_size]):
+        header_size += 1
+    if not header_size:
+        return None
+
+    width = max(len(row) for row in grid[:header_size])
+    roles: Dict[str, int] = {}
+    for column in range(width):
+        parts: List[str] = []
+        for row in grid[:header_size]:
+            text = _normalize(row[column][0]) if column < len(row) else ""
+            if text and text not in parts:
+                parts.append(text)
+        # The most specific (lowest) header row names the column; the upper rows give context.
+        label = " ".join(reversed(parts))
+        role = _column_role(label) if label else None
+        if role is None or role == "ignore":
+            continue
+        if role in roles:
+            return None
+        roles[role] = column
+
+    data_start = header_size
+    if data_start < len(grid) and _is_numbering_row(grid[data_start]):
+        data_start += 1
+    return roles, data_start
+
+
+def _looks_like_specification(grid: List[List[Tuple[str, int]]]) -> bool:
+    header = " ".join(_normalize(text) for row in grid[:_MAX_HEADER_ROWS] for text, _ in row)
+    return "наименовани" in header and bool(re.search(r"кол-?во|количеств|характеристик", header))
+
+
+def _cell(row: List[Tuple[str, int]], roles: Dict[str, int], role: str) -> Tuple[str, int]:
+    column = roles.get(role)
+    if column is None or column >= len(row):
+        return "", 0
+    return row[column]
+
+
+def _characteristics(text: str) -> Optional[List[Dict[str, str]]]:
+    parameters: List[Dict[str, str]] = []
+    pieces = [piece for part in _PAIR_SPLIT_RE.split(text) for piece in _KEY_START_RE.split(part)]
+    for piece in pieces:
+        piece = piece.strip()
+        if not piece:
+            continue
+        match = _PAIR_RE.match(piece)
+        if not match:
+            return None
+        value = match.group(2).strip()
+        # A pair the key pattern did not recognize would be glued into this value.
+        if _NESTED_PAIR_RE.search(value):
+            return None
+        parameters.append({"name": match.group(1).strip(), "value": value, "units": ""})
+    return parameters
+
+
+def _parse_table(grid: List[List[Tuple[str, int]]]) -> Optional[List[Dict[str, Any]]]:
+    mapped = _map_header(grid)
+    if mapped is None:
+        return None
+    roles, data_start = mapped
+    if "name" not in roles or not ({"count", "units"} & roles.keys()):
+        return None
+    if ("param_value" in roles) != ("param_name" in roles):
+        return None
+
+    lots: List[Dict[str, Any]] = []
+    previous_origin = 0
+    characteristics_seen = 0
+    for row in grid[data_start:]:
+        name, name_origin = _cell(row, roles, "name")
+        number, _ = _cell(row, roles, "number")
+        if _TOTAL_RE.match(name) or _TOTAL_RE.match(number):
+            continue
+        starts_lot = bool(name) and name_origin != previous_origin
+        if starts_lot and lots and name == lots[-1]["name"] and not number:
+            starts_lot = False
+        if name:
+            previous_origin = name_origin
+
+        if starts_lot:
+            count = _cell(row, roles, "count")[0]
+            units = _cell(row, roles, "units")[0]
+            split = _COUNT_WITH_UNITS_RE.match(count) if not units else None
+            if split:
+                count, units = split.group(1).strip(), split.group(2).strip()
+            lots.append({"name": name, "units": units, "count": count, "parameters": []})
+        elif not lots:
+            continue
+
+        parameters = lots[-1]["parameters"]
+        param_name = _cell(row, roles, "param_name")[0]
+        if param_name:
+            parameters.append(
+                {
+                    "name": param_name,
+                    "value": _cell(row, roles, "param_value")[0],
+                    "units": _cell(row, roles, "param_units")[0],
+                }
+            )
+        characteristics, characteristics_origin = _cell(row, roles, "characteristics")
+        # A characteristics cell spanning several rows is read once.
+        if characteristics and characteristics_origin != characteristics_seen:
+            characteristics_seen = characteristics_origin
+            pairs = _characteristics(characteristics)
+            if pairs is None:
+                return None
+            known = {(item["name"], item["value"]) for item in parameters}
+            parameters.extend(item for item in pairs if (item["name"], item["value"]) not in known)
+
+    if any(not lot["units"] for lot in lots):
+        return None
+    return lots
+
+
+def parse_lots_tables(terms_text: str) -> Optional[Dict[str, Any]]:
+    """LotsExtractionResult payload read from the specification tables, None when the LLM is needed."""
+    if not enabled() or not terms_text:
+        return None
+    lots: List[Dict[str, Any]] = []
+    for match in _TABLE_RE.finditer(terms_text):
+        grid = [row for row in _grid(match.group(0)) if any(text for text, _ in row)]
+        if not grid:
+            continue
+        table_lots = _parse_table(grid)
+        if table_lots is None:
+            if _looks_like_specification(grid):
+                print("[lots_table_parser] specification table could not be mapped, using LLM")
+                return None
+            continue
+        lots.extend(table_lots)
+    if not lots:
+        return None
+    prose = " ".join(_TABLE_RE.sub(" ", terms_text).split())
+    if not any(lot["parameters"] for lot in lots) and len(prose) >= _prose_chars():
+        print("[lots_table_parser] tables hold no characteristics and the TZ has text around them, using LLM")
+        return None
+    try:
+        result = LotsExtractionResult.model_validate({"lots": lots})
+    except ValidationError as exc:
+        print(f"[lots_table_parser] parsed lots failed validation, using LLM: {exc}")
+        return None
+    print(f"[lots_table_parser] {len(lots)} lots parsed from tables")
+    return result.model_dump()
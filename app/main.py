@@ -17,7 +17,6 @@ from fastapi.responses import StreamingResponse
 
 from . import auth
 from .database import create_db_and_tables, get_session
-from .llm_openai import build_search_queries
 from .llm_stub import generate_email_body
 from .models import (
     Application,
@@ -79,8 +78,11 @@ from .supplier_import import load_contacts_from_files, merge_contacts
 from .task_queue import (
     get_supplier_search_queue_length,
     get_supplier_search_state,
+    load_search_plan,
+    lots_task_is_running,
     task_queue,
 )
+from .tz_digest import invalidate as invalidate_tz_digest
 
 app = FastAPI(title="zakupAI service", version="0.1.0")
 app.mount("/metrics", make_asgi_app())
@@ -170,7 +172,7 @@ def create_purchase(payload: PurchaseCreate, session=Depends(get_session), curre
     session.refresh(purchase)
     if purchase.terms_text:
         try:
-            task_queue.run_lots_extraction_now(purchase.id, purchase.terms_text)
+            task_queue.start_lots_extraction(purchase.id, purchase.terms_text)
         except Exception as exc:
             print(f"[lots_extraction] immediate run failed: {exc}")
     return purchase
@@ -219,9 +221,10 @@ def update_purchase(
     session.refresh(purchase)
 
     if payload.terms_text is not None and payload.terms_text != original_terms:
+        invalidate_tz_digest(purchase.id)
         if purchase.terms_text:
             try:
-                task_queue.run_lots_extraction_now(purchase.id, purchase.terms_text)
+                task_queue.start_lots_extraction(purchase.id, purchase.terms_text)
             except Exception as exc:
                 print(f"[lots_extraction] immediate run failed: {exc}")
     return purchase
@@ -536,9 +539,15 @@ def get_purchase_lots(
         .order_by(LLMTask.created_at.desc())
     ).first()
 
-    if (not task or task.status in ("queued", "in_progress")) and purchase.terms_text and not lots:
+    # A running task streams its lots into the table: return the partial list, do not start another.
+    if (
+        (not task or task.status in ("queued", "in_progress"))
+        and purchase.terms_text
+        and not lots
+        and not lots_task_is_running(task)
+    ):
         try:
-            task = task_queue.run_lots_extraction_now(purchase_id, purchase.terms_text)
+            task = task_queue.start_lots_extraction(purchase_id, purchase.terms_text)
         except Exception as exc:
             print(f"[lots_extraction] on-demand run failed: {exc}")
             if not task:
@@ -1233,9 +1242,9 @@ def search_suppliers(
 
     if state.status == "completed" and not state.queries:
         try:
-            plan = build_search_queries(payload.terms_text or purchase.terms_text or "", payload.hints)
+            plan = load_search_plan(purchase_id, payload.terms_text or purchase.terms_text or "", payload.hints)
         except Exception as exc:  # noqa: BLE001
-            print(f"[search_queries_generation] restore_failed: {exc}")
+            print(f"[search_plan] restore_failed: {exc}")
             plan = None
         return SupplierSearchResponse(
             task_id=state.task_id,
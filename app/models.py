@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Optional
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
@@ -156,3 +157,63 @@ class LotParameter(SQLModel, table=True):
     name: str
     value: str
     units: str
+
+
+class SerpCacheEntry(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    cache_key: str = Field(index=True, unique=True)
+    query_text: str
+    page: int = Field(default=0)
+    results_json: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(index=True)
+
+
+class ValidationVerdict(SQLModel, table=True):
+    # One verdict per (kind, TZ, snippet); rows stored before snippet_hash existed keep NULL there.
+    __table_args__ = (Index("uq_validationverdict_pair", "kind", "tz_hash", "snippet_hash", unique=True),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(index=True)
+    tz_hash: str = Field(index=True)
+    tz_summary: str
+    website: Optional[str] = None
+    snippet: str
+    snippet_hash: Optional[str] = None
+    is_relevant: bool
+    reason: Optional[str] = None
+    model: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class CompanyVerdictCacheEntry(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    cache_key: str = Field(index=True, unique=True)
+    website: Optional[str] = None
+    result_json: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(index=True)
+
+
+class LLMResponseCacheEntry(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    cache_key: str = Field(index=True, unique=True)
+    operation: str = Field(index=True)
+    model: str
+    response_json: str
+    size_bytes: int = Field(default=0)
+    prompt_tokens: int = Field(default=0)
+    completion_tokens: int = Field(default=0)
+    hits: int = Field(default=0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_used_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    expires_at: datetime = Field(index=True)
+
+
+class TZDigest(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    purchase_id: int = Field(index=True)
+    terms_hash: str = Field(index=True)
+    digest_json: str = Field(default="{}")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
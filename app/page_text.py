@@ -0,0 +1,130 @@
+"""Main-content text extraction for crawled supplier pages (replacement for html2text on full page_source)."""
+
+import re
+from typing import List, Optional
+
+from lxml import etree
+from lxml import html as lxml_html
+
+DEFAULT_MAX_CHARS = 10000
+
+# Subtrees that never carry supplier-relevant text.
+BOILERPLATE_TAGS = {
+    "script",
+    "style",
+    "noscript",
+    "template",
+    "svg",
+    "canvas",
+    "iframe",
+    "object",
+    "nav",
+    "footer",
+    "head",
+    "select",
+    "button",
+}
+
+BLOCK_TAGS = {
+    "address",
+    "article",
+    "aside",
+    "blockquote",
+    "br",
+    "dd",
+    "div",
+    "dl",
+    "dt",
+    "figcaption",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "header",
+    "hr",
+    "li",
+    "main",
+    "ol",
+    "p",
+    "pre",
+    "section",
+    "table",
+    "td",
+    "th",
+    "tr",
+    "ul",
+}
+
+_SPACES_RE = re.compile(r"[ \t\r\f\v\u00a0]+")
+_NEWLINES_RE = re.compile(r"\s*\n\s*")
+
+
+def _is_boilerplate(element: etree._Element, tag: str) -> bool:
+    if tag in BOILERPLATE_TAGS:
+        return True
+    if element.get("hidden") is not None or element.get("aria-hidden") == "true":
+        return True
+    return (element.get("role") or "").lower() in {"navigation", "contentinfo"}
+
+
+def _content_root(document: etree._Element) -> etree._Element:
+    for xpath in ("//main", "//*[@role='main']"):
+        found = document.xpath(xpath)
+        if found:
+            return found[0]
+    body = document.find("body")
+    return body if body is not None else document
+
+
+def extract_page_text(html: Optional[str], max_chars: int = DEFAULT_MAX_CHARS) -> str:
+    """
+    Return readable main-content text of an HTML page, at most max_chars long.
+
+    The document is parsed by lxml, boilerplate subtrees (scripts, styles, nav, footer, hidden
+    elements) are skipped without being visited and the walk stops as soon as the budget is filled.
+    """
+    if not html or not html.strip() or max_chars <= 0:
+        return ""
+    try:
+        document = lxml_html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return ""
+
+    root = _content_root(document)
+    parts: List[str] = []
+    size = 0
+
+    def emit(text: Optional[str]) -> None:
+        nonlocal size
+        if not text:
+            return
+        chunk = _SPACES_RE.sub(" ", text)
+        parts.append(chunk)
+        size += len(chunk)
+
+    stack = [(root, False)]
+    while stack and size < max_chars:
+        element, closing = stack.pop()
+        tag = element.tag.lower() if isinstance(element.tag, str) else ""
+        if closing:
+            if tag in BLOCK_TAGS:
+                emit("\n")
+            if element is not root:
+                emit(element.tail)
+            continue
+
+        if not tag or _is_boilerplate(element, tag):
+            if element is not root:
+                emit(element.tail)
+            continue
+
+        if tag in BLOCK_TAGS:
+            emit("\n")
+        emit(element.text)
+        stack.append((element, True))
+        stack.extend((child, False) for child in reversed(element))
+
+    text = _NEWLINES_RE.sub("\n", "".join(parts)).strip()
+    return text[:max_chars]
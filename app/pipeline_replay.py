@@ -0,0 +1,262 @@
+"""
+Record/replay of the supplier search pipeline's external traffic for offline benchmarks.
+
+A fixture archive is a directory:
+    http/<key>.json   — Yandex Search API and OpenAI-compatible responses, keyed by request
+    pages/<key>.html  — page HTML opened by the crawler (scripts stripped), pages/<key>.json — its URL
+    terms/*.txt       — technical task texts of the recorded runs
+
+FixtureServer is a local HTTP server used in both modes. API clients are pointed at it through
+their base URL env vars (OPENAI_BASE_URL, OPENROUTER_BASE_URL, YANDEX_SEARCH_API_URL):
+in "record" mode it forwards requests upstream and saves the answers, in "replay" mode it serves
+them from the archive. In replay mode it is also the HTTP proxy of Chrome and of site discovery
+(PIPELINE_REPLAY_PROXY): crawled https:// URLs are requested as http:// through it and served
+from pages/. Pages are recorded in-process by the crawler when PIPELINE_RECORD_DIR is set.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+_SCRIPT_RE = re.compile(r"(?is)<script\b.*?</script\s*>")
+_ABSOLUTE_HTTPS_RE = re.compile(r"(?i)(?<=[\"'=(>\s])https://")
+
+# Request headers forwarded upstream in record mode.
+FORWARDED_HEADERS = ("authorization", "content-type", "accept", "http-referer", "x-title")
+
+
+def record_dir() -> Optional[Path]:
+    raw = (os.getenv("PIPELINE_RECORD_DIR") or "").strip()
+    return Path(raw) if raw else None
+
+
+def replay_proxy() -> Optional[str]:
+    return (os.getenv("PIPELINE_REPLAY_PROXY") or "").strip() or None
+
+
+def replay_url(url: str) -> str:
+    """In replay mode https pages are fetched as plain http so the proxy can serve them."""
+    if replay_proxy() and url.lower().startswith("https://"):
+        return "http://" + url[len("https://") :]
+    return url
+
+
+def replay_proxies() -> Optional[Dict[str, str]]:
+    proxy = replay_proxy()
+    return {"http": proxy, "https": proxy} if proxy else None
+
+
+def page_key(url: str) -> str:
+    parsed = urlparse(url if "://" in url else f"http://{url}")
+    host = (parsed.netloc or "").lower()
+    host = host[4:] if host.startswith("www.") else host
+    path = parsed.path.rstrip("/") or "/"
+    key = host + path + (f"?{parsed.query}" if parsed.query else "")
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def _strip_images(value: Any) -> Any:
+    # Screenshots differ between runs; they must not change the request key.
+    if isinstance(value, dict):
+        return {key: _strip_images(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_strip_images(item) for item in value]
+    if isinstance(value, str) and value.startswith("data:image/"):
+        return "data:image"
+    return value
+
+
+def request_key(method: str, path: str, body: bytes) -> Tuple[str, str]:
+    """Return (exact key, loose key). The loose key ignores everything but the model and the first message."""
+    try:
+        payload = _strip_images(json.loads(body or b"null"))
+    except ValueError:
+        payload = body.decode("utf-8", errors="ignore")
+    canonical = json.dumps([method, path, payload], ensure_ascii=False, sort_keys=True)
+    exact = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    head: Any = payload
+    if isinstance(payload, dict):
+        messages = payload.get("messages") or payload.get("input") or []
+        first = messages[0] if isinstance(messages, list) and messages else messages
+        head = [payload.get("model"), first if isinstance(first, str) else json.dumps(first, sort_keys=True)[:2000]]
+        if isinstance(payload.get("query"), dict):
+            head = payload["query"].get("queryText")
+    loose = hashlib.sha256(json.dumps([method, path, head], ensure_ascii=False).encode("utf-8")).hexdigest()
+    return exact, loose
+
+
+def record_page(url: str, html: str, final_url: Optional[str] = None) -> None:
+    """Save a crawled page into PIPELINE_RECORD_DIR (no-op when recording is off)."""
+    root = record_dir()
+    if root is None or not html:
+        return
+    pages = root / "pages"
+    pages.mkdir(parents=True, exist_ok=True)
+    key = page_key(url)
+    (pages / f"{key}.html").write_text(_SCRIPT_RE.sub("", html), encoding="utf-8")
+    (pages / f"{key}.json").write_text(json.dumps({"url": url, "final_url": final_url or url}), encoding="utf-8")
+    if final_url and page_key(final_url) != key:
+        record_page(final_url, html)
+
+
+class FixtureArchive:
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+        self._loose_index: Optional[Dict[str, List[Path]]] = None
+        self._loose_cursor: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def save_http(self, exact: str, loose: str, record: Dict[str, Any]) -> None:
+        target = self.root / "http"
+        target.mkdir(parents=True, exist_ok=True)
+        (target / f"{exact}.json").write_text(
+            json.dumps(record | {"loose_key": loose}, ensure_ascii=False), encoding="utf-8"
+        )
+
+    def _build_loose_index(self) -> Dict[str, List[Path]]:
+        index: Dict[str, List[Path]] = {}
+        for path in sorted((self.root / "http").glob("*.json")):
+            try:
+                loose = json.loads(path.read_text(encoding="utf-8")).get("loose_key")
+            except ValueError:
+                continue
+            if loose:
+                index.setdefault(loose, []).append(path)
+        return index
+
+    def load_http(self, exact: str, loose: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Return (record, match) where match is "exact", "loose" or "miss"."""
+        path = self.root / "http" / f"{exact}.json"
+        if path.exists():
+            return json.loads(path.read_text(encoding="utf-8")), "exact"
+        with self._lock:
+            if self._loose_index is None:
+                self._loose_index = self._build_loose_index()
+            candidates = self._loose_index.get(loose) or []
+            if not candidates:
+                return None, "miss"
+            cursor = self._loose_cursor.get(loose, 0)
+            self._loose_cursor[loose] = cursor + 1
+        return json.loads(candidates[cursor % len(candidates)].read_text(encoding="utf-8")), "loose"
+
+    def load_page(self, url: str) -> Optional[str]:
+        path = self.root / "pages" / f"{page_key(url)}.html"
+        return path.read_text(encoding="utf-8") if path.exists() else None
+
+    def terms(self) -> List[Tuple[str, str]]:
+        return [(path.stem, path.read_text(encoding="utf-8")) for path in sorted((self.root / "terms").glob("*.txt"))]
+
+    def save_terms(self, name: str, text: str) -> None:
+        target = self.root / "terms"
+        target.mkdir(parents=True, exist_ok=True)
+        (target / f"{name}.txt").write_text(text, encoding="utf-8")
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], archive: FixtureArchive, mode: str, upstreams: Dict[str, str]) -> None:
+        super().__init__(address, _FixtureHandler)
+        self.archive = archive
+        self.mode = mode
+        self.upstreams = upstreams
+        self.stats: Dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name: str) -> None:
+        with self._stats_lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    server: FixtureServer
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        return
+
+    def do_GET(self) -> None:  # noqa: N802
+        self._handle()
+
+    def do_HEAD(self) -> None:  # noqa: N802
+        self._handle()
+
+    def do_POST(self) -> None:  # noqa: N802
+        self._handle()
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _handle(self) -> None:
+        if self.path.startswith("http://"):
+            self._serve_page()
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        name, _, rest = self.path.lstrip("/").partition("/")
+        if name not in self.server.upstreams:
+            self._send(404, b'{"error": "unknown upstream"}', "application/json")
+            return
+        exact, loose = request_key(self.command, f"/{name}/{rest}", body)
+        if self.server.mode == "record":
+            self._forward(name, rest, body, exact, loose)
+            return
+        record, match = self.server.archive.load_http(exact, loose)
+        self.server.count(f"http_{match}")
+        if record is None:
+            self._send(404, b'{"error": {"message": "no recorded response"}}', "application/json")
+            return
+        self._send(record["status"], record["body"].encode("utf-8"), record.get("content_type") or "application/json")
+
+    def _forward(self, name: str, rest: str, body: bytes, exact: str, loose: str) -> None:
+        headers = {key: value for key, value in self.headers.items() if key.lower() in FORWARDED_HEADERS}
+        upstream = self.server.upstreams[name].rstrip("/") + (f"/{rest}" if rest else "")
+        try:
+            response = requests.request(self.command, upstream, headers=headers, data=body, timeout=600)
+        except requests.RequestException as exc:
+            self._send(502, json.dumps({"error": {"message": str(exc)}}).encode("utf-8"), "application/json")
+            return
+        content_type = response.headers.get("Content-Type", "application/json")
+        if response.status_code < 500:
+            self.server.archive.save_http(
+                exact,
+                loose,
+                {"status": response.status_code, "content_type": content_type, "body": response.text},
+            )
+        self.server.count("http_recorded")
+        self._send(response.status_code, response.content, content_type)
+
+    def _serve_page(self) -> None:
+        html = self.server.archive.load_page(self.path)
+        if html is None:
+            self.server.count("page_miss")
+            self._send(404, b"<html><body>Not recorded</body></html>", "text/html; charset=utf-8")
+            return
+        self.server.count("page_hit")
+        self._send(200, _ABSOLUTE_HTTPS_RE.sub("http://", html).encode("utf-8"), "text/html; charset=utf-8")
+
+
+def start_fixture_server(
+    archive_dir: Path, mode: str, upstreams: Dict[str, str], port: int = 0
+) -> FixtureServer:
+    """Start a FixtureServer on 127.0.0.1 in a daemon thread; mode is "record" or "replay"."""
+    server = FixtureServer(("127.0.0.1", port), FixtureArchive(archive_dir), mode, upstreams)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,196 @@
+"""
+Compaction of technical task texts embedded into search-related prompts.
+
+Search prompts (TZ digest and summary, Perplexity search and its post-processing)
+need the product range, not the contract. compact_terms_text():
+- drops procurement boilerplate paragraphs (legal references, delivery, payment, acceptance,
+  warranty and liability clauses) that contain no table;
+- turns doc-to-md HTML tables into "cell | cell" lines, keeping the header once;
+- collapses runs of similar rows (same leading words of the item name) into the first and last
+  row plus a range summary line: number of positions and min–max of the numeric columns;
+- cuts the result to the operation's token budget (PROMPT_BUDGET_<OPERATION>, tokens).
+Lots extraction keeps the original text: it needs every row verbatim.
+"""
+
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from prometheus_client import Counter
+
+from .token_preflight import count_tokens
+
+PROMPT_COMPACTION_TOKENS_SAVED_TOTAL = Counter(
+    "prompt_compaction_tokens_saved_total",
+    "Estimated prompt tokens removed from technical task texts by compaction.",
+    ["operation"],
+)
+
+# Default token budgets of the technical task inside the prompt, per operation.
+DEFAULT_BUDGETS: Dict[str, int] = {
+    "tz_digest": 6000,
+    "tz_summary": 6000,
+    "supplier_search_perplexity": 3000,
+    "perplexity_contacts_postprocess": 2000,
+}
+
+BOILERPLATE_PATTERNS = [
+    r"\b(44|223)-фз\b",
+    r"федеральн\w+ закон",
+    r"гражданск\w+ кодекс",
+    r"постановлени\w+ правительства",
+    r"(место|срок|сроки|график|порядок|условия) (поставки|доставки|оплаты|приемки|приемки товара)",
+    r"(гарантийн\w+ (срок|обязательств)|гарантия качества)",
+    r"ответственност\w+ сторон",
+    r"(неустойк|штраф|пен[ия]\b)",
+    r"(расторжени|разрешени\w+ споров|форс-мажор|обстоятельств\w+ непреодолимой силы)",
+    r"(банковск\w+ гарант|обеспечени\w+ (исполнения|заявки|контракта))",
+    r"(документ\w+, подтверждающ|товарн\w+ накладн|универсальн\w+ передаточн|счет-фактур)",
+    r"(заказчик вправе|поставщик обязан|поставщик несет|стороны обязуются)",
+]
+_BOILERPLATE_RE = re.compile("|".join(BOILERPLATE_PATTERNS), re.IGNORECASE)
+# Paragraphs that name the object of the purchase are kept even next to legal wording.
+_SUBJECT_RE = re.compile(
+    r"объект\w* закупки|предмет\w* (контракта|договора|закупки)|наименовани\w+ товар|характеристик|ассортимент",
+    re.IGNORECASE,
+)
+
+_TABLE_RE = re.compile(r"<table\b[\s\S]*?</table>", re.IGNORECASE)
+_ROW_RE = re.compile(r"<tr\b[^>]*>([\s\S]*?)</tr>", re.IGNORECASE)
+_CELL_RE = re.compile(r"<t[hd]\b[^>]*>([\s\S]*?)</t[hd]>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_SECTION_BREAK_RE = re.compile(r"\n\s*\n|\n(?=#{1,6} )")
+_NUMBER_RE = re.compile(r"^\d[\d\s]*(?:[.,]\d+)?$")
+_WORD_RE = re.compile(r"[a-zа-яё]{3,}", re.IGNORECASE)
+
+COLLAPSE_MIN_ROWS = 4
+_TRUNCATED_MARKER = "[… остальная часть ТЗ опущена …]"
+
+
+def _int_env(name: str, default: int) -> int:
+    raw = (os.getenv(name) or "").strip()
+    try:
+        return int(raw) if raw else default
+    except ValueError:
+        return default
+
+
+def enabled() -> bool:
+    return (os.getenv("PROMPT_COMPACTION_ENABLED") or "true").strip().lower() not in ("0", "false", "no")
+
+
+def _is_boilerplate(paragraph: str) -> bool:
+    text = paragraph.lower().replace("ё", "е")
+    return bool(_BOILERPLATE_RE.search(text)) and not _SUBJECT_RE.search(text)
+
+
+def _cells(row_html: str) -> List[str]:
+    return [" ".join(_TAG_RE.sub(" ", cell).split()) for cell in _CELL_RE.findall(row_html)]
+
+
+def _row_key(cells: List[str]) -> str:
+    """Leading words of the first text cell: rows of one product kind share it."""
+    for cell in cells:
+        if cell and not _NUMBER_RE.match(cell):
+            return " ".join(_WORD_RE.findall(cell.lower())[:2])
+    return ""
+
+
+def _to_number(value: str) -> Optional[float]:
+    compact = value.replace(" ", "").replace(" ", "").replace(",", ".")
+    try:
+        return float(compact) if _NUMBER_RE.match(value) else None
+    except ValueError:
+        return None
+
+
+def _range_summary(header: List[str], group: List[List[str]]) -> str:
+    parts: List[str] = [f"ещё {len(group) - 2} однотипных позиций"]
+    for column in range(max(len(row) for row in group)):
+        values = [row[column] for row in group if column < len(row) and row[column]]
+        numbers = [number for number in (_to_number(value) for value in values) if number is not None]
+        if len(numbers) != len(values) or len(set(numbers)) < 2:
+            continue
+        label = header[column] if column < len(header) and header[column] else f"столбец {column + 1}"
+        parts.append(f"{label}: {min(numbers):g}–{max(numbers):g}")
+    return "… " + "; ".join(parts) + " …"
+
+
+def _compact_table(table: str) -> str:
+    rows = [cells for cells in (_cells(row) for row in _ROW_RE.findall(table)) if any(cells)]
+    if not rows:
+        return ""
+    header_size = next((idx for idx, cells in enumerate(rows) if any(_NUMBER_RE.match(cell) for cell in cells)), 1)
+    header = rows[header_size - 1] if header_size else []
+    lines = [" | ".join(cells) for cells in rows[:header_size]]
+
+    group: List[List[str]] = []
+
+    def flush() -> None:
+        if len(group) >= COLLAPSE_MIN_ROWS:
+            lines.append(" | ".join(group[0]))
+            lines.append(_range_summary(header, group))
+            lines.append(" | ".join(group[-1]))
+        else:
+            lines.extend(" | ".join(cells) for cells in group)
+        group.clear()
+
+    for cells in rows[header_size:]:
+        if group and (not _row_key(cells) or _row_key(cells) != _row_key(group[0])):
+            flush()
+        group.append(cells)
+    flush()
+    return "\n".join(lines)
+
+
+def _segments(terms_text: str) -> List[Tuple[str, bool]]:
+    """(text, is_table) in document order."""
+    segments: List[Tuple[str, bool]] = []
+    position = 0
+    for match in _TABLE_RE.finditer(terms_text):
+        segments.extend((part.strip(), False) for part in _SECTION_BREAK_RE.split(terms_text[position : match.start()]))
+        segments.append((match.group(0), True))
+        position = match.end()
+    segments.extend((part.strip(), False) for part in _SECTION_BREAK_RE.split(terms_text[position:]))
+    return [(text, is_table) for text, is_table in segments if text]
+
+
+def _fit_budget(parts: List[str], budget: int) -> List[str]:
+    kept: List[str] = []
+    used = count_tokens(_TRUNCATED_MARKER)
+    for part in parts:
+        cost = count_tokens(part)
+        if used + cost > budget:
+            remaining_chars = int((budget - used) * 2.5)
+            if remaining_chars > 200:
+                kept.append(part[:remaining_chars].rsplit("\n", 1)[0])
+            kept.append(_TRUNCATED_MARKER)
+            return kept
+        kept.append(part)
+        used += cost
+    return kept
+
+
+def compact_terms_text(terms_text: str, operation: str) -> str:
+    """The technical task reduced for the given search-related prompt (see module docstring)."""
+    if not terms_text or not enabled():
+        return terms_text
+    parts: List[str] = []
+    for text, is_table in _segments(terms_text):
+        if is_table:
+            compacted = _compact_table(text)
+            if compacted:
+                parts.append(compacted)
+        elif not _is_boilerplate(text):
+            parts.append(text)
+    if not parts:
+        parts = [terms_text]
+    budget = _int_env(f"PROMPT_BUDGET_{operation.upper()}", DEFAULT_BUDGETS.get(operation, 6000))
+    compacted_text = "\n\n".join(_fit_budget(parts, budget))
+
+    before, after = count_tokens(terms_text), count_tokens(compacted_text)
+    if after >= before:
+        return terms_text
+    PROMPT_COMPACTION_TOKENS_SAVED_TOTAL.labels(operation).inc(before - after)
+    print(f"[prompt_compaction] {operation}: ~{before} -> ~{after} tokens")
+    return compacted_text
@@ -0,0 +1,330 @@
+"""
+Local relevance classifier for SERP snippets, trained on stored LLM validation verdicts.
+
+Every doc_validation/company_validation verdict is saved as a (TZ summary, snippet, verdict)
+row (ValidationVerdict). A TF-IDF + logistic regression model trained on the "doc" rows
+pre-scores new snippets: confident probabilities are decided locally, the rest go to the LLM.
+
+    python -m app.relevance_model train [--target-precision 0.95] [--model-path models/relevance_model.joblib]
+    python -m app.relevance_model evaluate [--model-path ...]
+
+scikit-learn/joblib are worker dependencies (etl/requirements.txt); without them or without
+a trained artefact the pre-scoring is skipped.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from prometheus_client import Counter
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.models import ValidationVerdict
+
+RELEVANCE_MODEL_DECISIONS_TOTAL = Counter(
+    "relevance_model_decisions_total",
+    "SERP snippets pre-scored by the local relevance model, by decision.",
+    ["decision"],
+)
+
+DEFAULT_MODEL_PATH = "models/relevance_model.joblib"
+MIN_TRAINING_ROWS = 200
+SNIPPET_MAX_CHARS = 4000
+
+_WORD_RE = re.compile(r"[a-zа-яё0-9]{4,}", re.IGNORECASE)
+
+
+def model_path() -> Path:
+    return Path(os.getenv("RELEVANCE_MODEL_PATH") or DEFAULT_MODEL_PATH)
+
+
+def tz_hash(tz_summary: str) -> str:
+    return hashlib.sha256(" ".join((tz_summary or "").split()).lower().encode("utf-8")).hexdigest()
+
+
+def doc_snippet(doc: Dict[str, Any]) -> str:
+    return f"{doc.get('title') or ''}\n{doc.get('text') or ''}".strip()
+
+
+def record_verdict(
+    kind: str,
+    tz_summary: str,
+    snippet: str,
+    is_relevant: bool,
+    reason: Optional[str] = None,
+    website: Optional[str] = None,
+    model: Optional[str] = None,
+) -> None:
+    """
+    Persist one paid LLM verdict ("doc" or "company"); best effort, never raises.
+    A (kind, TZ, snippet) pair is stored once (unique index on the hashes): answers replayed from
+    a cache or repeated searches would otherwise duplicate training rows and leak them into the
+    held-out split.
+    """
+    if (os.getenv("VALIDATION_VERDICTS_ENABLED") or "true").strip().lower() != "true" or not snippet:
+        return
+    snippet = snippet[:SNIPPET_MAX_CHARS]
+    try:
+        with Session(engine) as session:
+            session.add(
+                ValidationVerdict(
+                    kind=kind,
+                    tz_hash=tz_hash(tz_summary),
+                    tz_summary=tz_summary,
+                    website=website,
+                    snippet=snippet,
+                    snippet_hash=hashlib.sha256(snippet.encode("utf-8")).hexdigest(),
+                    is_relevant=is_relevant,
+                    reason=reason,
+                    model=model,
+                )
+            )
+            session.commit()
+    except IntegrityError:
+        # Already stored, possibly by a parallel validation of the same snippet.
+        return
+    except SQLAlchemyError as exc:
+        print(f"[relevance_model] failed to store verdict: {exc}")
+
+
+def _term_overlap(tz_summary: str, snippet: str) -> float:
+    # 5-char prefixes as a crude stemmer for Russian inflections.
+    tz_terms = {word[:5].lower() for word in _WORD_RE.findall(tz_summary)}
+    if not tz_terms:
+        return 0.0
+    snippet_terms = {word[:5].lower() for word in _WORD_RE.findall(snippet)}
+    return len(tz_terms & snippet_terms) / len(tz_terms)
+
+
+class RelevanceClassifier:
+    """Snippet TF-IDF plus TZ/snippet similarity features fed to a logistic regression."""
+
+    def __init__(self) -> None:
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+
+        self.vectorizer = TfidfVectorizer(
+            analyzer="char_wb", ngram_range=(3, 5), min_df=2, max_features=50000, sublinear_tf=True
+        )
+        self.model = LogisticRegression(max_iter=2000, class_weight="balanced", C=2.0)
+        self.reject_below = -1.0
+        self.accept_above = 2.0
+        self.trained_at: Optional[str] = None
+        self.report: Dict[str, Any] = {}
+
+    def _features(self, tz_summaries: Sequence[str], snippets: Sequence[str]):
+        import numpy as np
+        from scipy.sparse import csr_matrix, hstack
+
+        snippet_matrix = self.vectorizer.transform(snippets)
+        tz_matrix = self.vectorizer.transform(tz_summaries)
+        # TF-IDF rows are L2-normalized, so the row-wise dot product is the cosine similarity.
+        cosine = np.asarray(snippet_matrix.multiply(tz_matrix).sum(axis=1))
+        overlap = np.array([[_term_overlap(tz, snippet)] for tz, snippet in zip(tz_summaries, snippets)])
+        return hstack([snippet_matrix, csr_matrix(cosine), csr_matrix(overlap)]).tocsr()
+
+    def fit(self, tz_summaries: Sequence[str], snippets: Sequence[str], labels: Sequence[bool]) -> None:
+        self.vectorizer.fit(list(snippets) + list(dict.fromkeys(tz_summaries)))
+        self.model.fit(self._features(tz_summaries, snippets), [int(label) for label in labels])
+        self.trained_at = datetime.utcnow().isoformat()
+
+    def predict_proba(self, tz_summaries: Sequence[str], snippets: Sequence[str]) -> List[float]:
+        if not snippets:
+            return []
+        return [float(p) for p in self.model.predict_proba(self._features(tz_summaries, snippets))[:, 1]]
+
+    def decide(self, probability: float) -> Optional[bool]:
+        if probability >= self.accept_above:
+            return True
+        if probability <= self.reject_below:
+            return False
+        return None
+
+    def calibrate(self, probabilities: Sequence[float], labels: Sequence[bool], target_precision: float) -> None:
+        """Widest accept/reject zones whose precision on the calibration rows reaches target_precision."""
+        pairs = sorted(zip(probabilities, labels))
+        self.accept_above, self.reject_below = 2.0, -1.0
+        positives = 0
+        for idx in range(len(pairs) - 1, -1, -1):
+            positives += int(pairs[idx][1])
+            covered = len(pairs) - idx
+            if covered >= 10 and positives / covered >= target_precision:
+                self.accept_above = pairs[idx][0]
+        negatives = 0
+        for idx, (probability, label) in enumerate(pairs):
+            negatives += int(not label)
+            if idx + 1 >= 10 and negatives / (idx + 1) >= target_precision:
+                self.reject_below = probability
+
+    def save(self, path: Path) -> None:
+        import joblib
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        joblib.dump(self, path)
+        path.with_suffix(".report.json").write_text(json.dumps(self.report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    @staticmethod
+    def load(path: Path) -> "RelevanceClassifier":
+        import joblib
+
+        return joblib.load(path)
+
+
+def evaluate(classifier: RelevanceClassifier, rows: List[ValidationVerdict]) -> Dict[str, Any]:
+    labels = [row.is_relevant for row in rows]
+    probabilities = classifier.predict_proba([row.tz_summary for row in rows], [row.snippet for row in rows])
+    decided = [(classifier.decide(p), label) for p, label in zip(probabilities, labels)]
+    auto = [(decision, label) for decision, label in decided if decision is not None]
+    accepted = [label for decision, label in auto if decision]
+    rejected = [label for decision, label in auto if not decision]
+    report: Dict[str, Any] = {
+        "rows": len(rows),
+        "positive_rate": round(sum(labels) / len(labels), 3) if labels else None,
+        "accuracy_at_0_5": round(sum((p >= 0.5) == label for p, label in zip(probabilities, labels)) / len(labels), 3)
+        if labels
+        else None,
+        "coverage": round(len(auto) / len(rows), 3) if rows else 0.0,
+        "auto_accuracy": round(sum(decision == label for decision, label in auto) / len(auto), 3) if auto else None,
+        "accept_precision": round(sum(accepted) / len(accepted), 3) if accepted else None,
+        "reject_precision": round(rejected.count(False) / len(rejected), 3) if rejected else None,
+        "accept_above": classifier.accept_above,
+        "reject_below": classifier.reject_below,
+    }
+    if 0 < sum(labels) < len(labels):
+        from sklearn.metrics import roc_auc_score
+
+        report["roc_auc"] = round(float(roc_auc_score(labels, probabilities)), 3)
+    return report
+
+
+def _load_rows(kind: str, since: Optional[datetime] = None) -> List[ValidationVerdict]:
+    """Verdicts in time order, the first one per (TZ, snippet) pair (rows stored before deduplication)."""
+    with Session(engine) as session:
+        query = select(ValidationVerdict).where(ValidationVerdict.kind == kind)
+        rows = list(session.exec(query.order_by(ValidationVerdict.created_at)).all())
+    seen: set = set()
+    unique: List[ValidationVerdict] = []
+    for row in rows:
+        key = (row.tz_hash, row.snippet)
+        if key in seen:
+            continue
+        seen.add(key)
+        if since is None or row.created_at > since:
+            unique.append(row)
+    return unique
+
+
+def train(kind: str, path: Path, target_precision: float) -> Dict[str, Any]:
+    """Time-ordered split: oldest 70% train, next 15% calibrate the thresholds, newest 15% held out."""
+    rows = _load_rows(kind)
+    if len(rows) < MIN_TRAINING_ROWS:
+        raise RuntimeError(f"Need at least {MIN_TRAINING_ROWS} '{kind}' verdicts, have {len(rows)}")
+    train_end = int(len(rows) * 0.7)
+    calibration_end = int(len(rows) * 0.85)
+    train_rows, calibration_rows, test_rows = rows[:train_end], rows[train_end:calibration_end], rows[calibration_end:]
+
+    classifier = RelevanceClassifier()
+    classifier.fit(
+        [row.tz_summary for row in train_rows],
+        [row.snippet for row in train_rows],
+        [row.is_relevant for row in train_rows],
+    )
+    classifier.calibrate(
+        classifier.predict_proba([row.tz_summary for row in calibration_rows], [row.snippet for row in calibration_rows]),
+        [row.is_relevant for row in calibration_rows],
+        target_precision,
+    )
+    classifier.report = {
+        "kind": kind,
+        "trained_at": classifier.trained_at,
+        "train_rows": len(train_rows),
+        "calibration_rows": len(calibration_rows),
+        "target_precision": target_precision,
+        "held_out": evaluate(classifier, test_rows),
+    }
+    classifier.save(path)
+    return classifier.report
+
+
+_scorer: Optional[RelevanceClassifier] = None
+_scorer_mtime: Optional[float] = None
+_scorer_lock = threading.Lock()
+
+
+def load_scorer() -> Optional[RelevanceClassifier]:
+    """The trained artefact (reloaded when the file changes) or None when pre-scoring is unavailable."""
+    global _scorer, _scorer_mtime
+    if (os.getenv("RELEVANCE_MODEL_ENABLED") or "true").strip().lower() != "true":
+        return None
+    path = model_path()
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        return None
+    with _scorer_lock:
+        if _scorer is None or _scorer_mtime != mtime:
+            try:
+                _scorer = RelevanceClassifier.load(path)
+                _scorer_mtime = mtime
+            except Exception as exc:  # noqa: BLE001
+                print(f"[relevance_model] failed to load {path}: {exc}")
+                _scorer, _scorer_mtime = None, mtime
+        return _scorer
+
+
+def prescore_docs(tz_summary: str, docs: List[Dict[str, Any]]) -> Dict[str, Tuple[bool, str]]:
+    """Verdicts {link: (is_relevant, reason)} for snippets the local model is confident about."""
+    scorer = load_scorer()
+    if scorer is None or not docs:
+        return {}
+    try:
+        probabilities = scorer.predict_proba([tz_summary] * len(docs), [doc_snippet(doc) for doc in docs])
+    except Exception as exc:  # noqa: BLE001
+        print(f"[relevance_model] scoring failed: {exc}")
+        return {}
+    verdicts: Dict[str, Tuple[bool, str]] = {}
+    for doc, probability in zip(docs, probabilities):
+        decision = scorer.decide(probability)
+        RELEVANCE_MODEL_DECISIONS_TOTAL.labels(
+            "escalate" if decision is None else ("accept" if decision else "reject")
+        ).inc()
+        if decision is not None:
+            verdicts[doc["link"]] = (decision, f"Локальный классификатор: p={probability:.2f}")
+    return verdicts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["train", "evaluate"])
+    parser.add_argument("--kind", default="doc", choices=["doc", "company"])
+    parser.add_argument("--model-path", type=Path, default=model_path())
+    parser.add_argument("--target-precision", type=float, default=0.95)
+    args = parser.parse_args()
+
+    if args.command == "train":
+        report = train(args.kind, args.model_path, args.target_precision)
+        print(f"Model saved to {args.model_path}")
+    else:
+        classifier = RelevanceClassifier.load(args.model_path)
+        # Verdicts stored after training are truly unseen; fall back to the newest 15% otherwise.
+        since = datetime.fromisoformat(classifier.trained_at) if classifier.trained_at else None
+        rows = _load_rows(args.kind, since)
+        if not rows:
+            rows = _load_rows(args.kind)
+            rows = rows[int(len(rows) * 0.85) :]
+        report = evaluate(classifier, rows)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
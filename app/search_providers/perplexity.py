@@ -1,17 +1,17 @@
 import os
 from typing import Any, Dict
 
-from openai import OpenAI
-
-from app.llm_metrics import record_llm_usage
+from app import llm_gateway
+from app.llm_clients import get_client
 from app.llm_openai import extract_structured_contacts_from_perplexity
+from app.prompt_compaction import compact_terms_text
 
 
 def _build_prompt(terms_text: str, min_contacts: int) -> str:
     return (
         "Найди поставщиков и их веб-сайты "
         f"(не менее {min_contacts}) для следующей закупки:\n"
-        f"{terms_text}"
+        f"{compact_terms_text(terms_text, 'supplier_search_perplexity')}"
     )
 
 
@@ -27,26 +27,20 @@ def search_suppliers_with_perplexity(terms_text: str) -> Dict[str, Any]:
         min_contacts = 10
     prompt = _build_prompt(terms_text or "", min_contacts)
 
-    client = OpenAI(
+    client = get_client(
+        "openrouter",
         base_url=os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
         api_key=api_key,
     )
     model = os.getenv("PERPLEXITY_MODEL", "perplexity/sonar-pro-search")
 
-    response = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        extra_body={"reasoning": {"enabled": True}},
+    response = llm_gateway.call(
+        "supplier_search_perplexity",
+        "openrouter",
+        {"model": model, "messages": [{"role": "user", "content": prompt}], "extra_body": {"reasoning": {"enabled": True}}},
+        lambda llm_client, request: llm_client.chat.completions.create(**request),
+        client=client,
     )
-    try:
-        record_llm_usage(
-            response,
-            provider="perplexity",
-            model=model,
-            operation="supplier_search_perplexity",
-        )
-    except Exception as exc:  # noqa: BLE001
-        print(f"[metrics] failed to record perplexity usage: {exc}")
     content = response.choices[0].message.content if response.choices else None
     if not content:
         raise RuntimeError("Empty response from Perplexity")
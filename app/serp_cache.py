@@ -0,0 +1,86 @@
+"""DB cache of parsed Yandex SERP pages keyed by the normalized query text."""
+
+import hashlib
+import json
+import re
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from prometheus_client import Counter
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import Session, select
+
+from app import cache_settings
+from app.database import engine
+from app.models import SerpCacheEntry
+
+SERP_CACHE_REQUESTS_TOTAL = Counter(
+    "serp_cache_requests_total",
+    "Yandex SERP lookups by cache result.",
+    ["result"],
+)
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s-]+")
+
+
+SETTINGS_PREFIX = "SERP_CACHE"
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+def cache_enabled() -> bool:
+    return cache_settings.cache_enabled(SETTINGS_PREFIX, DEFAULT_TTL_SECONDS)
+
+
+def normalize_query(query: str) -> str:
+    """Case, "ё", punctuation, extra spaces and word order do not change the key."""
+    text = _PUNCTUATION_RE.sub(" ", (query or "").lower().replace("ё", "е"))
+    return " ".join(sorted(set(text.split())))
+
+
+def cache_key(query: str, page: int) -> str:
+    raw = f"{normalize_query(query)}|{page}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get_cached_results(query: str, page: int) -> Optional[List[Dict]]:
+    if not cache_enabled():
+        return None
+    try:
+        with Session(engine) as session:
+            entry = session.exec(
+                select(SerpCacheEntry).where(
+                    SerpCacheEntry.cache_key == cache_key(query, page),
+                    SerpCacheEntry.expires_at > datetime.utcnow(),
+                )
+            ).first()
+    except SQLAlchemyError as exc:
+        print(f"[serp_cache] lookup failed: {exc}")
+        return None
+    if entry is None:
+        SERP_CACHE_REQUESTS_TOTAL.labels("miss").inc()
+        return None
+    SERP_CACHE_REQUESTS_TOTAL.labels("hit").inc()
+    return json.loads(entry.results_json)
+
+
+def store_results(query: str, page: int, results: List[Dict]) -> None:
+    """Save a parsed SERP page; empty pages are not cached (they are also what a failed request returns)."""
+    if not results or not cache_enabled():
+        return
+    now = datetime.utcnow()
+    key = cache_key(query, page)
+    try:
+        with Session(engine) as session:
+            cache_settings.purge_expired(session, SerpCacheEntry, now)
+            entry = session.exec(select(SerpCacheEntry).where(SerpCacheEntry.cache_key == key)).first()
+            if entry is None:
+                entry = SerpCacheEntry(cache_key=key, query_text=query, page=page, results_json="", expires_at=now)
+            entry.query_text = query
+            entry.results_json = json.dumps(results, ensure_ascii=False)
+            entry.created_at = now
+            entry.expires_at = cache_settings.expires_at(SETTINGS_PREFIX, DEFAULT_TTL_SECONDS, now)
+            session.add(entry)
+            session.commit()
+    except SQLAlchemyError as exc:
+        # Concurrent store of the same query or an unavailable DB: the cache is best effort.
+        print(f"[serp_cache] store failed: {exc}")
@@ -0,0 +1,203 @@
+"""Deterministic pre-classification of search results: marketplaces, aggregators, directories and content sites."""
+
+import os
+import re
+from collections import Counter as TallyCounter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from prometheus_client import Counter
+
+SERP_PREFILTER_HITS_TOTAL = Counter(
+    "serp_prefilter_hits_total",
+    "Search results decided by the rule-based pre-filter, by rule.",
+    ["rule", "decision"],
+)
+
+# Second-level public suffixes seen in Russian/CIS search results (subset of the Public Suffix List).
+MULTI_LEVEL_SUFFIXES = {
+    "com.ru", "net.ru", "org.ru", "pp.ru", "msk.ru", "spb.ru", "msk.su", "spb.su",
+    "com.ua", "kiev.ua", "org.ua", "com.kz", "org.kz", "com.by", "org.by", "com.uz",
+    "co.uk", "org.uk", "com.cn", "com.tr", "co.il", "com.au", "co.jp", "com.br",
+}
+
+# Registrable domains (or host suffixes) that are never direct suppliers, grouped by rule.
+BLOCKED_DOMAINS: Dict[str, Tuple[str, ...]] = {
+    # Third-party sellers' platforms only. Retail chains and distributors (komus.ru, vseinstrumenti.ru,
+    # petrovich.ru, ...) can be suppliers themselves: the LLM verdict or SERP_PREFILTER_BLOCKLIST decides.
+    "marketplace": (
+        "ozon.ru", "wildberries.ru", "wb.ru", "market.yandex.ru", "megamarket.ru", "sbermegamarket.ru",
+        "aliexpress.ru", "aliexpress.com", "alibaba.com", "1688.com", "amazon.com", "ebay.com",
+        "lamoda.ru", "kazanexpress.ru", "mm.ru", "goods.ru", "beru.ru", "kaspi.kz",
+    ),
+    "classifieds": ("avito.ru", "youla.ru", "farpost.ru", "drom.ru", "auto.ru", "irr.ru", "olx.kz", "olx.ua"),
+    "b2b_aggregator": (
+        "pulscen.ru", "pulscen.by", "pulscen.kz", "tiu.ru", "satu.kz", "prom.ua", "deal.by", "flagma.ru",
+        "flagma.by", "all.biz", "regmarkets.ru", "blizko.ru", "fis.ru", "promportal.su", "stroyportal.ru",
+        "b2b-center.ru", "b2b.ru", "optlist.ru", "metaprom.ru", "price.ru", "e-katalog.ru", "tovary.ru",
+        "rosfirm.ru", "spros.ru", "allbiz.ru", "uslugio.com", "supl.biz", "tradedir.ru",
+    ),
+    "company_directory": (
+        "2gis.ru", "2gis.com", "zoon.ru", "yell.ru", "spravker.ru", "rusprofile.ru", "list-org.com",
+        "checko.ru", "sbis.ru", "zachestnyibiznes.ru", "orgpage.ru", "yp.ru", "kartoteka.ru", "audit-it.ru",
+        "spark-interfax.ru", "vbankcenter.ru", "companies.rbc.ru", "flamp.ru", "maps.yandex.ru",
+    ),
+    "tenders": (
+        "zakupki.gov.ru", "rostender.info", "tenderplan.ru", "tenderguru.ru", "bicotender.ru", "roseltorg.ru",
+        "sberbank-ast.ru", "rts-tender.ru", "tektorg.ru", "fabrikant.ru", "zakupki.mos.ru", "tender.pro",
+    ),
+    "content": (
+        "wikipedia.org", "dzen.ru", "zen.yandex.ru", "vc.ru", "habr.com", "pikabu.ru", "otzovik.com",
+        "irecommend.ru", "youtube.com", "rutube.ru", "vk.com", "ok.ru", "t.me", "telegram.me", "pinterest.com",
+        "pinterest.ru", "drive2.ru", "livejournal.com", "mail.ru", "rbc.ru", "kommersant.ru", "ria.ru",
+        "consultant.ru", "garant.ru", "docs.cntd.ru", "studfile.net", "studopedia.ru", "ppt-online.org",
+    ),
+}
+
+# Host prefixes and URL paths of content sections (blogs, forums, news) on any site.
+CONTENT_HOST_RE = re.compile(r"^(?:blog|blogs|forum|wiki|news|journal|otzyvy|reviews)\.", re.IGNORECASE)
+CONTENT_PATH_RE = re.compile(
+    r"/(?:blog|blogs|news|novosti|stati|statya|articles?|forum|wiki|otzyvy|reviews|question|voprosy)(?:/|$|-)",
+    re.IGNORECASE,
+)
+
+TITLE_REJECT_PATTERNS: Tuple[Tuple[str, re.Pattern], ...] = (
+    ("title_marketplace", re.compile(r"(?:озон|ozon|wildberries|вайлдберриз|яндекс[ .]маркет|мегамаркет|алиэкспресс|aliexpress)", re.I)),
+    ("title_classifieds", re.compile(r"(?:авито|avito|юла)\b|объявлени[йяе]\b", re.I)),
+    ("title_directory", re.compile(r"справочник (?:организаций|компаний|предприятий)|рейтинг (?:компаний|поставщиков)|\bинн \d{10}", re.I)),
+    ("title_content", re.compile(r"википеди|\bотзыв[ыа]?\b|\bфорум\b|что такое|как выбрать|\bстатья\b", re.I)),
+    ("title_tenders", re.compile(r"\bтендер(?:ы|ов)?\b|госзакупк|\b44-фз\b|\b223-фз\b", re.I)),
+)
+
+# Obvious supplier self-descriptions; accepted only together with a query term in the title/snippet.
+TITLE_ACCEPT_RE = re.compile(
+    r"завод[- ]изготовител|официальн\w* (?:дилер|дистрибьютор|представител)|\bпроизводител[ьяи]\b|\bзавод\b",
+    re.IGNORECASE,
+)
+
+_WORD_RE = re.compile(r"[a-zа-яё0-9]+", re.IGNORECASE)
+_STOP_WORDS = {"купить", "оптом", "поставщик", "поставщики", "производитель", "цена", "цены", "москва", "россия"}
+
+
+@dataclass
+class PrefilterVerdict:
+    decision: Optional[str]  # "reject", "accept" or None (send to the LLM)
+    rule: str = ""
+    domain: str = ""
+
+
+def registrable_domain(host: str) -> str:
+    """Last label pair, or label triple under a multi-level public suffix ("firm.com.ru")."""
+    host = host.lower().strip(".").split(":")[0]
+    if host.startswith("www."):
+        host = host[4:]
+    labels = host.split(".")
+    if len(labels) >= 3 and ".".join(labels[-2:]) in MULTI_LEVEL_SUFFIXES:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def _extra_blocked_domains() -> Dict[str, str]:
+    """Optional SERP_PREFILTER_BLOCKLIST file: "domain [rule]" per line, "#" comments."""
+    raw_path = (os.getenv("SERP_PREFILTER_BLOCKLIST") or "").strip()
+    if not raw_path or not Path(raw_path).exists():
+        return {}
+    extra: Dict[str, str] = {}
+    for line in Path(raw_path).read_text(encoding="utf-8").splitlines():
+        parts = line.split("#", 1)[0].split()
+        if parts:
+            extra[parts[0].lower()] = parts[1] if len(parts) > 1 else "blocklist"
+    return extra
+
+
+def _build_domain_index() -> Dict[str, str]:
+    index = {domain: rule for rule, domains in BLOCKED_DOMAINS.items() for domain in domains}
+    index.update(_extra_blocked_domains())
+    return index
+
+
+_DOMAIN_INDEX = _build_domain_index()
+
+
+def _blocked_rule(host: str) -> Optional[Tuple[str, str]]:
+    """Match the host and its parent domains down to (not below) the registrable domain."""
+    host = host.lower().split(":")[0]
+    host = host[4:] if host.startswith("www.") else host
+    floor = registrable_domain(host)
+    labels = host.split(".")
+    for start in range(len(labels)):
+        candidate = ".".join(labels[start:])
+        rule = _DOMAIN_INDEX.get(candidate)
+        if rule:
+            return rule, candidate
+        if candidate == floor:
+            break
+    return None
+
+
+def _query_terms(query: Optional[str]) -> List[str]:
+    words = [word.lower() for word in _WORD_RE.findall(query or "")]
+    # Crude stemming: Russian inflections change the ending only.
+    return [word[:5] for word in words if len(word) >= 4 and word not in _STOP_WORDS]
+
+
+def classify(doc: Dict[str, object], query: Optional[str] = None) -> PrefilterVerdict:
+    """Decide a search result without the LLM when a rule is conclusive."""
+    url = str(doc.get("url") or doc.get("link") or doc.get("website") or "")
+    parsed = urlparse(url if "://" in url else f"https://{url}")
+    host = (parsed.netloc or "").lower()
+    if not host:
+        return PrefilterVerdict(None)
+    domain = registrable_domain(host)
+
+    blocked = _blocked_rule(host)
+    if blocked:
+        return PrefilterVerdict("reject", blocked[0], blocked[1])
+    if CONTENT_HOST_RE.match(host[4:] if host.startswith("www.") else host) or CONTENT_PATH_RE.search(parsed.path or ""):
+        return PrefilterVerdict("reject", "content_url", domain)
+
+    title = str(doc.get("title") or "")
+    for rule, pattern in TITLE_REJECT_PATTERNS:
+        if pattern.search(title):
+            return PrefilterVerdict("reject", rule, domain)
+
+    if TITLE_ACCEPT_RE.search(title) and (os.getenv("SERP_PREFILTER_ACCEPT") or "true").strip().lower() == "true":
+        haystack = f"{title} {doc.get('text') or ''}".lower()
+        if any(term in haystack for term in _query_terms(query)):
+            return PrefilterVerdict("accept", "title_supplier", domain)
+    return PrefilterVerdict(None, "", domain)
+
+
+class PrefilterLog:
+    """Per-task tally of rule hits, printed once so the lists can be tuned from the worker logs."""
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+        self.rules: TallyCounter = TallyCounter()
+        self.domains: TallyCounter = TallyCounter()
+        self.checked = 0
+
+    def record(self, verdict: PrefilterVerdict) -> PrefilterVerdict:
+        self.checked += 1
+        if verdict.decision:
+            SERP_PREFILTER_HITS_TOTAL.labels(verdict.rule, verdict.decision).inc()
+            self.rules[f"{verdict.decision}:{verdict.rule}"] += 1
+            self.domains[verdict.domain] += 1
+        return verdict
+
+    def report(self) -> None:
+        if not self.rules:
+            return
+        rules = ", ".join(f"{rule}={count}" for rule, count in self.rules.most_common())
+        domains = ", ".join(f"{domain}={count}" for domain, count in self.domains.most_common(10))
+        print(f"[serp_prefilter] {self.stage}: checked={self.checked} {rules}; top domains: {domains}")
+
+
+def filter_websites(items: Iterable[Dict[str, object]], stage: str) -> List[Dict[str, object]]:
+    """Drop rejected sites from a merged website list (accept verdicts are not used here)."""
+    log = PrefilterLog(stage)
+    kept = [item for item in items if log.record(classify(item)).decision != "reject"]
+    log.report()
+    return kept
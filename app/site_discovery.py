@@ -0,0 +1,205 @@
+"""Contact/about/catalog page discovery from robots.txt, sitemap.xml and common URL patterns."""
+
+import re
+import time
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import requests
+
+from app.pipeline_replay import record_page, replay_proxies, replay_url
+
+SECTIONS = ("contacts", "about", "catalog")
+
+# Path keywords per section, strongest first (transliterated Russian slugs included).
+SECTION_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "contacts": ("contacts", "kontakty", "kontakti", "contact", "kontakt", "svyaz", "rekvizity"),
+    "about": ("o-kompanii", "o_kompanii", "okompanii", "about", "o-nas", "o_nas", "company", "kompaniya", "o-zavode"),
+    "catalog": ("catalog", "katalog", "produkciya", "produktsiya", "products", "product", "tovary", "shop"),
+}
+
+# Probed only when sitemap.xml gave nothing for a section.
+COMMON_PATHS: Dict[str, Tuple[str, ...]] = {
+    "contacts": ("/contacts/", "/kontakty/", "/contact/"),
+    "about": ("/about/", "/o-kompanii/", "/company/"),
+    "catalog": ("/catalog/", "/katalog/", "/products/"),
+}
+
+USER_AGENT = "Mozilla/5.0 (compatible; zakupai-supplier-finder/1.0)"
+MAX_SITEMAPS = 4
+MAX_SITEMAP_BYTES = 5 * 1024 * 1024
+MAX_CANDIDATES = 3
+MIN_SCORE = 0.4
+
+_session: Optional[requests.Session] = None
+
+
+def _get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        _session.headers["User-Agent"] = USER_AGENT
+        _session.proxies.update(replay_proxies() or {})
+    return _session
+
+
+def _host(url: str) -> str:
+    host = (urlparse(url).netloc or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _fetch_text(url: str, timeout: float) -> Optional[str]:
+    """GET a small text resource; connection errors and timeouts propagate (the host is down)."""
+    try:
+        with _get_session().get(replay_url(url), timeout=timeout, stream=True) as response:
+            if response.status_code >= 400:
+                return None
+            content = response.raw.read(MAX_SITEMAP_BYTES, decode_content=True)
+            text = content.decode(response.encoding or "utf-8", errors="ignore")
+            record_page(url, text)
+            return text
+    except (requests.ConnectionError, requests.Timeout):
+        raise
+    except (requests.RequestException, OSError):
+        return None
+
+
+class DiscoveryBudgetExceeded(Exception):
+    """The caller's deadline leaves no time for another discovery request."""
+
+
+def _request_timeout(timeout: float, deadline: Optional[float]) -> float:
+    """Per-request timeout capped by the remaining time before deadline (time.monotonic())."""
+    if deadline is None:
+        return timeout
+    remaining = deadline - time.monotonic()
+    if remaining <= 0.5:
+        raise DiscoveryBudgetExceeded("no time left for site discovery")
+    return min(timeout, remaining)
+
+
+def _sitemaps_from_robots(base_url: str, timeout: float) -> List[str]:
+    robots = _fetch_text(urljoin(base_url, "/robots.txt"), timeout) or ""
+    found = re.findall(r"(?im)^\s*sitemap\s*:\s*(\S+)", robots)
+    return found or [urljoin(base_url, "/sitemap.xml")]
+
+
+def _sitemap_locations(xml_text: str) -> Tuple[List[str], List[str]]:
+    """Return (page urls, nested sitemap urls) of a urlset or sitemapindex document."""
+    pages: List[str] = []
+    nested: List[str] = []
+    try:
+        root = ET.fromstring(xml_text.strip().encode("utf-8"))
+    except ET.ParseError:
+        return pages, nested
+    is_index = root.tag.endswith("sitemapindex")
+    for element in root.iter():
+        if element.tag.endswith("loc") and element.text:
+            (nested if is_index else pages).append(element.text.strip())
+    return pages, nested
+
+
+def _collect_sitemap_urls(base_url: str, timeout: float, deadline: Optional[float] = None) -> List[str]:
+    queue = _sitemaps_from_robots(base_url, _request_timeout(timeout, deadline))
+    seen: set[str] = set()
+    pages: List[str] = []
+    while queue and len(seen) < MAX_SITEMAPS:
+        sitemap_url = queue.pop(0)
+        if sitemap_url in seen or sitemap_url.lower().endswith(".gz"):
+            continue
+        seen.add(sitemap_url)
+        try:
+            request_timeout = _request_timeout(timeout, deadline)
+        except DiscoveryBudgetExceeded:
+            break
+        try:
+            xml_text = _fetch_text(sitemap_url, request_timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            continue
+        if not xml_text:
+            continue
+        found_pages, nested = _sitemap_locations(xml_text)
+        pages.extend(found_pages)
+        # Page/main sitemaps first: product sitemaps are huge and rarely hold contact pages.
+        queue.extend(sorted(nested, key=lambda url: ("product" in url.lower() or "goods" in url.lower(), url)))
+    return pages
+
+
+def score_url(url: str, section: str) -> float:
+    """Rank a URL as a section page: keyword strength, shallow paths and exact slugs score higher."""
+    path = (urlparse(url).path or "/").lower().rstrip("/")
+    segments = [segment for segment in re.split(r"[/.]", path) if segment and segment not in {"html", "htm", "php"}]
+    if not segments:
+        return 0.0
+    keywords = SECTION_KEYWORDS[section]
+    best = 0.0
+    for depth, segment in enumerate(segments):
+        for rank, keyword in enumerate(keywords):
+            if segment == keyword:
+                score = 1.0
+            elif keyword in segment:
+                score = 0.6
+            else:
+                continue
+            score -= 0.05 * rank + 0.15 * depth + 0.1 * (len(segments) - depth - 1)
+            best = max(best, score)
+    return max(0.0, best)
+
+
+def rank_candidates(urls: Iterable[str], base_url: str, section: str, limit: int = MAX_CANDIDATES) -> List[str]:
+    host = _host(base_url)
+    scored: Dict[str, float] = {}
+    for url in urls:
+        if _host(url) != host:
+            continue
+        score = score_url(url, section)
+        if score >= MIN_SCORE:
+            key = url.split("#")[0]
+            scored[key] = max(scored.get(key, 0.0), score)
+    return [url for url, _ in sorted(scored.items(), key=lambda item: (-item[1], len(item[0])))[:limit]]
+
+
+def _probe(url: str, base_url: str, timeout: float) -> Optional[str]:
+    try:
+        response = _get_session().head(replay_url(url), timeout=timeout, allow_redirects=True)
+        if response.status_code in (403, 405):
+            response = _get_session().get(replay_url(url), timeout=timeout, stream=True)
+            response.close()
+    except requests.RequestException:
+        return None
+    if response.status_code >= 400 or _host(response.url) != _host(base_url):
+        return None
+    final_path = urlparse(response.url).path.strip("/")
+    return response.url if final_path else None
+
+
+def discover_site_pages(base_url: str, timeout: float = 5.0, deadline: Optional[float] = None) -> Dict[str, List[str]]:
+    """
+    Find contacts/about/catalog pages of a site without a browser.
+
+    Sitemaps (from robots.txt or /sitemap.xml) are ranked first; for sections still empty
+    the common URL patterns are probed with HEAD requests. Every request is capped by timeout
+    and by the time left before deadline (time.monotonic()); no request starts after it.
+    Returns:
+        {"contacts": [...], "about": [...], "catalog": [...]} — ranked absolute URLs.
+    """
+    try:
+        sitemap_urls = _collect_sitemap_urls(base_url, timeout, deadline)
+    except (requests.ConnectionError, requests.Timeout, DiscoveryBudgetExceeded):
+        return {section: [] for section in SECTIONS}
+    discovered: Dict[str, List[str]] = {section: [] for section in SECTIONS}
+    for section in SECTIONS:
+        candidates = rank_candidates(sitemap_urls, base_url, section)
+        if not candidates:
+            for path in COMMON_PATHS[section]:
+                try:
+                    request_timeout = _request_timeout(timeout, deadline)
+                except DiscoveryBudgetExceeded:
+                    return discovered
+                probed = _probe(urljoin(base_url, path), base_url, request_timeout)
+                if probed:
+                    candidates = [probed]
+                    break
+        discovered[section] = candidates
+    return discovered
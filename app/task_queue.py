@@ -1,14 +1,23 @@
 import json
+import os
 import threading
 import time
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from sqlmodel import Session, select
 
 from .database import engine
-from .llm_openai import build_search_queries, extract_application_lots, extract_bid_lots, extract_lots
+from .llm_openai import (
+    GeneratedSearchPlan,
+    build_tz_digest,
+    extract_application_lots,
+    extract_bid_lots,
+    stream_lots,
+)
+from .lots_chunking import extract_lots_chunked, needs_chunking
+from .lots_table_parser import parse_lots_tables
 from .models import (
     ApplicationLot,
     ApplicationLotParameter,
@@ -19,6 +28,47 @@ from .models import (
     LotParameter,
     Purchase,
 )
+from .tz_digest import get_or_build_section
+
+
+def _int_env(name: str, default: int) -> int:
+    raw = (os.getenv(name) or "").strip()
+    try:
+        return int(raw) if raw else default
+    except ValueError:
+        return default
+
+
+def lots_streaming_enabled() -> bool:
+    return (os.getenv("LOTS_STREAMING_ENABLED") or "true").strip().lower() not in ("0", "false", "no")
+
+
+_lots_locks: Dict[Optional[int], threading.Lock] = {}
+_lots_locks_guard = threading.Lock()
+
+
+def _lots_lock(purchase_id: Optional[int]) -> threading.Lock:
+    """Serializes lot writes and task supersession of one purchase across extraction threads."""
+    with _lots_locks_guard:
+        if purchase_id not in _lots_locks:
+            _lots_locks[purchase_id] = threading.Lock()
+        return _lots_locks[purchase_id]
+
+
+def _lots_task_superseded(task_id: Optional[int]) -> bool:
+    with Session(engine) as session:
+        task = session.get(LLMTask, task_id) if task_id is not None else None
+        return task is not None and task.status == "superseded"
+
+
+def lots_task_is_running(task: Optional[LLMTask]) -> bool:
+    """
+    An in_progress lots task younger than LOTS_TASK_STALE_SECONDS: its lots are still arriving.
+    Older ones were cut off by a restart and may be started again.
+    """
+    if not task or task.status != "in_progress":
+        return False
+    return datetime.utcnow() - task.created_at < timedelta(seconds=_int_env("LOTS_TASK_STALE_SECONDS", 900))
 
 
 @dataclass
@@ -120,8 +170,47 @@ class TaskQueue:
             return task
 
     def run_lots_extraction_now(self, purchase_id: int, terms_text: str) -> LLMTask:
-        payload = {"terms_text": terms_text or ""}
+        task_id = self._create_lots_task(purchase_id, terms_text)
+        self._run_lots_task(task_id, purchase_id)
         with Session(engine) as session:
+            refreshed = session.get(LLMTask, task_id)
+            if not refreshed:
+                raise RuntimeError("Lots extraction task disappeared")
+            return refreshed
+
+    def start_lots_extraction(self, purchase_id: int, terms_text: str) -> LLMTask:
+        """
+        Create an in_progress lots extraction task and run it in a background thread: lots are
+        persisted as they are streamed, GET /purchases/{id}/lots shows them while the task runs.
+        """
+        task_id = self._create_lots_task(purchase_id, terms_text)
+        threading.Thread(
+            target=self._run_lots_task,
+            args=(task_id, purchase_id),
+            name=f"lots-extraction-{purchase_id}",
+            daemon=True,
+        ).start()
+        with Session(engine) as session:
+            task = session.get(LLMTask, task_id)
+            if not task:
+                raise RuntimeError("Lots extraction task disappeared")
+            return task
+
+    @staticmethod
+    def _create_lots_task(purchase_id: int, terms_text: str) -> int:
+        """New in_progress task; running extractions of the purchase are superseded and stop writing lots."""
+        payload = {"terms_text": terms_text or ""}
+        with _lots_lock(purchase_id), Session(engine) as session:
+            running = session.exec(
+                select(LLMTask).where(
+                    LLMTask.purchase_id == purchase_id,
+                    LLMTask.task_type == "lots_extraction",
+                    LLMTask.status.in_(["queued", "in_progress"]),
+                )
+            ).all()
+            for previous in running:
+                previous.status = "superseded"
+                session.add(previous)
             task = LLMTask(
                 purchase_id=purchase_id,
                 task_type="lots_extraction",
@@ -135,23 +224,20 @@ class TaskQueue:
 
         if task_id is None:
             raise RuntimeError("Failed to create lots extraction task")
+        return task_id
 
+    def _run_lots_task(self, task_id: int, purchase_id: int) -> None:
         try:
             self._process_task(task_id)
         except Exception as exc:
             print(f"[lots_extraction] failed for purchase {purchase_id}: {exc}")
             with Session(engine) as session:
                 errored = session.get(LLMTask, task_id)
-                if errored:
+                if errored and errored.status != "superseded":
                     errored.status = "failed"
                     errored.output_text = json.dumps({"error": str(exc)}, ensure_ascii=False)
                     session.add(errored)
                     session.commit()
-        with Session(engine) as session:
-            refreshed = session.get(LLMTask, task_id)
-            if not refreshed:
-                raise RuntimeError("Lots extraction task disappeared")
-            return refreshed
 
     def run_bid_lots_extraction_now(self, bid_id: int, terms_text: str, purchase_id: Optional[int] = None) -> LLMTask:
         payload = {"bid_id": bid_id, "terms_text": terms_text or "", "purchase_id": purchase_id}
@@ -277,7 +363,7 @@ class TaskQueue:
                 payload = self._load_payload(task.input_text)
                 terms_text = payload.get("terms_text", "")
                 hints = payload.get("hints") or []
-                plan = build_search_queries(terms_text, hints)
+                plan = load_search_plan(task.purchase_id, terms_text, hints)
                 task.output_text = json.dumps(
                     {
                         "queries": plan.queries,
@@ -304,11 +390,22 @@ class TaskQueue:
                     session.commit()
                     return
 
-                lots_payload = extract_lots(terms_text)
-                task.output_text = json.dumps(lots_payload, ensure_ascii=False)
-                task.status = "completed"
-                if task.purchase_id:
-                    self._sync_lots(session, task.purchase_id, lots_payload)
+                # Well-structured specification tables need no LLM call at all.
+                lots_payload, persisted = parse_lots_tables(terms_text), False
+                if lots_payload is None and lots_streaming_enabled() and not needs_chunking(terms_text):
+                    lots_payload, persisted = self._stream_lots(session, task.id, task.purchase_id, terms_text)
+                if lots_payload is None:
+                    lots_payload = extract_lots_chunked(terms_text)
+                with _lots_lock(task.purchase_id):
+                    if _lots_task_superseded(task.id):
+                        print(f"[lots_extraction] task={task.id} superseded, result dropped")
+                        return
+                    task.output_text = json.dumps(lots_payload, ensure_ascii=False)
+                    task.status = "completed"
+                    if task.purchase_id and not persisted:
+                        self._sync_lots(session, task.purchase_id, lots_payload)
+                    session.add(task)
+                    session.commit()
                 print(f"[lots_extraction] completed task={task.id} purchase={task.purchase_id}")
             elif task.task_type == "bid_lots_extraction":
                 payload = self._load_payload(task.input_text)
@@ -352,9 +449,41 @@ class TaskQueue:
             session.add(task)
             session.commit()
 
+    def _stream_lots(
+        self, session: Session, task_id: int, purchase_id: Optional[int], terms_text: str
+    ) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        Persist lots one by one while the response is streamed. The previous lots are replaced
+        when the first new lot arrives. Returns (payload, persisted); (None, False) when the
+        stream failed and the caller should fall back to the regular extraction. Stops writing
+        as soon as the task is superseded by a newer extraction of the purchase.
+        """
+        lots: List[Dict[str, Any]] = []
+        try:
+            for lot_item in stream_lots(terms_text):
+                if purchase_id:
+                    with _lots_lock(purchase_id):
+                        if _lots_task_superseded(task_id):
+                            print(f"[lots_extraction] task={task_id} superseded, streaming stopped")
+                            return {"lots": lots}, True
+                        if not lots:
+                            self._clear_lots(session, purchase_id)
+                        self._add_lot(session, purchase_id, lot_item)
+                lots.append(lot_item)
+                print(f"[lots_extraction] streamed lot {len(lots)} purchase={purchase_id}")
+        except Exception as exc:  # noqa: BLE001
+            print(f"[lots_extraction] streaming failed after {len(lots)} lots: {exc}; falling back to full extraction")
+            return None, False
+        return {"lots": lots}, bool(lots)
+
+    @classmethod
+    def _sync_lots(cls, session: Session, purchase_id: int, payload: Dict[str, Any]) -> None:
+        cls._clear_lots(session, purchase_id)
+        for lot_item in payload.get("lots") or []:
+            cls._add_lot(session, purchase_id, lot_item)
+
     @staticmethod
-    def _sync_lots(session: Session, purchase_id: int, payload: Dict[str, Any]) -> None:
-        lots_payload = payload.get("lots") or []
+    def _clear_lots(session: Session, purchase_id: int) -> None:
         existing_lots = session.exec(select(Lot).where(Lot.purchase_id == purchase_id)).all()
         for lot in existing_lots:
             parameters = session.exec(select(LotParameter).where(LotParameter.lot_id == lot.id)).all()
@@ -363,20 +492,21 @@ class TaskQueue:
             session.delete(lot)
         session.commit()
 
-        for lot_item in lots_payload:
-            lot = Lot(purchase_id=purchase_id, name=lot_item.get("name", "Лот"))
-            session.add(lot)
-            session.commit()
-            session.refresh(lot)
-            for param in lot_item.get("parameters") or []:
-                parameter = LotParameter(
-                    lot_id=lot.id,
-                    name=param.get("name", ""),
-                    value=param.get("value", ""),
-                    units=param.get("units", ""),
-                )
-                session.add(parameter)
-            session.commit()
+    @staticmethod
+    def _add_lot(session: Session, purchase_id: int, lot_item: Dict[str, Any]) -> None:
+        lot = Lot(purchase_id=purchase_id, name=lot_item.get("name", "Лот"))
+        session.add(lot)
+        session.commit()
+        session.refresh(lot)
+        for param in lot_item.get("parameters") or []:
+            parameter = LotParameter(
+                lot_id=lot.id,
+                name=param.get("name", ""),
+                value=param.get("value", ""),
+                units=param.get("units", ""),
+            )
+            session.add(parameter)
+        session.commit()
 
     @staticmethod
     def _sync_bid_lots(session: Session, bid_id: int, payload: Dict[str, Any]) -> None:
@@ -452,6 +582,41 @@ class TaskQueue:
         return {"terms_text": raw_text, "hints": []}
 
 
+def load_tz_digest(purchase_id: Optional[int], terms_text: str, hints: Optional[List[str]] = None) -> Dict[str, Any]:
+    """The purchase's TZ digest (build_tz_digest); one LLM call per terms_text and hints."""
+    return get_or_build_section(
+        purchase_id,
+        terms_text,
+        "digest",
+        lambda: build_tz_digest(terms_text, hints),
+        variant=list(hints or []),
+    )
+
+
+def load_search_plan(purchase_id: Optional[int], terms_text: str, hints: Optional[List[str]] = None) -> GeneratedSearchPlan:
+    digest = load_tz_digest(purchase_id, terms_text, hints)
+    return GeneratedSearchPlan(queries=digest["queries"], note=digest["note"])
+
+
+def _resume_chain(session: Session, task: LLMTask) -> List[LLMTask]:
+    """The task and the tasks it resumes ("resume_of" of follow-up crawls), oldest first."""
+    chain = [task]
+    seen = {task.id}
+    while True:
+        resume_of = TaskQueue._load_payload(chain[-1].input_text or "").get("resume_of")
+        previous = session.get(LLMTask, resume_of) if isinstance(resume_of, int) and resume_of not in seen else None
+        if previous is None:
+            return list(reversed(chain))
+        seen.add(previous.id)
+        chain.append(previous)
+
+
+def _merge_by_website(items: List[Dict[str, Any]], newer: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """items followed by newer; a newer entry replaces the older one of the same website."""
+    newer_sites = {item.get("website") for item in newer if item.get("website")}
+    return [item for item in items if item.get("website") not in newer_sites] + newer
+
+
 def get_supplier_search_state(purchase_id: int) -> Optional[SupplierSearchState]:
     with Session(engine) as session:
         task = session.exec(
@@ -469,15 +634,20 @@ def get_supplier_search_state(purchase_id: int) -> Optional[SupplierSearchState]
         queries: List[str] = []
         note = ""
         tech_task_excerpt = ""
+        # A follow-up crawl (resume_of) holds only the re-crawled sites: the state merges the chain.
         search_output: List[Dict[str, Any]] = []
         processed_contacts: List[Dict[str, Any]] = []
+        for chain_task in _resume_chain(session, task):
+            if not chain_task.output_text:
+                continue
+            payload = TaskQueue._load_payload(chain_task.output_text)
+            queries = queries or payload.get("queries") or []
+            tech_task_excerpt = tech_task_excerpt or payload.get("tech_task_excerpt") or ""
+            search_output = _merge_by_website(search_output, payload.get("search_output") or [])
+            processed_contacts = _merge_by_website(processed_contacts, payload.get("processed_contacts") or [])
         if task.output_text:
             payload = TaskQueue._load_payload(task.output_text)
-            queries = payload.get("queries") or []
             note = payload.get("note") or payload.get("status") or "Поиск поставщиков выполняется"
-            tech_task_excerpt = payload.get("tech_task_excerpt") or ""
-            search_output = payload.get("search_output") or []
-            processed_contacts = payload.get("processed_contacts") or []
 
         queue_length = get_supplier_search_queue_length(session)
         estimated_complete_time: Optional[datetime] = None
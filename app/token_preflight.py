@@ -0,0 +1,155 @@
+"""
+Local token estimates of LLM requests and adaptive completion limits.
+
+    plan = plan_completion("lots_extraction", messages, source_text=terms_text)
+    ... max_completion_tokens=plan.limit, expected_completion_tokens=plan.expected ...
+
+count_tokens() uses tiktoken (o200k_base) when it is installed and its encoding is available,
+otherwise a character-class heuristic. plan_completion() predicts the output size from the
+structure of the input: table rows (HTML <tr> and numbered lines) for transcription operations,
+items for per-document verdicts, the size of free text for the rest. The limit is the
+prediction times LLM_COMPLETION_SAFETY, clamped to the operation's floor and ceiling
+(LLM_MAX_COMPLETION_TOKENS_<OPERATION> overrides the ceiling) and to what the context window
+(LLM_CONTEXT_TOKENS) leaves after the prompt. The gateway records the estimates next to the
+actual usage (see app.llm_metrics) so the profiles below can be tuned.
+"""
+
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+_TABLE_RE = re.compile(r"<table\b[\s\S]*?</table>", re.IGNORECASE)
+_ROW_RE = re.compile(r"<tr\b", re.IGNORECASE)
+_NUMBERED_LINE_RE = re.compile(r"^\s*\d{1,4}(?:\.\d{1,3})*[.)]\s+\S", re.MULTILINE)
+
+# Per-message overhead of the chat format (role, separators).
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encoding: Any = None
+_encoding_loaded = False
+
+
+@dataclass(frozen=True)
+class CompletionProfile:
+    base: int
+    per_row: int
+    text_ratio: float
+    floor: int
+    ceiling: int
+
+
+# Hand-picked starting points (floors keep the previous hardcoded limits); tune them against
+# llm_token_estimate_ratio{kind="completion"} once production data is available.
+PROFILES: Dict[str, CompletionProfile] = {
+    # One table row ~ one lot or one characteristic in the JSON; free text is transcribed almost 1:1.
+    "lots_extraction": CompletionProfile(base=150, per_row=40, text_ratio=0.8, floor=1500, ceiling=16000),
+    "bid_lots_extraction": CompletionProfile(base=150, per_row=50, text_ratio=0.8, floor=2000, ceiling=16000),
+    "application_lots_extraction": CompletionProfile(base=150, per_row=55, text_ratio=0.8, floor=2000, ceiling=16000),
+    "tz_digest": CompletionProfile(base=1000, per_row=2, text_ratio=0.02, floor=1500, ceiling=3000),
+    "tz_summary": CompletionProfile(base=900, per_row=2, text_ratio=0.02, floor=1200, ceiling=3000),
+    # Rows: suppliers (links) mentioned in the Perplexity answer.
+    "perplexity_contacts_postprocess": CompletionProfile(base=150, per_row=90, text_ratio=0.0, floor=800, ceiling=4000),
+    # Rows: documents of the batch.
+    "doc_validation_batch": CompletionProfile(base=100, per_row=100, text_ratio=0.0, floor=300, ceiling=4000),
+    # One {"is_relevant", "reason"} verdict (plus the company name for sites).
+    "doc_validation": CompletionProfile(base=120, per_row=0, text_ratio=0.0, floor=300, ceiling=600),
+    "company_validation": CompletionProfile(base=150, per_row=0, text_ratio=0.0, floor=400, ceiling=800),
+    # The answer is re-emitted as JSON.
+    "transform_answer_to_json": CompletionProfile(base=100, per_row=0, text_ratio=1.2, floor=600, ceiling=4000),
+}
+
+
+@dataclass(frozen=True)
+class CompletionPlan:
+    prompt_tokens: int
+    expected: int
+    limit: int
+
+
+def _float_env(name: str, default: float) -> float:
+    raw = (os.getenv(name) or "").strip()
+    try:
+        return float(raw) if raw else default
+    except ValueError:
+        return default
+
+
+def _tiktoken_encoding() -> Any:
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:  # noqa: BLE001 - not installed or the encoding cannot be fetched offline
+            _encoding = None
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _tiktoken_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # ~4 characters per token for Latin text and markup, ~2.5 for Cyrillic.
+    cyrillic = sum(1 for char in text if "Ѐ" <= char <= "ӿ")
+    return int(cyrillic / 2.5 + (len(text) - cyrillic) / 4) + 1
+
+
+def count_request_tokens(request: Dict[str, Any]) -> int:
+    """Prompt tokens of a chat completion request: messages plus the structured-output schema."""
+    total = 0
+    for message in request.get("messages") or []:
+        content = message.get("content") if isinstance(message, dict) else None
+        if isinstance(content, list):
+            content = " ".join(str(part.get("text") or "") for part in content if isinstance(part, dict))
+        total += count_tokens(str(content or "")) + MESSAGE_OVERHEAD_TOKENS
+    response_format = request.get("response_format")
+    if isinstance(response_format, dict) and response_format.get("json_schema"):
+        total += count_tokens(json.dumps(response_format["json_schema"], ensure_ascii=False))
+    return total
+
+
+def count_rows(text: str) -> int:
+    """Data rows of the input: HTML table rows (without one header row per table) and numbered lines."""
+    if not text:
+        return 0
+    rows = 0
+    for table in _TABLE_RE.findall(text):
+        rows += max(len(_ROW_RE.findall(table)) - 1, 0)
+    return rows + len(_NUMBERED_LINE_RE.findall(_TABLE_RE.sub(" ", text)))
+
+
+def plan_completion(
+    operation: str,
+    messages: List[Dict[str, Any]],
+    source_text: str = "",
+    rows: Optional[int] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> CompletionPlan:
+    """
+    Expected output size and max_completion_tokens for the operation.
+    source_text is the part of the input the answer is built from; rows overrides its row count.
+    """
+    profile = PROFILES.get(operation, CompletionProfile(base=500, per_row=0, text_ratio=0.2, floor=1000, ceiling=4000))
+    request: Dict[str, Any] = {"messages": messages}
+    if response_format:
+        request["response_format"] = response_format
+    prompt_tokens = count_request_tokens(request)
+
+    row_count = count_rows(source_text) if rows is None else rows
+    free_text_tokens = count_tokens(_TABLE_RE.sub(" ", source_text)) if source_text else 0
+    expected = int(profile.base + profile.per_row * row_count + profile.text_ratio * free_text_tokens)
+
+    ceiling = int(_float_env(f"LLM_MAX_COMPLETION_TOKENS_{operation.upper()}", profile.ceiling))
+    limit = max(profile.floor, int(expected * _float_env("LLM_COMPLETION_SAFETY", 1.5)))
+    limit = min(limit, ceiling)
+    context_left = int(_float_env("LLM_CONTEXT_TOKENS", 128000)) - prompt_tokens
+    limit = max(min(limit, context_left), 1)
+    if expected > limit:
+        print(f"[token_preflight] {operation}: expected ~{expected} completion tokens, capped at {limit}")
+    return CompletionPlan(prompt_tokens=prompt_tokens, expected=expected, limit=limit)
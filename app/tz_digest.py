@@ -0,0 +1,92 @@
+"""
+One structured digest of a purchase's technical task, shared by all search stages and providers.
+
+The digest is keyed by purchase and a hash of terms_text and holds named sections, currently
+"digest": the build_tz_digest result (item, summary, product groups, Yandex queries and the
+search plan) for the given hints. A section is built once by its LLM call and then read back;
+a new terms_text gets a new digest and the old ones are deleted.
+"""
+
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import delete
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.models import TZDigest
+
+
+def terms_hash(terms_text: str) -> str:
+    """Whitespace differences do not change the hash."""
+    return hashlib.sha256(" ".join((terms_text or "").split()).encode("utf-8")).hexdigest()
+
+
+def _load(session: Session, purchase_id: int, terms_text: str) -> Optional[TZDigest]:
+    return session.exec(
+        select(TZDigest).where(TZDigest.purchase_id == purchase_id, TZDigest.terms_hash == terms_hash(terms_text))
+    ).first()
+
+
+def get_section(purchase_id: Optional[int], terms_text: str, section: str, variant: Any = None) -> Optional[Dict[str, Any]]:
+    """Stored section, provided it was built for the same variant (e.g. the same hints)."""
+    if purchase_id is None or not terms_text:
+        return None
+    try:
+        with Session(engine) as session:
+            digest = _load(session, purchase_id, terms_text)
+    except SQLAlchemyError as exc:
+        print(f"[tz_digest] lookup failed: {exc}")
+        return None
+    stored = json.loads(digest.digest_json).get(section) if digest else None
+    if not isinstance(stored, dict) or stored.get("variant") != variant:
+        return None
+    return stored.get("value")
+
+
+def store_section(purchase_id: Optional[int], terms_text: str, section: str, value: Dict[str, Any], variant: Any = None) -> None:
+    if purchase_id is None or not terms_text:
+        return
+    now = datetime.utcnow()
+    key = terms_hash(terms_text)
+    try:
+        with Session(engine) as session:
+            # Digests of a previous terms_text of the purchase are stale.
+            session.exec(delete(TZDigest).where(TZDigest.purchase_id == purchase_id, TZDigest.terms_hash != key))
+            digest = _load(session, purchase_id, terms_text) or TZDigest(purchase_id=purchase_id, terms_hash=key)
+            sections = json.loads(digest.digest_json or "{}")
+            sections[section] = {"variant": variant, "value": value}
+            digest.digest_json = json.dumps(sections, ensure_ascii=False)
+            digest.updated_at = now
+            session.add(digest)
+            session.commit()
+    except SQLAlchemyError as exc:
+        print(f"[tz_digest] store failed: {exc}")
+
+
+def get_or_build_section(
+    purchase_id: Optional[int],
+    terms_text: str,
+    section: str,
+    build: Callable[[], Dict[str, Any]],
+    variant: Any = None,
+) -> Dict[str, Any]:
+    """Read the section or build it with its LLM call and persist it; without a purchase it is not stored."""
+    stored = get_section(purchase_id, terms_text, section, variant)
+    if stored is not None:
+        return stored
+    value = build()
+    store_section(purchase_id, terms_text, section, value, variant)
+    return value
+
+
+def invalidate(purchase_id: int) -> None:
+    try:
+        with Session(engine) as session:
+            session.exec(delete(TZDigest).where(TZDigest.purchase_id == purchase_id))
+            session.commit()
+    except SQLAlchemyError as exc:
+        print(f"[tz_digest] invalidate failed: {exc}")
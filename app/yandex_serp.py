@@ -0,0 +1,91 @@
+"""Parsers of Yandex Search API v2 responses (rawData): streaming SEARCH_XML and the legacy HTML SERP."""
+
+import xml.etree.ElementTree as ET
+from io import BytesIO
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup
+
+
+# SEARCH_XML <error code="15">: the query has no results.
+NOTHING_FOUND_CODE = "15"
+
+
+class SerpParseError(ValueError):
+    """Raised when rawData is not a SEARCH_XML document or reports a search error."""
+
+
+def _site_root(url: str) -> Optional[str]:
+    parsed = urlparse(url)
+    if not parsed.scheme or not parsed.netloc:
+        return None
+    return f"{parsed.scheme}://{parsed.netloc}/"
+
+
+def _text(element: Optional[ET.Element]) -> str:
+    # Highlighted words come as nested <hlword> elements.
+    return " ".join("".join(element.itertext()).split()) if element is not None else ""
+
+
+def parse_serp_xml(raw: bytes) -> List[Dict[str, str]]:
+    """
+    Parse SEARCH_XML incrementally: every <doc> is converted and dropped as soon as it is closed,
+    so the whole response tree is never kept in memory.
+    Returns:
+        [{"title", "text", "link", "url"}] in SERP order; link is the site root, url the found page.
+    """
+    results: List[Dict[str, str]] = []
+    try:
+        for _, element in ET.iterparse(BytesIO(raw), events=("end",)):
+            if element.tag == "error":
+                if element.get("code") == NOTHING_FOUND_CODE:
+                    return []
+                raise SerpParseError(f"Search API error {element.get('code')}: {_text(element)}")
+            if element.tag != "doc":
+                continue
+            url = (element.findtext("url") or "").strip()
+            link = _site_root(url)
+            if link:
+                passages = [_text(passage) for passage in element.iter("passage")]
+                if not passages:
+                    passages = [_text(element.find("headline"))]
+                results.append(
+                    {
+                        "title": _text(element.find("title")),
+                        "text": "\n".join(passage for passage in passages if passage),
+                        "link": link,
+                        "url": url,
+                    }
+                )
+            element.clear()
+    except ET.ParseError as exc:
+        raise SerpParseError(f"Malformed SEARCH_XML: {exc}") from exc
+    return results
+
+
+def parse_serp_html(html_text: str) -> List[Dict[str, str]]:
+    """Parse the FORMAT_HTML SERP (fallback when the XML response cannot be used)."""
+    soup = BeautifulSoup(html_text, "lxml")
+
+    parsed_results = []
+    for si in soup.find_all("li", {"class": "serp-item"}):
+        main_link = si.find_all("a", {"class": "Link"})
+        passages = si.find_all("div", {"class": "TextContainer"})
+        # Skip "Картинки"
+        if not main_link or main_link[0].text == "Картинки":
+            continue
+
+        url = main_link[0].get("href") or ""
+        link = _site_root(url)
+        if not link:
+            continue
+        parsed_results.append(
+            {
+                "title": main_link[0].text,
+                "text": "\n".join(p.text for p in passages),
+                "link": link,
+                "url": url,
+            }
+        )
+    return parsed_results
@@ -0,0 +1,82 @@
+"""Microbenchmark: html2text on full page_source vs extract_page_text on saved supplier pages.
+
+Usage:
+    python -m benchmarks.page_text_extraction path/to/pages [--repeat 5] [--max-chars 10000]
+
+`path/to/pages` is a directory with saved page_source dumps (*.html / *.htm), for example the
+`pages/` folder of a recorded fixture archive.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from app.page_text import extract_page_text
+
+
+def _html2text_extractor(max_chars: int) -> Callable[[str], str]:
+    import html2text
+
+    return lambda html: html2text.html2text(html=html)[:max_chars]
+
+
+def _load_pages(path: Path) -> List[str]:
+    files = sorted(p for p in path.rglob("*") if p.suffix.lower() in {".html", ".htm"})
+    return [p.read_text(encoding="utf-8", errors="ignore") for p in files]
+
+
+def _run(extract: Callable[[str], str], pages: List[str], repeat: int) -> Dict[str, float]:
+    timings: List[float] = []
+    chars = 0
+    for _ in range(repeat):
+        for html in pages:
+            started = time.perf_counter()
+            chars += len(extract(html))
+            timings.append(time.perf_counter() - started)
+    return {
+        "total_s": sum(timings),
+        "mean_ms": statistics.mean(timings) * 1000,
+        "p95_ms": sorted(timings)[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000,
+        "avg_chars": chars / len(timings),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pages_dir", type=Path)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-chars", type=int, default=10000)
+    args = parser.parse_args()
+
+    pages = _load_pages(args.pages_dir)
+    if not pages:
+        print(f"No *.html pages found in {args.pages_dir}")
+        return 1
+
+    extractors: Dict[str, Callable[[str], str]] = {
+        "extract_page_text": lambda html: extract_page_text(html, max_chars=args.max_chars),
+    }
+    try:
+        extractors["html2text"] = _html2text_extractor(args.max_chars)
+    except ImportError:
+        print("html2text is not installed, baseline skipped")
+
+    total_bytes = sum(len(html.encode("utf-8")) for html in pages)
+    print(f"pages={len(pages)} size={total_bytes / 1024:.0f} KiB repeat={args.repeat}")
+    results = {name: _run(extract, pages, args.repeat) for name, extract in extractors.items()}
+    for name, stats in results.items():
+        print(
+            f"{name:>18}: total={stats['total_s']:.3f}s mean={stats['mean_ms']:.2f}ms "
+            f"p95={stats['p95_ms']:.2f}ms avg_chars={stats['avg_chars']:.0f}"
+        )
+    if "html2text" in results:
+        speedup = results["html2text"]["total_s"] / max(results["extract_page_text"]["total_s"], 1e-9)
+        print(f"speedup: x{speedup:.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Offline benchmark of the supplier search pipeline (etl.worker._collect_combined_contacts).
+
+Usage:
+    # live run: forwards Yandex/OpenAI/OpenRouter traffic and saves it with the crawled pages
+    python -m benchmarks.supplier_pipeline record path/to/fixtures tech_task_example.txt [more terms files]
+
+    # offline run on the recorded corpus
+    python -m benchmarks.supplier_pipeline replay path/to/fixtures [--repeat 3] [--task-type supplier_search]
+
+Record mode needs the usual API keys (YANDEX_API_KEY, OPENAI_API_KEY, OPENROUTER_API_KEY) and Chrome.
+Replay mode needs only Chrome: every request is answered by the local fixture server; the report
+shows per-task latency, crawl throughput and how many requests were not found in the archive.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from app.pipeline_replay import FixtureServer, start_fixture_server
+
+UPSTREAM_DEFAULTS = {
+    "openai": ("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+    "openrouter": ("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
+    "yandex": ("YANDEX_SEARCH_API_URL", "https://searchapi.api.cloud.yandex.net/v2/web/search"),
+}
+
+
+def _upstreams() -> Dict[str, str]:
+    return {name: os.getenv(env_name) or default for name, (env_name, default) in UPSTREAM_DEFAULTS.items()}
+
+
+def _point_clients_at(server: FixtureServer) -> None:
+    # Must run before suppliers_contacts is imported: it builds its OpenAI client at import time.
+    os.environ["OPENAI_BASE_URL"] = f"{server.base_url}/openai"
+    os.environ["OPENROUTER_BASE_URL"] = f"{server.base_url}/openrouter"
+    os.environ["YANDEX_SEARCH_API_URL"] = f"{server.base_url}/yandex"
+    # Cached SERP pages and verdicts would bypass the fixture server and make repeated rounds incomparable.
+    os.environ.setdefault("SERP_CACHE_ENABLED", "false")
+    os.environ.setdefault("COMPANY_VERDICT_CACHE_ENABLED", "false")
+    os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+
+
+def _run_task(terms_text: str, task_type: str) -> Dict:
+    from etl.worker import SUPPLIER_TASK_DEADLINE, _collect_combined_contacts
+    from suppliers_contacts import shutdown_driver
+
+    try:
+        return _collect_combined_contacts(terms_text, task_type, deadline=time.monotonic() + SUPPLIER_TASK_DEADLINE)
+    finally:
+        shutdown_driver()
+
+
+def record(args: argparse.Namespace) -> int:
+    server = start_fixture_server(args.fixtures, "record", _upstreams())
+    _point_clients_at(server)
+    os.environ["PIPELINE_RECORD_DIR"] = str(args.fixtures)
+    for terms_path in args.terms:
+        terms_text = terms_path.read_text(encoding="utf-8")
+        server.archive.save_terms(terms_path.stem, terms_text)
+        started = time.perf_counter()
+        result = _run_task(terms_text, args.task_type)
+        print(
+            f"{terms_path.stem}: {time.perf_counter() - started:.1f}s, "
+            f"sites={len(result.get('processed_contacts') or [])}"
+        )
+    server.shutdown()
+    print(f"recorded: {json.dumps(server.stats, sort_keys=True)}")
+    return 0
+
+
+def replay(args: argparse.Namespace) -> int:
+    server = start_fixture_server(args.fixtures, "replay", _upstreams())
+    corpus = server.archive.terms()
+    if not corpus:
+        print(f"No terms/*.txt in {args.fixtures}, record the corpus first")
+        return 1
+    _point_clients_at(server)
+    os.environ["PIPELINE_REPLAY_PROXY"] = server.base_url
+    for name in ("OPENAI_API_KEY", "OPENROUTER_API_KEY", "YANDEX_API_KEY", "YANDEX_FOLDER_ID"):
+        os.environ.setdefault(name, "replay")
+
+    latencies: List[float] = []
+    sites = 0
+    for round_idx in range(args.repeat):
+        for name, terms_text in corpus:
+            started = time.perf_counter()
+            result = _run_task(terms_text, args.task_type)
+            elapsed = time.perf_counter() - started
+            latencies.append(elapsed)
+            crawled = (result.get("crawl_stats") or {}).get("sites", 0)
+            sites += crawled
+            print(f"[{round_idx + 1}/{args.repeat}] {name}: {elapsed:.2f}s sites={crawled}")
+    server.shutdown()
+
+    total = sum(latencies)
+    print(
+        f"tasks={len(latencies)} total={total:.2f}s mean={statistics.mean(latencies):.2f}s "
+        f"p50={statistics.median(latencies):.2f}s "
+        f"p95={sorted(latencies)[min(len(latencies) - 1, int(len(latencies) * 0.95))]:.2f}s"
+    )
+    print(f"throughput: {len(latencies) / total * 60:.2f} tasks/min, {sites / total:.2f} sites/s")
+    print(f"fixtures: {json.dumps(server.stats, sort_keys=True)}")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    record_parser = subparsers.add_parser("record")
+    record_parser.add_argument("fixtures", type=Path)
+    record_parser.add_argument("terms", type=Path, nargs="+")
+    record_parser.add_argument("--task-type", default="supplier_search")
+    record_parser.set_defaults(handler=record)
+
+    replay_parser = subparsers.add_parser("replay")
+    replay_parser.add_argument("fixtures", type=Path)
+    replay_parser.add_argument("--repeat", type=int, default=1)
+    replay_parser.add_argument("--task-type", default="supplier_search")
+    replay_parser.set_defaults(handler=replay)
+
+    args = parser.parse_args()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
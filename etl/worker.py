@@ -10,8 +10,10 @@ from prometheus_client import start_http_server
 from sqlalchemy import update
 from sqlmodel import Session, select
 
+from app import llm_gateway
 from app.database import create_db_and_tables, engine
-from app.llm_metrics import record_llm_usage
+from app.llm_cache import cached_chat_completion
+from app.llm_clients import close_clients, get_client
 from app.models import (
     ApplicationLot,
     ApplicationLotParameter,
@@ -25,8 +27,9 @@ from app.models import (
     SupplierContact,
 )
 from app.search_providers.perplexity import search_suppliers_with_perplexity
+from app.serp_prefilter import filter_websites
 from app.supplier_import import merge_contacts
-from app.task_queue import TaskQueue
+from app.task_queue import TaskQueue, load_tz_digest
 from suppliers_contacts import (
     collect_contacts_from_websites,
     collect_yandex_search_output_from_text,
@@ -44,6 +47,9 @@ OPENROUTER_EMBEDDING_MODEL = os.getenv("OPENROUTER_EMBEDDING_MODEL", "perplexity
 OPENROUTER_MATCH_MODEL = os.getenv("OPENROUTER_MATCH_MODEL", "openai/gpt-4o-mini")
 LOT_MATCH_MIN_CONFIDENCE = float(os.getenv("LOT_MATCH_MIN_CONFIDENCE", "0.45"))
 LOT_PARAM_MATCH_MIN_CONFIDENCE = float(os.getenv("LOT_PARAM_MATCH_MIN_CONFIDENCE", "0.45"))
+# Wall-clock budget of one supplier search task (search + crawl) and of a single crawled site, seconds.
+SUPPLIER_TASK_DEADLINE = float(os.getenv("SUPPLIER_TASK_DEADLINE", "1800"))
+SUPPLIER_SITE_BUDGET = float(os.getenv("SUPPLIER_SITE_BUDGET", "120"))
 
 
 def _chat_completion_with_reasoning(client: OpenAI, **kwargs):
@@ -55,17 +61,29 @@ def _chat_completion_with_reasoning(client: OpenAI, **kwargs):
         payload["extra_body"] = merged
     else:
         payload["extra_body"] = {"reasoning": {"enabled": True}}
-    response = client.chat.completions.create(**payload)
-    try:
-        record_llm_usage(
-            response,
-            provider="openrouter",
-            model=str(payload.get("model") or ""),
-            operation="lot_comparison_match",
-        )
-    except Exception as exc:  # noqa: BLE001
-        logger.warning("Failed to record LLM usage metrics: %s", exc)
-    return response
+    return cached_chat_completion(
+        "lot_comparison_match",
+        "openrouter",
+        payload,
+        lambda: llm_gateway.call(
+            "lot_comparison_match",
+            "openrouter",
+            payload,
+            lambda llm_client, request: llm_client.chat.completions.create(**request),
+            client=client,
+        ),
+    )
+
+
+def _create_embeddings(client: OpenAI, texts: List[str]):
+    return llm_gateway.call(
+        "lot_comparison_embedding",
+        "openrouter",
+        {"model": OPENROUTER_EMBEDDING_MODEL, "input": texts, "encoding_format": "float"},
+        lambda llm_client, request: llm_client.embeddings.create(**request),
+        client=client,
+        allow_fallback=False,
+    )
 
 
 def _upsert_suppliers(session: Session, task: LLMTask, merged_contacts: List[Dict]) -> List[Dict]:
@@ -133,15 +151,35 @@ def _upsert_suppliers(session: Session, task: LLMTask, merged_contacts: List[Dic
     return created
 
 
-def _collect_combined_contacts(terms_text: str, task_type: str) -> Dict:
+def _collect_combined_contacts(
+    terms_text: str,
+    task_type: str,
+    websites: Optional[List[Dict]] = None,
+    deadline: Optional[float] = None,
+    purchase_id: Optional[int] = None,
+    hints: Optional[List[str]] = None,
+) -> Dict:
+    """
+    Search (Yandex/Perplexity) and crawl supplier websites within the task deadline.
+
+    When websites are given (a follow-up of a task that ran out of time) the search step is skipped
+    and only these sites are crawled. Sites not reached before the deadline are returned in
+    "skipped_websites". The TZ summary is shared by all stages through the purchase's TZ digest
+    (one build_tz_digest call per terms_text and hints).
+    """
     yandex_result: Dict = {"queries": [], "search_output": [], "processed_contacts": [], "tz_summary": None}
     perplexity_result: Dict = {"queries": [], "search_output": [], "processed_contacts": []}
     notes: List[str] = []
 
+    if websites:
+        return _crawl_websites(terms_text, websites, None, [], notes, deadline, purchase_id, hints)
+
     if task_type == "supplier_search":
         try:
-            yandex_result = collect_yandex_search_output_from_text(terms_text)
-            notes.append("Yandex поиск обработан")
+            yandex_result = collect_yandex_search_output_from_text(
+                terms_text, tz_summary=load_tz_digest(purchase_id, terms_text, hints)
+            )
+            notes.append(yandex_result.get("note") or "Yandex поиск обработан")
         except Exception as exc:  # noqa: BLE001
             logger.exception("Yandex provider failed")
             notes.append(f"Yandex недоступен: {exc}")
@@ -167,21 +205,39 @@ def _collect_combined_contacts(terms_text: str, task_type: str) -> Dict:
             "dedup_key": item.get("dedup_key"),
             "reason": item.get("reason"),
         }
-        for item in merged_websites
+        for item in filter_websites(merged_websites, "combined")
         if item.get("website")
     ]
+    queries = (yandex_result.get("queries") or []) + (perplexity_result.get("queries") or [])
+    return _crawl_websites(
+        terms_text, websites_to_crawl, yandex_result.get("tz_summary"), queries, notes, deadline, purchase_id, hints
+    )
+
 
+def _crawl_websites(
+    terms_text: str,
+    websites_to_crawl: List[Dict],
+    tz_summary: Optional[Dict],
+    queries: List,
+    notes: List[str],
+    deadline: Optional[float],
+    purchase_id: Optional[int] = None,
+    hints: Optional[List[str]] = None,
+) -> Dict:
     # 2) Crawl merged websites and collect contacts.
     try:
         crawled = collect_contacts_from_websites(
             technical_task_text=terms_text,
             websites=websites_to_crawl,
-            tz_summary=yandex_result.get("tz_summary"),
+            tz_summary=tz_summary or load_tz_digest(purchase_id, terms_text, hints),
+            deadline=deadline,
+            site_budget=SUPPLIER_SITE_BUDGET,
         )
     except Exception as exc:  # noqa: BLE001
         logger.exception("Website crawl failed")
         notes.append(f"Обход сайтов завершился с ошибкой: {exc}")
         crawled = {"processed_contacts": [], "search_output": []}
+    skipped_websites = crawled.get("skipped_websites") or []
     merged_contacts = merge_contacts(crawled.get("processed_contacts") or [], crawled.get("search_output") or [])
 
     merged_search_output = [
@@ -207,20 +263,48 @@ def _collect_combined_contacts(terms_text: str, task_type: str) -> Dict:
         }
         for item in merged_contacts
     ]
+    crawled_count = len(websites_to_crawl) - len(skipped_websites)
+    notes.append(f"Обход сайтов выполнен: {crawled_count} шт.")
+    if skipped_websites:
+        notes.append(f"Обход не завершён (время задачи или недоступность LLM), отложено сайтов: {len(skipped_websites)}")
     return {
-        "queries": (yandex_result.get("queries") or []) + (perplexity_result.get("queries") or []),
+        "queries": queries,
         "tech_task_excerpt": terms_text[:160],
-        "note": "; ".join(notes + [f"Обход сайтов выполнен: {len(websites_to_crawl)} шт."]),
+        "note": "; ".join(notes),
         "search_output": merged_search_output,
         "processed_contacts": merged_processed_contacts,
+        "skipped_websites": skipped_websites,
+        "crawl_stats": crawled.get("crawl_stats"),
     }
 
 
+def _budget_retried(websites: List[Dict]) -> int:
+    return sum(1 for item in websites if item.get("budget_retry"))
+
+
+def _enqueue_followup_crawl(
+    session: Session, task: LLMTask, terms_text: str, skipped_websites: List[Dict], hints: Optional[List[str]] = None
+) -> int:
+    """Queue a task of the same type that crawls only the sites skipped on deadline."""
+    followup = LLMTask(
+        purchase_id=task.purchase_id,
+        task_type=task.task_type,
+        input_text=json.dumps(
+            {"terms_text": terms_text, "hints": hints or [], "websites": skipped_websites, "resume_of": task.id},
+            ensure_ascii=False,
+        ),
+        status="queued",
+    )
+    session.add(followup)
+    session.flush()
+    return followup.id
+
+
 def _build_openrouter_client() -> OpenAI:
     api_key = os.getenv("OPENROUTER_API_KEY")
     if not api_key:
         raise RuntimeError("OPENROUTER_API_KEY is not configured")
-    return OpenAI(base_url=OPENROUTER_BASE_URL, api_key=api_key)
+    return get_client("openrouter", base_url=OPENROUTER_BASE_URL, api_key=api_key)
 
 
 def _lot_to_text(name: str, parameters: List[Dict]) -> str:
@@ -413,11 +497,7 @@ def _build_characteristic_rows(
     bid_params_indexed = [{"id": idx, **param} for idx, param in enumerate(bid_lot_params)]
 
     all_texts = [_param_to_text(item) for item in lot_params_indexed] + [_param_to_text(item) for item in bid_params_indexed]
-    embeddings_response = client.embeddings.create(
-        model=OPENROUTER_EMBEDDING_MODEL,
-        input=all_texts,
-        encoding_format="float",
-    )
+    embeddings_response = _create_embeddings(client, all_texts)
     indexed_vectors = sorted(embeddings_response.data, key=lambda item: item.index)
     vectors = [item.embedding for item in indexed_vectors]
     lot_vectors = vectors[: len(lot_params_indexed)]
@@ -547,11 +627,7 @@ def _build_lot_comparison_rows(session: Session, purchase_id: int, bid_id: int)
     all_texts = [_lot_to_text(item["name"], item["parameters"]) for item in purchase_items] + [
         _lot_to_text(item["name"], item["parameters"]) for item in bid_items
     ]
-    embeddings_response = client.embeddings.create(
-        model=OPENROUTER_EMBEDDING_MODEL,
-        input=all_texts,
-        encoding_format="float",
-    )
+    embeddings_response = _create_embeddings(client, all_texts)
     indexed_vectors = sorted(embeddings_response.data, key=lambda item: item.index)
     vectors = [item.embedding for item in indexed_vectors]
     purchase_vectors = vectors[: len(purchase_items)]
@@ -681,11 +757,7 @@ def _build_application_lot_comparison_rows(session: Session, purchase_id: int, a
     all_texts = [_lot_to_text(item["name"], item["parameters"]) for item in purchase_items] + [
         _lot_to_text(item["name"], item["parameters"]) for item in application_items
     ]
-    embeddings_response = client.embeddings.create(
-        model=OPENROUTER_EMBEDDING_MODEL,
-        input=all_texts,
-        encoding_format="float",
-    )
+    embeddings_response = _create_embeddings(client, all_texts)
     indexed_vectors = sorted(embeddings_response.data, key=lambda item: item.index)
     vectors = [item.embedding for item in indexed_vectors]
     purchase_vectors = vectors[: len(purchase_items)]
@@ -778,9 +850,19 @@ def _process_task(task: LLMTask) -> None:
 
     payload = TaskQueue._load_payload(task.input_text)
     terms_text = payload.get("terms_text", "")
+    resume_websites = payload.get("websites") or None
+    deadline = time.monotonic() + SUPPLIER_TASK_DEADLINE if SUPPLIER_TASK_DEADLINE > 0 else None
 
     logger.info("Starting supplier search task %s", task.id)
-    result = _collect_combined_contacts(terms_text, task.task_type)
+    with llm_gateway.llm_deadline(deadline):
+        result = _collect_combined_contacts(
+            terms_text,
+            task.task_type,
+            websites=resume_websites,
+            deadline=deadline,
+            purchase_id=task.purchase_id,
+            hints=payload.get("hints") or None,
+        )
 
     with Session(engine) as session:
         task_in_db = session.get(LLMTask, task.id)
@@ -797,6 +879,22 @@ def _process_task(task: LLMTask) -> None:
                     session.add(purchase)
 
             note = result.get("note") or "Поиск поставщиков завершён"
+            skipped_websites = result.get("skipped_websites") or []
+            # A follow-up that crawled nothing would only requeue the same list; a site deferred
+            # over its budget is retried once (budget_retry), the second overrun gets a verdict.
+            if skipped_websites and (
+                not resume_websites
+                or len(skipped_websites) < len(resume_websites)
+                or _budget_retried(skipped_websites) > _budget_retried(resume_websites)
+            ):
+                followup_id = _enqueue_followup_crawl(session, task_in_db, terms_text, skipped_websites, payload.get("hints"))
+                result = result | {"followup_task_id": followup_id}
+                logger.info(
+                    "Task %s hit the deadline, %s websites moved to task %s",
+                    task.id,
+                    len(skipped_websites),
+                    followup_id,
+                )
             payload = result | {"created_suppliers": created_suppliers, "note": note}
             task_in_db.output_text = json.dumps(payload, ensure_ascii=False)
             task_in_db.status = "completed"
@@ -873,6 +971,8 @@ def main() -> None:
         run_worker()
     except KeyboardInterrupt:
         logger.info("ETL worker stopped")
+    finally:
+        close_clients()
 
 
 if __name__ == "__main__":
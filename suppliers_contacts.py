@@ -1,30 +1,44 @@
 import os
 import json
+import contextvars
 from io import BytesIO
-from time import sleep
+from contextlib import nullcontext
+from time import monotonic, sleep
+from dataclasses import dataclass, field
 from typing import Tuple, List, Dict, Any, Optional
 from PIL import Image
 
 from difflib import SequenceMatcher
 import base64
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse
-import html2text
+from urllib.parse import unquote
 
 from tqdm import tqdm
 
-from openai import OpenAI
-try:
-    from app.llm_metrics import record_llm_usage
-except Exception:  # noqa: BLE001
-    def record_llm_usage(response, provider, model, operation):  # type: ignore[no-redef]
-        _ = (response, provider, model, operation)
-
+from app import llm_gateway
+from app.company_verdict_cache import cache_key as company_verdict_key, get_cached_verdict, store_verdict
+from app.contact_emails import extract_contact_emails, extract_text_emails
+from app.crawl_metrics import CrawlStats
+from app.llm_cache import cached_chat_completion
+from app.llm_clients import get_client
+from app.domain_health import classify_failure, domain_health, domain_key
+from app.page_text import extract_page_text
+from app.prompt_compaction import compact_terms_text
+from app.token_preflight import plan_completion
+from app.pipeline_replay import record_dir, record_page, replay_proxy, replay_url
+from app.relevance_model import doc_snippet, prescore_docs, record_verdict
+from app.serp_cache import get_cached_results, store_results
+from app.serp_prefilter import PrefilterLog, classify
+from app.site_discovery import discover_site_pages
+from app.yandex_serp import SerpParseError, parse_serp_html, parse_serp_xml
 
 
 import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
 import helium
 import requests
+from requests.adapters import HTTPAdapter
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -33,6 +47,16 @@ from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from helium import Link
 
 driver = None
+driver_page_load_timeout: Optional[float] = None
+# Absolute time.monotonic() limit for navigations of the site being crawled (see collect_contacts_from_websites).
+crawl_deadline: Optional[float] = None
+# Navigations with less time left than this are not started.
+MIN_NAVIGATION_SECONDS = 3.0
+# Telemetry of the running collect_contacts_from_websites call.
+crawl_stats: Optional[CrawlStats] = None
+
+# Bytes transferred for the current document and its subresources (0 for cross-origin without Timing-Allow-Origin).
+PAGE_BYTES_SCRIPT = "return performance.getEntries().reduce((total, entry) => total + (entry.transferSize || 0), 0);"
 
 
 class WebsiteVisitError(Exception):
@@ -43,6 +67,25 @@ class WebsiteVisitTimeout(WebsiteVisitError):
     """Raised when page renderer/page-load timeout happens."""
 
 
+class WebsiteVisitSkipped(WebsiteVisitError):
+    """Raised when the domain is in the negative cache after recent timeouts/connection failures."""
+
+
+class CrawlBudgetExceeded(WebsiteVisitError):
+    """Raised when the per-site or per-task crawl time budget is used up."""
+
+
+def _stage(name: str):
+    return crawl_stats.stage(name) if crawl_stats is not None else nullcontext()
+
+
+def _page_bytes(drv: webdriver.Chrome) -> int:
+    try:
+        return int(drv.execute_script(PAGE_BYTES_SCRIPT) or 0)
+    except Exception:  # noqa: BLE001
+        return 0
+
+
 def get_driver() -> webdriver.Chrome:
     global driver
     if driver is None:
@@ -54,35 +97,50 @@ def get_driver() -> webdriver.Chrome:
         chrome_options.add_argument("--headless=new")
         chrome_options.add_argument("--no-sandbox")
         chrome_options.add_argument("--disable-dev-shm-usage")
+        if replay_proxy():
+            chrome_options.add_argument(f"--proxy-server={replay_proxy()}")
+            chrome_options.add_argument("--proxy-bypass-list=<-loopback>")
         driver = helium.start_chrome(headless=True, options=chrome_options)
-        driver.set_page_load_timeout(int(os.environ.get("PAGE_LOAD_TIMEOUT", "20")))
+        _set_page_load_timeout(driver, domain_health.default_timeout)
     return driver
 
 
+def _set_page_load_timeout(drv: webdriver.Chrome, seconds: float) -> None:
+    global driver_page_load_timeout
+    if driver_page_load_timeout != seconds:
+        drv.set_page_load_timeout(seconds)
+        driver_page_load_timeout = seconds
+
+
 def shutdown_driver() -> None:
-    global driver
+    global driver, driver_page_load_timeout
     if driver:
         try:
             driver.close()
         finally:
             driver = None
-
-
-client = OpenAI(api_key=os.environ["OPENAI_API_KEY"], base_url=os.environ.get("OPENAI_BASE_URL"))
-
-
-def _chat_completion_with_metrics(**kwargs):
-    response = client.chat.completions.create(**kwargs)
-    try:
-        record_llm_usage(
-            response,
-            provider="openai",
-            model=str(kwargs.get("model") or ""),
-            operation="supplier_search_contacts",
-        )
-    except Exception as exc:  # noqa: BLE001
-        print(f"[metrics] failed to record supplier-search usage: {exc}")
-    return response
+            driver_page_load_timeout = None
+
+
+client = get_client("openai", api_key=os.environ["OPENAI_API_KEY"], base_url=os.environ.get("OPENAI_BASE_URL"))
+
+
+def _chat_completion_with_metrics(operation: str, expected_completion_tokens: Optional[int] = None, **kwargs):
+    # operation names the call in metrics, the cache and LLM_FALLBACK_<OPERATION> (as in plan_completion).
+    # The task deadline comes from llm_gateway.llm_deadline(); validation pools copy the context.
+    return cached_chat_completion(
+        operation,
+        "openai",
+        kwargs,
+        lambda: llm_gateway.call(
+            operation,
+            "openai",
+            kwargs,
+            lambda llm_client, request: llm_client.chat.completions.create(**request),
+            client=client,
+            expected_completion_tokens=expected_completion_tokens,
+        ),
+    )
 
 
 SUMMARY_INSTRUCTIONS = """Твоя задача — преобразовать техническое задание с длинным перечнем однотипных товаров
@@ -151,6 +209,59 @@ DOC_VAL_INSTRUCTIONS = """Вы — помощник по поиску прямы
 }}
 """
 
+DOC_VAL_BATCH_INSTRUCTIONS = """Вы — помощник по поиску прямых поставщиков (производителей или официальных дистрибьюторов)
+для следующей закупки.
+
+ТЕХНИЧЕСКОЕ ЗАДАНИЕ (сводка):
+{technical_spec}
+
+ВАША ЗАДАЧА:
+Для КАЖДОГО поискового результата ниже оценить, является ли он потенциально релевантным поставщиком
+для ЭТОЙ закупки. Оценивайте результаты независимо друг от друга.
+
+ПОИСКОВЫЕ РЕЗУЛЬТАТЫ:
+{documents}
+
+КРИТЕРИИ РЕЛЕВАНТНОСТИ:
+- "Релевантно", если по тексту видно, что сайт относится к:
+  - производителю, заводу, фабрике;
+  - официальному дилеру / дистрибьютору;
+  - оптовому поставщику/дистрибьютору нужного ассортимента.
+- "НЕ релевантно", если:
+  - это маркетплейсы и агрегаторы (Ozon, Wildberries, Яндекс.Маркет, Aliexpress, Alibaba, Amazon и т.п.);
+  - доски объявлений, каталоги-агрегаторы, сервисы объявлений;
+  - блоги, статьи, справочники, энциклопедии;
+  - сайт явно про другую сферу.
+
+ФОРМАТ ОТВЕТА: по одному вердикту на каждый результат, поле "link" — ссылка результата без изменений,
+"reason" — краткое объяснение на русском.
+"""
+
+DOC_VAL_BATCH_SCHEMA: Dict[str, Any] = {
+    "name": "search_results_validation",
+    "schema": {
+        "type": "object",
+        "properties": {
+            "verdicts": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "link": {"type": "string"},
+                        "is_relevant": {"type": "boolean"},
+                        "reason": {"type": "string"},
+                    },
+                    "required": ["link", "is_relevant", "reason"],
+                    "additionalProperties": False,
+                },
+            }
+        },
+        "required": ["verdicts"],
+        "additionalProperties": False,
+    },
+    "strict": True,
+}
+
 COMPANY_VAL_INSTRUCTIONS = """Ты — эксперт по закупкам.
 Согласно техническому заданию тебе нужно закупить:
 {tz}
@@ -226,18 +337,22 @@ def summarize_tz_for_single_supplier(tz_text: str) -> Dict[str, Any]:
     }
     """
 
-    prompt = f"{SUMMARY_INSTRUCTIONS}\n\nИсходное техническое задание:\n{tz_text}"
+    prompt = f"{SUMMARY_INSTRUCTIONS}\n\nИсходное техническое задание:\n{compact_terms_text(tz_text, 'tz_summary')}"
+    messages = [
+        {
+            "role": "system",
+            "content": "Ты помощник по структурированию технических заданий для поиска одного поставщика."
+        },
+        {"role": "user", "content": prompt},
+    ]
+    plan = plan_completion("tz_summary", messages, source_text=tz_text)
 
     response = _chat_completion_with_metrics(
+        "tz_summary",
+        expected_completion_tokens=plan.expected,
         model=os.environ["OPENAI_MODEL"],
-        messages=[
-            {
-                "role": "system",
-                "content": "Ты помощник по структурированию технических заданий для поиска одного поставщика."
-            },
-            {"role": "user", "content": prompt},
-        ],
-        max_completion_tokens=2500,
+        messages=messages,
+        max_completion_tokens=plan.limit,
         extra_body={"reasoning": {"enabled": False}},
     )
 
@@ -309,14 +424,18 @@ def transform_answer_to_json(task: str, received_answer: str) -> Dict[str, Any]:
         Parsed JSON as dictionary
     """
     prompt = FIX_JSON_INSTRUCTIONS(task=task, received_answer=received_answer)
+    messages = [
+        {"role": "system", "content": "You are a JSON transformation specialist."},
+        {"role": "user", "content": prompt}
+    ]
+    plan = plan_completion("transform_answer_to_json", messages, source_text=received_answer)
     try:
         response = _chat_completion_with_metrics(
+            "transform_answer_to_json",
+            expected_completion_tokens=plan.expected,
             model=os.environ["OPENAI_MODEL"],
-            messages=[
-                {"role": "system", "content": "You are a JSON transformation specialist."},
-                {"role": "user", "content": prompt}
-            ],
-            max_completion_tokens=2000,
+            messages=messages,
+            max_completion_tokens=plan.limit,
             extra_body={"reasoning": {"enabled": False}},
         )
         
@@ -497,13 +616,36 @@ def visit_website(url: str) -> str:
     Returns:
         Confirmation string.
     """
-    get_driver()
+    drv = get_driver()
+    domain = domain_key(url)
+    blocked_for = domain_health.blocked_for(domain)
+    if blocked_for:
+        domain_health.record_skip()
+        raise WebsiteVisitSkipped(f"{domain} is skipped for {blocked_for:.0f}s after recent failures")
+
+    timeout = domain_health.timeout_for(domain)
+    if crawl_deadline is not None:
+        remaining = crawl_deadline - monotonic()
+        if remaining < MIN_NAVIGATION_SECONDS:
+            raise CrawlBudgetExceeded(f"no time left to open {url}")
+        timeout = min(timeout, remaining)
+    _set_page_load_timeout(drv, timeout)
+    started = monotonic()
     try:
-        helium.go_to(url)
+        helium.go_to(replay_url(url))
     except TimeoutException as exc:
-        raise WebsiteVisitTimeout(f"Timeout while loading {url}: {exc}") from exc
+        domain_health.record_failure(domain, monotonic() - started, "timeout", timeout_used=timeout)
+        raise WebsiteVisitTimeout(f"Timeout while loading {url} ({timeout:.0f}s): {exc}") from exc
     except Exception as exc:  # noqa: BLE001
+        domain_health.record_failure(domain, monotonic() - started, classify_failure(exc))
         raise WebsiteVisitError(f"Failed to load {url}: {exc}") from exc
+    elapsed = monotonic() - started
+    domain_health.record_success(domain, elapsed)
+    if crawl_stats is not None:
+        crawl_stats.add_stage_time("page_load", elapsed)
+        crawl_stats.add_page(_page_bytes(drv))
+    if record_dir() is not None:
+        record_page(url, drv.page_source, drv.current_url)
     return f"Opened {url}"
 
 
@@ -556,139 +698,253 @@ def scroll_page(direction: str = "down", num_pixels: int = 1200) -> str:
     return f"Scrolled {direction} {num_pixels}px"
 
 
-def get_emails() -> List[str]:
+CONTACTS_LINK_TEXTS = ["контакты", "наши контакты", "связаться с нами", "обратная связь"]
+ABOUT_LINK_TEXTS = ["о нас", "о компании", "о заводе", "про нас", "о бренде"]
+CATALOG_LINK_TEXTS = ["Каталог", "продукция", "товары"]
+
+# One round trip per page: all links (text + absolute href), mailto targets and visible text.
+PAGE_SNAPSHOT_SCRIPT = """
+const links = [];
+const mailto = [];
+for (const a of document.querySelectorAll('a[href]')) {
+  const href = a.href || '';
+  if (/^mailto:/i.test(href)) {
+    mailto.push(href.slice(7).split('?')[0]);
+    continue;
+  }
+  if (!/^https?:/i.test(href)) {
+    continue;
+  }
+  const text = a.innerText || a.textContent || a.getAttribute('title') || a.getAttribute('aria-label') || '';
+  links.push({text: text.replace(/\\s+/g, ' ').trim(), href: href.split('#')[0]});
+}
+return {
+  url: window.location.href,
+  links: links,
+  mailto: mailto,
+  text: document.body ? (document.body.innerText || '') : '',
+};
+"""
+
+
+@dataclass
+class PageSnapshot:
+    """Links, mailto targets and visible text of the current page, fetched in one script call."""
+
+    url: str = ""
+    links: List[Dict[str, str]] = field(default_factory=list)
+    mailto: List[str] = field(default_factory=list)
+    text: str = ""
+
+
+def take_page_snapshot() -> PageSnapshot:
     """
-    Extract email addresses from current page HTML.
+    Extract all page data needed by the crawler with a single WebDriver call.
     Returns:
-        List of unique emails.
+        PageSnapshot of the currently opened page.
     """
-    html = get_driver().page_source or ""
-    # Simple RFC-like email regex
-    pattern = r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}"
-    emails = re.findall(pattern, html)
-    # Filter obvious false positives (asset filenames like image@2x.jpg)
-    image_like_tlds = {
-        "jpg",
-        "jpeg",
-        "png",
-        "webp",
-        "gif",
-        "svg",
-        "bmp",
-        "tiff",
-        "avif",
-        "jfif",
-        "ico",
-    }
+    payload = get_driver().execute_script(PAGE_SNAPSHOT_SCRIPT) or {}
+    links = [
+        {"text": str(item.get("text") or ""), "href": str(item.get("href") or "")}
+        for item in payload.get("links") or []
+        if isinstance(item, dict) and item.get("href")
+    ]
+    mailto = [unquote(str(item)).strip() for item in payload.get("mailto") or [] if item]
+    return PageSnapshot(
+        url=str(payload.get("url") or ""),
+        links=links,
+        mailto=[item for item in mailto if item],
+        text=str(payload.get("text") or ""),
+    )
 
-    def is_plausible_email(candidate: str) -> bool:
-        local, _, domain = candidate.partition("@")
-        if not local or not domain:
-            return False
-        tld = domain.rsplit(".", 1)[-1].lower()
-        if tld in image_like_tlds:
-            return False
-        return True
 
-    filtered: List[str] = []
-    for e in emails:
-        if is_plausible_email(e):
-            filtered.append(e)
+def match_links(keywords: List[str], links: List[Dict[str, str]], min_ratio: float = 0.6) -> List[Dict[str, str]]:
+    """
+    Fuzzy-match keywords against snapshot links (same rules as fuzzy_matched).
+    Link texts are normalized once and each keyword is compared against all of them
+    with a reused SequenceMatcher, cheap upper bounds first.
+    Returns:
+        The first matching link per keyword, in keyword priority order, unique by href.
+    """
+    texts = [" ".join((link.get("text") or "").lower().split()) for link in links]
+    matcher = SequenceMatcher(None)
+    matched: List[Dict[str, str]] = []
+    seen_hrefs: set[str] = set()
+
+    for keyword in keywords:
+        query = keyword.strip().lower()
+        if not query:
+            continue
+        matcher.set_seq2(query)
+        for link, text in zip(links, texts):
+            if not text:
+                continue
+            if not (query in text or text in query):
+                matcher.set_seq1(text)
+                if matcher.real_quick_ratio() < min_ratio or matcher.quick_ratio() < min_ratio:
+                    continue
+                if matcher.ratio() < min_ratio:
+                    continue
+            href = link.get("href") or ""
+            if href and href not in seen_hrefs:
+                seen_hrefs.add(href)
+                matched.append(link)
+            break
+
+    return matched
+
+
+def _find_emails(source: str, site_url: Optional[str] = None) -> List[str]:
+    return [candidate.email for candidate in extract_text_emails(source or "", site_url=site_url)]
 
-    # Deduplicate while preserving order
+
+def _merge_emails(*groups: List[str]) -> List[str]:
     seen = set()
     result: List[str] = []
-    for e in filtered:
-        if e not in seen:
-            seen.add(e)
-            result.append(e)
-
+    for group in groups:
+        for email in group:
+            key = email.lower()
+            if key not in seen:
+                seen.add(key)
+                result.append(email)
     return result
 
 
-def open_about_section() -> bool:
+def get_emails(snapshot: Optional[PageSnapshot] = None) -> List[str]:
     """
-    Try to find on current page and open "About" section
+    Extract email addresses from current page HTML: plain, mailto, Cloudflare-protected,
+    [at]/(собака)-obfuscated, JSON-LD and microdata forms.
+    Args:
+        snapshot: Optional snapshot of the same page; its mailto targets and visible text are also scanned.
     Returns:
-        Confirmation bool. Does section "About" was found and opend successfully.
+        List of unique emails, best candidates (role accounts on the site's domain) first.
     """
-    contacts_texts = ["о нас", "о компании", "о заводе", "про нас", "о бренде"]
-
-    for link_text in contacts_texts:
-        links = find_links(link_text)
-        if links:
-            try:
-                click_link(links[0])
-            except Exception as exc:  # noqa: BLE001
-                print(f"open_about_section click failed: {exc}")
-                continue
+    drv = get_driver()
+    site_url = drv.current_url
+    emails = [candidate.email for candidate in extract_contact_emails(drv.page_source or "", site_url=site_url)]
+    if snapshot is None:
+        return emails
+    return _merge_emails(
+        emails,
+        _find_emails("\n".join(snapshot.mailto), site_url),
+        _find_emails(snapshot.text, site_url),
+    )
 
-            return True
 
+def _open_first_url(urls: List[str], tag: str) -> bool:
+    tried: set[str] = set()
+    for url in urls:
+        if not url or url in tried:
+            continue
+        tried.add(url)
+        try:
+            visit_website(url)
+        except WebsiteVisitError as exc:
+            print(f"{tag} navigation failed: {exc}")
+            continue
+        return True
     return False
 
 
-def open_catalog() -> bool:
+def _link_hrefs(keywords: List[str], snapshot: PageSnapshot) -> List[str]:
+    return [link["href"] for link in match_links(keywords, snapshot.links)]
+
+
+def open_about_section(
+    snapshot: Optional[PageSnapshot] = None,
+    discovered_urls: Optional[List[str]] = None,
+) -> bool:
     """
-    Try to find on current page and open "Каталог"/"Продукция" page
+    Try to find on current page and open "About" section
+    Args:
+        snapshot: Snapshot of the page to search links on (taken from the current page if omitted).
+        discovered_urls: Ranked "About" URLs from discover_site_pages, tried before page links.
     Returns:
-        Confirmation bool. Does "Каталог"/"Продукция" page was found and opend successfully.
+        Confirmation bool. Does section "About" was found and opend successfully.
     """
-    contacts_texts = ["Каталог", "продукция", "товары"]
+    urls = list(discovered_urls or []) + _link_hrefs(ABOUT_LINK_TEXTS, snapshot or take_page_snapshot())
+    return _open_first_url(urls, "open_about_section")
 
-    for link_text in contacts_texts:
-        links = find_links(link_text)
-        if links:
-            try:
-                click_link(links[0])
-            except:
-                continue
-            
-            return True
 
-    return False
+def open_catalog(
+    snapshot: Optional[PageSnapshot] = None,
+    discovered_urls: Optional[List[str]] = None,
+) -> bool:
+    """
+    Try to find on current page and open "Каталог"/"Продукция" page
+    Args:
+        snapshot: Snapshot of the page to search links on (taken from the current page if omitted).
+        discovered_urls: Ranked catalog URLs from discover_site_pages, tried before page links.
+    Returns:
+        Confirmation bool. Does "Каталог"/"Продукция" page was found and opend successfully.
+    """
+    urls = list(discovered_urls or []) + _link_hrefs(CATALOG_LINK_TEXTS, snapshot or take_page_snapshot())
+    return _open_first_url(urls, "open_catalog")
 
 
-def parse_website(url: str) -> List[str]:
+def parse_website(url: str, contact_urls: Optional[List[str]] = None) -> List[str]:
     """
     Open a webpage in browser and find all emails.
     Args:
         url: The page to load.
+        contact_urls: Ranked contact page URLs from discover_site_pages, tried before page links.
     Returns:
         List of unique emails.
     """
     visit_website(url)
-    emails = get_emails()
+    snapshot = take_page_snapshot()
+    emails = get_emails(snapshot)
     if emails:
         return emails
 
-    contacts_texts = ["контакты", "наши контакты", "связаться с нами", "обратная связь"]
-
-    for link_text in contacts_texts:
-        links = find_links(link_text)
-        if links:
-            try:
-                click_link(links[0])
-            except:
-                continue
-            
-            emails += get_emails()
-            return emails
+    urls = list(contact_urls or []) + _link_hrefs(CONTACTS_LINK_TEXTS, snapshot)
+    if _open_first_url(urls, "parse_website"):
+        return get_emails(take_page_snapshot())
 
     return []
 
 
-def yandex_search_suppliers(query: str) -> List[Dict]:
-    """
-    Use Yandex Web Search API to get SERP and find websites that are likely
-    direct manufacturers or suppliers for the given product query.
+def _discover_pages(website: str) -> Dict[str, List[str]]:
+    if (os.getenv("SITE_DISCOVERY_ENABLED") or "true").strip().lower() != "true":
+        return {}
+    if domain_health.blocked_for(domain_key(website)):
+        return {}
+    # Discovery shares the site's crawl budget: the browser still needs time for the main page.
+    if crawl_deadline is not None and crawl_deadline - monotonic() < 2 * MIN_NAVIGATION_SECONDS:
+        return {}
+    try:
+        return discover_site_pages(
+            website,
+            timeout=_safe_int_env("SITE_DISCOVERY_TIMEOUT", 5),
+            deadline=crawl_deadline - MIN_NAVIGATION_SECONDS if crawl_deadline is not None else None,
+        )
+    except Exception as exc:  # noqa: BLE001
+        print(f"site discovery failed for {website}: {exc}")
+        return {}
 
-    Args:
-        query: Text query for search
 
-    Returns:
-        The list of search results from page with nested fields - "title", "text", "link".
-    """
+YANDEX_SEARCH_API_URL = os.getenv("YANDEX_SEARCH_API_URL", "https://searchapi.api.cloud.yandex.net/v2/web/search")
+# FORMAT_XML (streamed SEARCH_XML, default) or FORMAT_HTML; the HTML parser is also the XML fallback.
+YANDEX_SEARCH_FORMAT = (os.getenv("YANDEX_SEARCH_FORMAT") or "FORMAT_XML").strip().upper()
+
+_search_session: Optional[requests.Session] = None
+_search_session_lock = threading.Lock()
+
+
+def _get_search_session() -> requests.Session:
+    """Keep-alive session shared by concurrent Search API queries."""
+    global _search_session
+    with _search_session_lock:
+        if _search_session is None:
+            pool_size = max(1, _safe_int_env("YANDEX_SEARCH_CONCURRENCY", 4))
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+            _search_session = session
+    return _search_session
+
+
+def _request_serp(query: str, page: int, response_format: str) -> Optional[bytes]:
     # --- Config from env (do not hard-code secrets) ---
     api_key = os.getenv("YANDEX_API_KEY")
     folder_id = os.getenv("YANDEX_FOLDER_ID")
@@ -698,7 +954,7 @@ def yandex_search_suppliers(query: str) -> List[Dict]:
             "searchType": "SEARCH_TYPE_RU",          # full-text web search
             "queryText": query,
             "familyMode": "FAMILY_MODE_NONE",         # adjust as needed: SAFE / MODERATE / NONE
-            "page": 0,
+            "page": page,
             "fixTypoMode": "FIX_TYPO_MODE_OFF",        # typo correction
         },
         "sortSpec": {
@@ -714,14 +970,14 @@ def yandex_search_suppliers(query: str) -> List[Dict]:
         # "region": params.region_id,
         "l10N": "LOCALIZATION_RU",                     # notification language (adapt if needed)
         "folderId": folder_id,
-        "responseFormat": "FORMAT_HTML",         # Yandex returns HTML/SEARCH_XML in base64
+        "responseFormat": response_format,       # Yandex returns SEARCH_XML/HTML in base64
         "userAgent": "browser-use-supplier-finder/1.0",
     }
 
     response = None
     try:
-        response = requests.post(
-            "https://searchapi.api.cloud.yandex.net/v2/web/search",
+        response = _get_search_session().post(
+            YANDEX_SEARCH_API_URL,
             headers={"Authorization": f"Api-Key {api_key}"},
             json=body,
             timeout=20,
@@ -739,45 +995,84 @@ def yandex_search_suppliers(query: str) -> List[Dict]:
             f"Search API request failed: status={status_code}, error={exc}, "
             f"query={query!r}, response={response_text}"
         )
-        return []
+        return None
 
-    try:
-        result_json = response.json()
-        raw_data_b64 = result_json.get("rawData")
-        if not raw_data_b64:
-            print('No data recieved from Search API response')
-            return []
+    raw_data_b64 = response.json().get("rawData")
+    if not raw_data_b64:
+        print('No data recieved from Search API response')
+        return None
+    return base64.b64decode(raw_data_b64)
 
-        # Decode base64 HTML
-        html_bytes = base64.b64decode(raw_data_b64)
-        html_text = html_bytes.decode("utf-8", errors="ignore")
 
-        # HTML parsing (TODO: XML)
-        soup = BeautifulSoup(html_text, "html.parser")
+def yandex_search_suppliers(query: str, page: int = 0) -> List[Dict]:
+    """
+    Use Yandex Web Search API to get SERP and find websites that are likely
+    direct manufacturers or suppliers for the given product query.
 
-        parsed_results = []
-        serp_items = soup.find_all('li', {'class': "serp-item"})
+    Args:
+        query: Text query for search
+        page: SERP page number (0-based)
 
-        for si in serp_items:
-            main_link = si.find_all('a', {'class': 'Link'})
-            passages = si.find_all('div', {'class': "TextContainer"})
-            # Skip "Картинки"
-            if main_link[0].text == 'Картинки':
-                continue
+    Parsed pages are cached by normalized query (app.serp_cache, SERP_CACHE_TTL_SECONDS).
 
-            parsed_url = urlparse(main_link[0]['href'])
-            parsed_results.append({
-                "title": main_link[0].text,
-                "text": "\n".join(p.text for p in passages),
-                "link": f"{parsed_url.scheme}://{parsed_url.netloc}/"
-            })
+    Returns:
+        The list of search results from page with nested fields - "title", "text", "link".
+    """
+    cached = get_cached_results(query, page)
+    if cached is not None:
+        return cached
+
+    results = _fetch_serp(query, page)
+    store_results(query, page, results)
+    return results
 
-        return parsed_results
+
+def _fetch_serp(query: str, page: int) -> List[Dict]:
+    try:
+        if YANDEX_SEARCH_FORMAT == "FORMAT_XML":
+            raw = _request_serp(query, page, "FORMAT_XML")
+            if raw is None:
+                return []
+            try:
+                return parse_serp_xml(raw)
+            except SerpParseError as exc:
+                print(f"SEARCH_XML parsing failed for {query!r}, falling back to HTML: {exc}")
+
+        raw = _request_serp(query, page, "FORMAT_HTML")
+        if raw is None:
+            return []
+        return parse_serp_html(raw.decode("utf-8", errors="ignore"))
     except Exception as exc:  # noqa: BLE001
         print('Seacrh was failed with', exc)
         return []
 
 
+def yandex_search_pages(query: str, min_results: int, max_pages: int) -> List[Dict]:
+    """Fetch SERP pages one by one until min_results distinct sites are found or max_pages is reached."""
+    results: List[Dict] = []
+    links: set[str] = set()
+    for page in range(max(1, max_pages)):
+        page_results = yandex_search_suppliers(query, page=page)
+        if not page_results:
+            break
+        for doc in page_results:
+            if doc["link"] not in links:
+                links.add(doc["link"])
+                results.append(doc)
+        if len(links) >= min_results:
+            break
+    return results
+
+
+def search_queries_concurrently(queries: List[str]) -> List[List[Dict]]:
+    """Run SERP requests for all queries in parallel; results keep the order of queries."""
+    max_pages = _safe_int_env("YANDEX_SEARCH_PAGES", 1)
+    min_results = _safe_int_env("YANDEX_SEARCH_MIN_RESULTS", 10)
+    workers = max(1, min(_safe_int_env("YANDEX_SEARCH_CONCURRENCY", 4), len(queries) or 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="yandex-search") as executor:
+        return list(executor.map(lambda query: yandex_search_pages(query, min_results, max_pages), queries))
+
+
 def doc_validation(technical_spec: str, doc) -> Tuple[bool, str]:
     """
     Use LLM to decide if a single search result is a potentially relevant supplier.
@@ -791,24 +1086,33 @@ def doc_validation(technical_spec: str, doc) -> Tuple[bool, str]:
               False otherwise (marketplaces, aggregators, irrelevant industries, etc.)
     """
     task = DOC_VAL_INSTRUCTIONS.format(technical_spec=technical_spec, **doc)
+    messages = [
+        {
+            "role": "system",
+            "content": "Ты эксперт по закупкам и умеешь отбирать релевантных поставщиков по результатам поиска."
+        },
+        {"role": "user", "content": task},
+    ]
+    plan = plan_completion("doc_validation", messages)
     try:
         response = _chat_completion_with_metrics(
+            "doc_validation",
+            expected_completion_tokens=plan.expected,
             model=os.environ["OPENAI_MODEL"],
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Ты эксперт по закупкам и умеешь отбирать релевантных поставщиков по результатам поиска."
-                },
-                {"role": "user", "content": task},
-            ],
-            max_completion_tokens=300,
+            messages=messages,
+            max_completion_tokens=plan.limit,
             extra_body={"reasoning": {"enabled": False}},
         )
 
         raw = response.choices[0].message.content.strip()
         parsed = parse_json_response(raw)
 
-        return bool(parsed.get("is_relevant", False)), parsed.get("reason", "")
+        is_relevant, reason = bool(parsed.get("is_relevant", False)), parsed.get("reason", "")
+        record_verdict("doc", technical_spec, doc_snippet(doc), is_relevant, reason, doc.get("link"), os.getenv("OPENAI_MODEL"))
+        return is_relevant, reason
+    except llm_gateway.LLMUnavailableError:
+        # No verdict at all: the caller stops or defers instead of dropping the result as irrelevant.
+        raise
     except Exception as e:
         # В случае любой ошибки считаем результат нерелевантным,
         # чтобы не загрязнять выборку случайными сайтами.
@@ -816,6 +1120,79 @@ def doc_validation(technical_spec: str, doc) -> Tuple[bool, str]:
         return False, "doc_validation error: " + str(e)
 
 
+def doc_validation_batch(technical_spec: str, docs: List[Dict[str, Any]]) -> Dict[str, Tuple[bool, str]]:
+    """
+    Validate several search results in one structured-output call.
+
+    Returns:
+        {link: (is_relevant, reason)} for the links the model answered; raises on an unusable response.
+    """
+    documents = "\n\n".join(
+        f"[{idx}] {doc.get('link')}\n**{doc.get('title') or ''}**\n{doc.get('text') or ''}"
+        for idx, doc in enumerate(docs, start=1)
+    )
+    task = DOC_VAL_BATCH_INSTRUCTIONS.format(technical_spec=technical_spec, documents=documents)
+    messages = [
+        {
+            "role": "system",
+            "content": "Ты эксперт по закупкам и умеешь отбирать релевантных поставщиков по результатам поиска."
+        },
+        {"role": "user", "content": task},
+    ]
+    response_format = {"type": "json_schema", "json_schema": DOC_VAL_BATCH_SCHEMA}
+    plan = plan_completion("doc_validation_batch", messages, rows=len(docs), response_format=response_format)
+    response = _chat_completion_with_metrics(
+        "doc_validation_batch",
+        expected_completion_tokens=plan.expected,
+        model=os.environ["OPENAI_MODEL"],
+        messages=messages,
+        response_format=response_format,
+        max_completion_tokens=plan.limit,
+        extra_body={"reasoning": {"enabled": False}},
+    )
+    raw = response.choices[0].message.content if response.choices else None
+    if not raw:
+        raise RuntimeError("Empty response from doc validation batch")
+    verdicts = json.loads(raw).get("verdicts")
+    if not isinstance(verdicts, list):
+        raise ValueError("doc validation batch: 'verdicts' is not a list")
+
+    docs_by_link = {str(doc.get("link")): doc for doc in docs}
+    results: Dict[str, Tuple[bool, str]] = {}
+    for verdict in verdicts:
+        link = str(verdict.get("link") or "").strip() if isinstance(verdict, dict) else ""
+        if link in docs_by_link and link not in results:
+            results[link] = (bool(verdict.get("is_relevant", False)), str(verdict.get("reason") or ""))
+            record_verdict("doc", technical_spec, doc_snippet(docs_by_link[link]), *results[link], link, os.getenv("OPENAI_MODEL"))
+    return results
+
+
+def validate_docs(technical_spec: str, docs: List[Dict[str, Any]]) -> List[Tuple[bool, str]]:
+    """
+    Verdicts for docs in their order. Docs are sent DOC_VALIDATION_BATCH_SIZE per call
+    (1 disables batching); a failed batch or a missing verdict falls back to doc_validation.
+    LLMUnavailableError (provider down, task deadline passed) propagates.
+    """
+    batch_size = _safe_int_env("DOC_VALIDATION_BATCH_SIZE", 10)
+    if batch_size <= 1 or len(docs) <= 1:
+        return [doc_validation(technical_spec, doc=doc) for doc in docs]
+
+    verdicts: List[Tuple[bool, str]] = []
+    for start in range(0, len(docs), batch_size):
+        chunk = docs[start : start + batch_size]
+        try:
+            batch_verdicts = doc_validation_batch(technical_spec, chunk)
+        except llm_gateway.LLMUnavailableError:
+            raise
+        except Exception as exc:  # noqa: BLE001
+            print(f"doc_validation_batch failed, validating {len(chunk)} docs one by one: {exc}")
+            batch_verdicts = {}
+        for doc in chunk:
+            verdict = batch_verdicts.get(str(doc.get("link")))
+            verdicts.append(verdict if verdict is not None else doc_validation(technical_spec, doc=doc))
+    return verdicts
+
+
 def company_validation(
     tz: str,
     website: str,
@@ -832,7 +1209,7 @@ def company_validation(
     Args:
         tz: Compact text version of technical task (build_validation_tz output)
         website: Base URL of the company site
-        *_content: Text content (html2text) of main/about/catalog pages
+        *_content: Main-content text (extract_page_text) of main/about/catalog pages
         *_img: screenshots (ignored here, kept for API compatibility)
 
     Returns:
@@ -859,18 +1236,28 @@ def company_validation(
     if not site_text_block:
         site_text_block = "Текстовое содержимое сайта практически отсутствует."
 
+    # The same site text against the same TZ (reruns, retries, duplicate purchases) reuses the verdict.
+    memo_key = company_verdict_key(tz, site_text_block, os.getenv("OPENAI_MODEL"))
+    cached = get_cached_verdict(memo_key)
+    if cached is not None:
+        return cached
+
     task = COMPANY_VAL_INSTRUCTIONS.format(tz=tz, site_text_block=site_text_block)
+    messages = [
+        {
+            "role": "system",
+            "content": "Ты эксперт по закупкам и оцениваешь релевантность поставщиков по содержимому их сайта."
+        },
+        {"role": "user", "content": task},
+    ]
+    plan = plan_completion("company_validation", messages)
     try:
         response = _chat_completion_with_metrics(
+            "company_validation",
+            expected_completion_tokens=plan.expected,
             model=os.environ["OPENAI_MODEL"],
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Ты эксперт по закупкам и оцениваешь релевантность поставщиков по содержимому их сайта."
-                },
-                {"role": "user", "content": task},
-            ],
-            max_completion_tokens=400,
+            messages=messages,
+            max_completion_tokens=plan.limit,
             extra_body={"reasoning": {"enabled": False}},
         )
 
@@ -883,8 +1270,12 @@ def company_validation(
             "reason": (parsed.get("reason") or "").strip() or "Нет детального пояснения.",
             "name": (parsed.get("name") or "").strip() or None,
         }
+        record_verdict("company", tz, site_text_block, result["is_relevant"], result["reason"], website, os.getenv("OPENAI_MODEL"))
+        store_verdict(memo_key, website, result)
         return result
 
+    except llm_gateway.LLMUnavailableError:
+        raise
     except Exception as e:
         print("company_validation error:", e)
         # В случае ошибки считаем сайт нерелевантным, но возвращаем структуру
@@ -903,57 +1294,326 @@ def _safe_int_env(name: str, default: int) -> int:
         return default
 
 
+def _validation_concurrency() -> int:
+    """Max parallel doc/company validation LLM calls (keep under the provider's rate limit)."""
+    return max(1, _safe_int_env("LLM_VALIDATION_CONCURRENCY", 4))
+
+
+class _VerdictPrefetcher:
+    """
+    Doc validation verdicts computed on a bounded thread pool.
+
+    The search loop still asks for verdicts in SERP order and stops at QUERY_DOCS_LIMIT, so the
+    selected sites are the same as with serial validation; prefetch() only starts work that loop
+    will need (documents that no earlier query returned), and unused work is cancelled in close().
+    """
+
+    def __init__(self, technical_spec: str, batch_size: int, concurrency: int) -> None:
+        self.technical_spec = technical_spec
+        self.batch_size = batch_size
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="doc-validation")
+        self._verdicts: Dict[str, Tuple[Future, int]] = {}
+
+    def submit(self, docs: List[Dict[str, Any]]) -> None:
+        new_docs = [doc for doc in docs if doc["link"] not in self._verdicts]
+        for start in range(0, len(new_docs), self.batch_size):
+            chunk = new_docs[start : start + self.batch_size]
+            future = self.executor.submit(contextvars.copy_context().run, validate_docs, self.technical_spec, chunk)
+            for idx, doc in enumerate(chunk):
+                self._verdicts[doc["link"]] = (future, idx)
+
+    def verdict(self, doc: Dict[str, Any]) -> Tuple[bool, str]:
+        if doc["link"] not in self._verdicts:
+            self.submit([doc])
+        future, idx = self._verdicts[doc["link"]]
+        return future.result()[idx]
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
 def collect_yandex_search_output_from_text(
     technical_task_text: str,
     query_docs_limit: Optional[int] = None,
+    tz_summary: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     """
     Stage 1: collect supplier websites from Yandex results.
-    Returns websites only (without crawling contacts).
+    Returns websites only (without crawling contacts). When the LLM becomes unavailable the
+    validation stops: "note" explains it and "search_output" holds the sites selected so far.
+    tz_summary is a stored summarize_tz_for_single_supplier result; it is computed when missing.
     """
-    tz_summary = summarize_tz_for_single_supplier(technical_task_text)
+    tz_summary = tz_summary or summarize_tz_for_single_supplier(technical_task_text)
     search_queries = tz_summary.get("search_queries", [])
-    tz_for_validation = build_validation_tz(tz_summary)
+    tz_for_validation = tz_summary.get("validation_tz") or build_validation_tz(tz_summary)
     query_docs_limit = query_docs_limit or _safe_int_env("QUERY_DOCS_LIMIT", 3)
 
     search_output: List[Dict[str, Any]] = []
     seen: set[str] = set()
-    for query in search_queries:
-        results = yandex_search_suppliers(query)
-        query_docs = 0
-        for doc in results:
-            website = doc.get("link")
-            if not website or website in seen:
-                continue
-            seen.add(website)
+    batch_size = max(1, _safe_int_env("DOC_VALIDATION_BATCH_SIZE", 10))
+    query_results = search_queries_concurrently(search_queries)
 
-            try:
-                relevant, reason = doc_validation(tz_for_validation, doc=doc)
-            except Exception:  # noqa: BLE001
-                continue
-            if not relevant:
-                continue
+    # Marketplaces, aggregators and other obvious cases are decided by rules, without the LLM.
+    prefilter_log = PrefilterLog("yandex")
+    prefiltered: Dict[str, Tuple[bool, str]] = {}
+    for query, results in zip(search_queries, query_results):
+        for doc in results:
+            if doc.get("link") and doc["link"] not in prefiltered:
+                verdict = prefilter_log.record(classify(doc, query))
+                if verdict.decision:
+                    prefiltered[doc["link"]] = (verdict.decision == "accept", f"Предфильтр: {verdict.rule}")
+    prefilter_log.report()
+    # Snippets the local classifier (trained on past LLM verdicts) is confident about skip the LLM too.
+    undecided = {
+        doc["link"]: doc for results in query_results for doc in results if doc.get("link") and doc["link"] not in prefiltered
+    }
+    prefiltered.update(prescore_docs(tz_for_validation, list(undecided.values())))
 
-            search_output.append(
-                {
-                    "title": doc.get("title"),
-                    "text": doc.get("text"),
-                    "link": website,
-                    "website": website,
-                    "source": "yandex",
-                    "reason": reason,
-                    "confidence": 0.7,
-                }
-            )
-            query_docs += 1
-            if query_docs >= query_docs_limit:
+    prefetcher = _VerdictPrefetcher(tz_for_validation, batch_size, _validation_concurrency())
+    note: Optional[str] = None
+    try:
+        # The first chunk of every query's new documents is needed whatever the earlier queries select.
+        earlier_links: set[str] = set()
+        for results in query_results:
+            fresh = [
+                doc
+                for doc in results
+                if doc.get("link") and doc["link"] not in earlier_links and doc["link"] not in prefiltered
+            ]
+            prefetcher.submit(fresh[:batch_size])
+            earlier_links.update(doc["link"] for doc in results if doc.get("link"))
+
+        for results in query_results:
+            if note:
                 break
+            candidates: List[Dict] = []
+            candidate_links: set[str] = set()
+            for doc in results:
+                website = doc.get("link")
+                if not website or website in seen or website in candidate_links:
+                    continue
+                if website in prefiltered and not prefiltered[website][0]:
+                    seen.add(website)
+                    continue
+                candidate_links.add(website)
+                candidates.append(doc)
+
+            query_docs = 0
+            # Chunks are validated lazily so that QUERY_DOCS_LIMIT still stops further validation calls.
+            for start in range(0, len(candidates), batch_size):
+                chunk = candidates[start : start + batch_size]
+                prefetcher.submit([doc for doc in chunk if doc["link"] not in prefiltered])
+                for doc in chunk:
+                    website = doc["link"]
+                    seen.add(website)
+                    try:
+                        relevant, reason = prefiltered.get(website) or prefetcher.verdict(doc)
+                    except llm_gateway.LLMUnavailableError as exc:
+                        # Unvalidated results are not false negatives: keep what is already selected.
+                        note = f"Проверка результатов Yandex остановлена, LLM недоступен: {exc}"
+                        print(note)
+                        break
+                    except Exception:  # noqa: BLE001
+                        continue
+                    if not relevant:
+                        continue
+
+                    search_output.append(
+                        {
+                            "title": doc.get("title"),
+                            "text": doc.get("text"),
+                            "link": website,
+                            "website": website,
+                            "source": "yandex",
+                            "reason": reason,
+                            "confidence": 0.7,
+                        }
+                    )
+                    query_docs += 1
+                    if query_docs >= query_docs_limit:
+                        break
+                if query_docs >= query_docs_limit or note:
+                    break
+    finally:
+        prefetcher.close()
 
     return {
         "queries": search_queries,
         "tech_task_excerpt": technical_task_text[:160],
         "tz_summary": tz_summary,
         "search_output": search_output,
+        "note": note,
+    }
+
+
+def _site_confidence(site_item: Dict[str, Any]) -> float:
+    try:
+        return max(0.0, min(1.0, float(site_item.get("confidence"))))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _crawl_site(
+    website: str, page_text_limit: int
+) -> Tuple[List[str], Optional[Dict[str, Any]], Optional[Tuple[Dict[str, Any], str]]]:
+    """
+    Crawl one website (main, about and catalog pages) in the browser.
+    Returns (emails, pages, failure): pages are the company_validation keyword arguments;
+    failure is (validation_result, outcome) when the site could not be crawled and pages is None.
+    """
+    main_page_content = ""
+    about_page_content = None
+    catalog_page_content = None
+    about_page_1 = None
+    about_page_2 = None
+    catalog_page_1 = None
+    catalog_page_2 = None
+    main_page_1 = None
+    main_page_2 = None
+    about_success = False
+    catalog_success = False
+
+    with _stage("discovery"):
+        discovered = _discover_pages(website)
+    try:
+        with _stage("contacts_page"):
+            emails = parse_website(website, contact_urls=discovered.get("contacts"))
+    except Exception as exc:  # noqa: BLE001
+        print(f"parse_website failed for {website}: {exc}")
+        emails = []
+
+    try:
+        visit_website(website)
+        with _stage("screenshot"):
+            main_page_1 = get_screenshot()
+            scroll_page(num_pixels=1000)
+            main_page_2 = get_screenshot()
+        with _stage("text_extraction"):
+            main_page_content = extract_page_text(get_driver().page_source, max_chars=page_text_limit)
+        with _stage("link_discovery"):
+            main_snapshot = take_page_snapshot()
+
+        try:
+            with _stage("about_page"):
+                about_success = open_about_section(main_snapshot, discovered.get("about"))
+        except Exception as exc:  # noqa: BLE001
+            print(f"open_about_section failed for {website}: {exc}")
+            about_success = False
+        if about_success:
+            try:
+                with _stage("screenshot"):
+                    about_page_1 = get_screenshot()
+                    scroll_page(num_pixels=1000)
+                    about_page_2 = get_screenshot()
+                with _stage("text_extraction"):
+                    about_page_content = extract_page_text(get_driver().page_source, max_chars=page_text_limit)
+            except Exception as exc:  # noqa: BLE001
+                print(f"about page capture failed for {website}: {exc}")
+                about_success = False
+
+        try:
+            with _stage("catalog_page"):
+                catalog_success = open_catalog(main_snapshot, discovered.get("catalog"))
+        except Exception as exc:  # noqa: BLE001
+            print(f"open_catalog failed for {website}: {exc}")
+            catalog_success = False
+        if catalog_success:
+            try:
+                with _stage("screenshot"):
+                    catalog_page_1 = get_screenshot()
+                    scroll_page(num_pixels=1000)
+                    catalog_page_2 = get_screenshot()
+                with _stage("text_extraction"):
+                    catalog_page_content = extract_page_text(get_driver().page_source, max_chars=page_text_limit)
+            except Exception as exc:  # noqa: BLE001
+                print(f"catalog page capture failed for {website}: {exc}")
+                catalog_success = False
+
+        pages = {
+            "main_page_img": [main_page_1, main_page_2],
+            "main_page_content": main_page_content,
+            "about_page_img": [about_page_1, about_page_2] if about_success else None,
+            "about_page_content": about_page_content if about_success else None,
+            "catalog_page_img": [catalog_page_1, catalog_page_2] if catalog_success else None,
+            "catalog_page_content": catalog_page_content if catalog_success else None,
+        }
+        emails = _merge_emails(
+            emails,
+            _find_emails(main_page_content, website),
+            _find_emails(about_page_content or "", website) if about_success else [],
+            _find_emails(catalog_page_content or "", website) if catalog_success else [],
+        )
+        return emails, pages, None
+    except WebsiteVisitSkipped as exc:
+        outcome = "skipped"
+        print(f"website skipped {website}: {exc}")
+        validation_result = {
+            "is_relevant": False,
+            "reason": f"Сайт пропущен: недавние таймауты/ошибки соединения ({exc})",
+            "name": None,
+        }
+    except CrawlBudgetExceeded as exc:
+        outcome = "budget_exceeded"
+        print(f"crawl budget exceeded for {website}: {exc}")
+        validation_result = {
+            "is_relevant": False,
+            "reason": f"Исчерпан бюджет времени на обход сайта: {exc}",
+            "name": None,
+        }
+    except WebsiteVisitTimeout as exc:
+        outcome = "timeout"
+        print(f"website timeout for {website}: {exc}")
+        validation_result = {
+            "is_relevant": False,
+            "reason": f"Таймаут при открытии сайта: {exc}",
+            "name": None,
+        }
+    except WebsiteVisitError as exc:
+        outcome = "visit_error"
+        print(f"website visit error for {website}: {exc}")
+        validation_result = {
+            "is_relevant": False,
+            "reason": f"Ошибка открытия сайта: {exc}",
+            "name": None,
+        }
+    except Exception as exc:  # noqa: BLE001
+        outcome = "error"
+        print(f"website crawl failed for {website}: {exc}")
+        validation_result = {
+            "is_relevant": False,
+            "reason": f"Ошибка обхода/валидации сайта: {exc}",
+            "name": None,
+        }
+
+    return emails, None, (validation_result, outcome)
+
+
+def _validate_site(tz_for_validation: str, website: str, pages: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+    """Run company_validation for crawled pages; returns (validation_result, outcome)."""
+    try:
+        with _stage("validation"):
+            validation_result = company_validation(tz_for_validation, website=website, **pages)
+    except llm_gateway.LLMUnavailableError:
+        raise
+    except Exception as exc:  # noqa: BLE001
+        print(f"website validation failed for {website}: {exc}")
+        return {
+            "is_relevant": False,
+            "reason": f"Ошибка обхода/валидации сайта: {exc}",
+            "name": None,
+        }, "error"
+    return validation_result, "relevant" if validation_result.get("is_relevant") else "irrelevant"
+
+
+def _skipped_site(site_item: Dict[str, Any], website: str) -> Dict[str, Any]:
+    """Entry of "skipped_websites": the site item a follow-up task passes back in `websites`."""
+    return {
+        "website": website,
+        "source": site_item.get("source"),
+        "confidence": site_item.get("confidence"),
+        "dedup_key": site_item.get("dedup_key"),
+        "reason": site_item.get("reason"),
+        "budget_retry": bool(site_item.get("budget_retry")),
     }
 
 
@@ -961,15 +1621,34 @@ def collect_contacts_from_websites(
     technical_task_text: str,
     websites: List[Dict[str, Any]],
     tz_summary: Optional[Dict[str, Any]] = None,
+    deadline: Optional[float] = None,
+    site_budget: Optional[float] = None,
 ) -> Dict[str, Any]:
     """
     Stage 2: crawl websites and collect emails/validation.
+
+    Sites are crawled in order of source confidence. deadline is an absolute time.monotonic()
+    value for the whole crawl; site_budget (seconds, SUPPLIER_SITE_BUDGET by default) caps the
+    navigations (and page discovery) of a single site. Sites left when the deadline is reached,
+    sites interrupted by it, sites over their budget for the first time and sites left without a
+    verdict because the LLM is unavailable are returned in "skipped_websites" so a follow-up task
+    can crawl them. "crawl_stats" holds per-stage timings,
+    pages/bytes and outcomes of the call (see app.crawl_metrics).
+
+    company_validation of a crawled site runs on the validation pool (LLM_VALIDATION_CONCURRENCY)
+    while the browser moves on to the next site; results keep the crawl order.
     """
+    global crawl_deadline, crawl_stats
+
     summary = tz_summary or summarize_tz_for_single_supplier(technical_task_text)
-    tz_for_validation = build_validation_tz(summary)
+    tz_for_validation = summary.get("validation_tz") or build_validation_tz(summary)
+    page_text_limit = _safe_int_env("PAGE_TEXT_MAX_CHARS", 10000)
+    if site_budget is None:
+        site_budget = float(_safe_int_env("SUPPLIER_SITE_BUDGET", 120))
 
     processed_contacts: List[Dict[str, Any]] = []
     search_output: List[Dict[str, Any]] = []
+    skipped_websites: List[Dict[str, Any]] = []
     seen: set[str] = set()
 
     def _resolve_confidence(site_item: Dict[str, Any], is_relevant: bool) -> float:
@@ -979,122 +1658,103 @@ def collect_contacts_from_websites(
         except (TypeError, ValueError):
             return 0.7 if is_relevant else 0.3
 
-    for site_item in tqdm(websites):
-        website = site_item.get("website") or site_item.get("link")
-        if not website or website in seen:
-            continue
-
-        main_page_content = ""
-        about_page_content = None
-        catalog_page_content = None
-        about_page_1 = None
-        about_page_2 = None
-        catalog_page_1 = None
-        catalog_page_2 = None
-        main_page_1 = None
-        main_page_2 = None
-        about_success = False
-        catalog_success = False
-
-        try:
-            emails = parse_website(website)
-        except Exception as exc:  # noqa: BLE001
-            print(f"parse_website failed for {website}: {exc}")
-            emails = []
-
-        try:
-            visit_website(website)
-            main_page_1 = get_screenshot()
-            scroll_page(num_pixels=1000)
-            main_page_2 = get_screenshot()
-            main_page_content = html2text.html2text(html=get_driver().page_source or "")[:10000]
+    ordered_websites = sorted(websites, key=lambda item: -_site_confidence(item))
+    stats = CrawlStats()
+    crawl_stats = stats
+    concurrency = _validation_concurrency()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="company-validation")
+    pending: List[Tuple[Dict[str, Any], str, List[str], Future, Dict[str, Any]]] = []
+    llm_unavailable = False
+    try:
+        for site_item in tqdm(ordered_websites):
+            website = site_item.get("website") or site_item.get("link")
+            if not website or website in seen:
+                continue
+            seen.add(website)
 
-            try:
-                about_success = open_about_section()
-            except Exception as exc:  # noqa: BLE001
-                print(f"open_about_section failed for {website}: {exc}")
-                about_success = False
-            if about_success:
-                try:
-                    about_page_1 = get_screenshot()
-                    scroll_page(num_pixels=1000)
-                    about_page_2 = get_screenshot()
-                    about_page_content = html2text.html2text(html=get_driver().page_source or "")[:10000]
-                except Exception as exc:  # noqa: BLE001
-                    print(f"about page capture failed for {website}: {exc}")
-                    about_success = False
+            # No point crawling sites that cannot be validated: they wait for the follow-up task.
+            llm_unavailable = llm_unavailable or any(
+                item[3].done() and isinstance(item[3].exception(), llm_gateway.LLMUnavailableError) for item in pending
+            )
+            if llm_unavailable or (deadline is not None and monotonic() >= deadline):
+                skipped_websites.append(_skipped_site(site_item, website))
+                continue
 
+            crawl_deadline = monotonic() + site_budget if site_budget > 0 else None
+            if deadline is not None:
+                crawl_deadline = min(crawl_deadline or deadline, deadline)
+            stats.start_site()
+            emails, pages, failure = _crawl_site(website, page_text_limit)
+            site = stats.end_site()
+            crawl_deadline = None
+
+            if failure is not None and failure[1] == "budget_exceeded":
+                # Cut off by the task deadline, or the first overrun of the site budget: no verdict,
+                # a follow-up task crawls the site again. A second budget overrun is recorded.
+                task_cut = deadline is not None and deadline - monotonic() < MIN_NAVIGATION_SECONDS
+                if task_cut or not site_item.get("budget_retry"):
+                    skipped = _skipped_site(site_item, website)
+                    if not task_cut:
+                        skipped["budget_retry"] = True
+                    skipped_websites.append(skipped)
+                    stats.finish_site(website, "deferred", site)
+                    continue
+
+            if failure is not None:
+                future: Future = Future()
+                future.set_result(failure)
+            else:
+                # Keep screenshots of at most 2 * concurrency sites waiting for the LLM.
+                in_flight = [item[3] for item in pending if not item[3].done()]
+                if len(in_flight) >= 2 * concurrency:
+                    wait(in_flight, return_when=FIRST_COMPLETED)
+                future = executor.submit(
+                    contextvars.copy_context().run, _validate_site, tz_for_validation, website, pages
+                )
+            pending.append((site_item, website, emails, future, site))
+
+        for site_item, website, emails, future, site in pending:
             try:
-                catalog_success = open_catalog()
-            except Exception as exc:  # noqa: BLE001
-                print(f"open_catalog failed for {website}: {exc}")
-                catalog_success = False
-            if catalog_success:
-                try:
-                    catalog_page_1 = get_screenshot()
-                    scroll_page(num_pixels=1000)
-                    catalog_page_2 = get_screenshot()
-                    catalog_page_content = html2text.html2text(html=get_driver().page_source or "")[:10000]
-                except Exception as exc:  # noqa: BLE001
-                    print(f"catalog page capture failed for {website}: {exc}")
-                    catalog_success = False
-
-            validation_result = company_validation(
-                tz_for_validation,
-                website=website,
-                main_page_img=[main_page_1, main_page_2],
-                main_page_content=main_page_content,
-                about_page_img=[about_page_1, about_page_2] if about_success else None,
-                about_page_content=about_page_content if about_success else None,
-                catalog_page_img=[catalog_page_1, catalog_page_2] if catalog_success else None,
-                catalog_page_content=catalog_page_content if catalog_success else None,
-            )
-        except WebsiteVisitTimeout as exc:
-            print(f"website timeout for {website}: {exc}")
-            validation_result = {
-                "is_relevant": False,
-                "reason": f"Таймаут при открытии сайта: {exc}",
-                "name": None,
-            }
-        except WebsiteVisitError as exc:
-            print(f"website visit error for {website}: {exc}")
-            validation_result = {
-                "is_relevant": False,
-                "reason": f"Ошибка открытия сайта: {exc}",
-                "name": None,
-            }
-        except Exception as exc:  # noqa: BLE001
-            print(f"website crawl/validation failed for {website}: {exc}")
-            validation_result = {
-                "is_relevant": False,
-                "reason": f"Ошибка обхода/валидации сайта: {exc}",
-                "name": None,
-            }
+                validation_result, outcome = future.result()
+            except llm_gateway.LLMUnavailableError as exc:
+                print(f"website validation deferred for {website}: {exc}")
+                skipped_websites.append(_skipped_site(site_item, website))
+                stats.finish_site(website, "deferred", site)
+                continue
+            stats.finish_site(website, outcome, site)
 
-        confidence_value = _resolve_confidence(site_item, bool(validation_result.get("is_relevant")))
+            confidence_value = _resolve_confidence(site_item, bool(validation_result.get("is_relevant")))
 
-        output_item = {
-            "website": website,
-            "emails": emails,
-            "source": site_item.get("source"),
-            "confidence": confidence_value,
-            "dedup_key": site_item.get("dedup_key"),
-        }
-        search_output.append(output_item)
-        processed_contacts.append(
-            output_item
-            | {
-                "is_relevant": bool(validation_result.get("is_relevant", False)),
-                "reason": validation_result.get("reason") or site_item.get("reason"),
-                "name": validation_result.get("name"),
+            output_item = {
+                "website": website,
+                "emails": emails,
+                "source": site_item.get("source"),
+                "confidence": confidence_value,
+                "dedup_key": site_item.get("dedup_key"),
             }
-        )
-        seen.add(website)
+            search_output.append(output_item)
+            processed_contacts.append(
+                output_item
+                | {
+                    "is_relevant": bool(validation_result.get("is_relevant", False)),
+                    "reason": validation_result.get("reason") or site_item.get("reason"),
+                    "name": validation_result.get("name"),
+                }
+            )
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        crawl_deadline = None
+        crawl_stats = None
+
+    if skipped_websites:
+        print(f"crawl deadline reached or LLM unavailable, skipped {len(skipped_websites)} websites")
 
     return {
         "tech_task_excerpt": technical_task_text[:160],
         "search_output": search_output,
         "processed_contacts": processed_contacts,
+        "skipped_websites": skipped_websites,
+        "crawl_stats": stats.summary(),
     }
 
 
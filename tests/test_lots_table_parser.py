@@ -0,0 +1,63 @@
+"""parse_lots_tables on tables as doc-to-md's _convert_table_to_html emits them (cell lines joined by spaces)."""
+
+from app.lots_table_parser import parse_lots_tables
+
+CHARACTERISTICS_TABLE = """<table><tr><td>№ п/п</td><td>Наименование товара</td><td>Характеристики товара</td><td>Ед. изм.</td><td>Кол-во</td></tr>
+<tr><td>1</td><td>Бумага офисная</td><td>Формат: А4 Плотность: 80 г/м2 Белизна, %: 146</td><td>пачка</td><td>100</td></tr>
+<tr><td>2</td><td>Папка-регистратор</td><td>Ширина корешка, мм: 75 Материал: картон</td><td>шт</td><td>20</td></tr></table>"""
+
+PARAMETER_ROWS_TABLE = """<table><tr><td>№</td><td>Наименование товара</td><td>Наименование характеристики</td><td>Значение характеристики</td><td>Единица измерения характеристики</td><td>Ед. изм.</td><td>Кол-во</td></tr>
+<tr><td rowspan="2">1</td><td rowspan="2">Перчатки нитриловые</td><td>Размер</td><td>M</td><td></td><td rowspan="2">пара</td><td rowspan="2">500</td></tr>
+<tr><td>Толщина</td><td>не менее 0,1</td><td>мм</td></tr></table>"""
+
+PLAIN_TABLE = """<table><tr><td>№</td><td>Наименование</td><td>Ед. изм.</td><td>Количество</td></tr><tr><td>1</td><td>Шина 205/55 R16</td><td>шт</td><td>8</td></tr></table>"""
+
+PROSE = (
+    "Шины должны быть летними, индекс нагрузки не менее 91, индекс скорости не ниже V. "
+    "Год выпуска не ранее 2024 года. Шины поставляются новыми, не бывшими в эксплуатации, "
+    "без следов ремонта и восстановления протектора. Маркировка шин должна соответствовать ГОСТ 4754-97. "
+    "Товар должен иметь сертификат соответствия техническому регламенту Таможенного союза."
+)
+
+
+def test_space_joined_characteristics_are_split_per_key():
+    lots = parse_lots_tables(CHARACTERISTICS_TABLE)["lots"]
+
+    assert [lot["name"] for lot in lots] == ["Бумага офисная", "Папка-регистратор"]
+    assert [(item["name"], item["value"]) for item in lots[0]["parameters"]] == [
+        ("Формат", "А4"),
+        ("Плотность", "80 г/м2"),
+        ("Белизна, %", "146"),
+    ]
+    assert [(item["name"], item["value"]) for item in lots[1]["parameters"]] == [
+        ("Ширина корешка, мм", "75"),
+        ("Материал", "картон"),
+    ]
+    assert (lots[0]["count"], lots[0]["units"]) == ("100", "пачка")
+
+
+def test_unrecognized_key_inside_value_falls_back_to_llm():
+    table = CHARACTERISTICS_TABLE.replace("Плотность: 80 г/м2", "плотность бумаги: 80 г/м2")
+
+    assert parse_lots_tables(table) is None
+
+
+def test_parameter_rows_spanned_by_item_cells():
+    lots = parse_lots_tables(PARAMETER_ROWS_TABLE)["lots"]
+
+    assert len(lots) == 1
+    assert lots[0]["count"] == "500"
+    assert [(item["name"], item["value"], item["units"]) for item in lots[0]["parameters"]] == [
+        ("Размер", "M", ""),
+        ("Толщина", "не менее 0,1", "мм"),
+    ]
+
+
+def test_table_without_characteristics_is_parsed_when_nothing_surrounds_it():
+    lots = parse_lots_tables(PLAIN_TABLE)["lots"]
+
+    assert [(lot["name"], lot["count"], lot["parameters"]) for lot in lots] == [("Шина 205/55 R16", "8", [])]
+
+
+def test_table_without_characteristics_next_to_prose_falls_back_to_llm():
+    assert parse_lots_tables(f"# Техническое задание\n\n{PLAIN_TABLE}\n\n{PROSE}") is None